@@ -0,0 +1,107 @@
+import csv
+import io
+import os
+import zlib
+from sqlalchemy import select
+
+try:
+    from .models import AgencyLead
+except ImportError:
+    from models import AgencyLead
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))  # rows fetched per round-trip
+
+# CSV header -> column. Every column the report can include, in report order.
+EXPORT_COLUMNS = {
+    "Agency": AgencyLead.agency_name,
+    "Owner": AgencyLead.owner_name,
+    "Website": AgencyLead.website,
+    "Phone": AgencyLead.phone,
+    "Email": AgencyLead.email,
+    "City": AgencyLead.city,
+    "State": AgencyLead.state,
+    "Classification": AgencyLead.classification,
+    "Tier": AgencyLead.tier,
+    "Score": AgencyLead.score,
+    "Listings": AgencyLead.num_listings,
+    "Google Rating": AgencyLead.google_rating,
+    "Strengths": AgencyLead.strength_summary,
+    "Weaknesses": AgencyLead.weaknesses,
+    "Growth Opportunity": AgencyLead.growth_opportunity_summary,
+    "Outreach Status": AgencyLead.outreach_status,
+    "Outreach Email": AgencyLead.outreach_email,
+    "Created": AgencyLead.created_at,
+}
+# The Intelligence Report & Emails download
+DEFAULT_EXPORT_COLUMNS = ["Agency", "Tier", "Score", "City", "Listings", "Weaknesses", "Outreach Email"]
+
+def export_query(columns=None, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Newest-first SELECT of the requested report columns, fetched batch_size
+    rows at a time. Raises ValueError for unknown column names.
+    """
+    columns = list(columns or DEFAULT_EXPORT_COLUMNS)
+    unknown = [c for c in columns if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+    return columns, (
+        select(*(EXPORT_COLUMNS[c] for c in columns))
+        .order_by(AgencyLead.created_at.desc(), AgencyLead.id.desc())
+        .execution_options(yield_per=batch_size)
+    )
+
+class CSVEncoder:
+    """
+    Turns batches of rows into CSV bytes, optionally as one gzip stream.
+    """
+
+    def __init__(self, gzip_output: bool = False):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._compressor = zlib.compressobj(wbits=31) if gzip_output else None  # 31: gzip container
+
+    def encode(self, rows) -> bytes:
+        self._writer.writerows(rows)
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return self._compressor.compress(data) if self._compressor else data
+
+    def finish(self) -> bytes:
+        return self._compressor.flush() if self._compressor else b""
+
+def iter_agency_csv(db, columns=None, gzip_output: bool = False, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Streams the agency report as CSV byte chunks, one per fetched batch, so
+    memory stays bounded by batch_size rather than the table size.
+    """
+    headers, query = export_query(columns, batch_size)
+    encoder = CSVEncoder(gzip_output)
+    yield encoder.encode([headers])
+    for partition in db.execute(query).partitions():
+        chunk = encoder.encode(partition)
+        if chunk:
+            yield chunk
+    tail = encoder.finish()
+    if tail:
+        yield tail
+
+async def aiter_agency_csv(db, columns=None, gzip_output: bool = False, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    iter_agency_csv for an AsyncSession.
+    """
+    headers, query = export_query(columns, batch_size)
+    encoder = CSVEncoder(gzip_output)
+    yield encoder.encode([headers])
+    result = await db.stream(query)
+    async for partition in result.partitions():
+        chunk = encoder.encode(partition)
+        if chunk:
+            yield chunk
+    tail = encoder.finish()
+    if tail:
+        yield tail
+
+def write_agency_csv(db, fileobj, columns=None, gzip_output: bool = False, batch_size: int = EXPORT_BATCH_SIZE):
+    for chunk in iter_agency_csv(db, columns, gzip_output, batch_size):
+        fileobj.write(chunk)
@@ -0,0 +1,115 @@
+import hashlib
+import re
+from urllib.parse import urlsplit
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+try:
+    from .models import AgencyLead
+except ImportError:
+    from models import AgencyLead
+
+# Directory and social sites host many agencies, so their profile path is part of the identity
+SHARED_HOSTS = {
+    "zillow.com", "realtor.com", "redfin.com", "trulia.com", "homes.com",
+    "facebook.com", "instagram.com", "linkedin.com", "google.com", "yelp.com",
+}
+# Legal-form words that vary between listings of the same agency
+NAME_SUFFIXES = {"llc", "inc", "incorporated", "co", "corp", "corporation", "ltd", "pllc", "pc", "the"}
+
+def canonical_domain(website: str) -> str:
+    """
+    Lowercased host without scheme, "www." or port. For SHARED_HOSTS the path
+    is kept too, e.g. "zillow.com/profile/jane-doe".
+    """
+    website = (website or "").strip().lower()
+    if not website:
+        return ""
+    if "://" not in website:
+        website = "https://" + website
+    parts = urlsplit(website)
+    host = (parts.hostname or "").removeprefix("www.")
+    if host in SHARED_HOSTS or any(host.endswith("." + shared) for shared in SHARED_HOSTS):
+        return host + parts.path.rstrip("/")
+    return host
+
+def normalize_agency_name(name: str) -> str:
+    """
+    Lowercase words with punctuation, "&"/"and" and legal suffixes removed:
+    "The Smith & Jones Realty, LLC" -> "smith jones realty".
+    """
+    words = re.findall(r"[a-z0-9]+", (name or "").lower().replace("'", ""))
+    return " ".join(w for w in words if w not in NAME_SUFFIXES and w != "and")
+
+def agency_identity_key(name: str, website: str):
+    """
+    Identity of an agency across imports: canonical domain plus normalized
+    name. None when neither is known, so such rows are never merged.
+    """
+    domain = canonical_domain(website)
+    normalized = normalize_agency_name(name)
+    if not domain and not normalized:
+        return None
+    return f"{domain}|{normalized}"
+
+class KnownAgencies:
+    """
+    In-memory membership filter of agency identity keys, so bulk imports can
+    drop known agencies before any scraping or GPT calls. Keys are held as
+    8-byte digests to keep a large table's worth of keys small.
+    """
+
+    def __init__(self, keys=()):
+        self._digests = set()
+        for key in keys:
+            self.add(key)
+
+    @classmethod
+    def load(cls, db, batch_size: int = 10000):
+        rows = db.execute(
+            select(AgencyLead.identity_key)
+            .where(AgencyLead.identity_key.isnot(None))
+            .execution_options(yield_per=batch_size)
+        )
+        return cls(key for (key,) in rows)
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+
+    def add(self, key: str):
+        if key is not None:
+            self._digests.add(self._digest(key))
+
+    def __contains__(self, key) -> bool:
+        return key is not None and self._digest(key) in self._digests
+
+    def __len__(self):
+        return len(self._digests)
+
+def upsert_agencies(db, rows: list, update: bool = True):
+    """
+    Inserts AgencyLead rows (dicts with identical keys, including
+    identity_key). A row whose identity_key already exists overwrites that
+    agency's fields when update is True and is ignored otherwise.
+    Runs in the caller's transaction.
+    """
+    # Within one statement each key may appear once; the last row wins
+    unique = {}
+    for i, row in enumerate(rows):
+        unique[row.get("identity_key") or ("row", i)] = row
+    rows = list(unique.values())
+    if not rows:
+        return
+
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(AgencyLead)
+    if update:
+        columns = [c for c in rows[0] if c not in ("id", "identity_key", "created_at")]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AgencyLead.identity_key],
+            set_={c: stmt.excluded[c] for c in columns}
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[AgencyLead.identity_key])
+    db.execute(stmt, rows)
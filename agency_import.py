@@ -0,0 +1,239 @@
+import hashlib
+import io
+import os
+import time
+from functools import partial
+from datetime import datetime, timezone
+import pandas as pd
+from sqlalchemy import select, update
+
+try:
+    from .database import SessionLocal
+    from .models import ImportJob
+    from .enrichment_pipeline import EnrichmentPipeline
+    from .agency_identity import KnownAgencies, agency_identity_key, upsert_agencies
+    from .agency_intelligence import analyze_website_with_gpt_async, generate_outreach_email_async, gpt_cache
+    from .llm_dispatch import LLMDispatcher
+except ImportError:
+    from database import SessionLocal
+    from models import ImportJob
+    from enrichment_pipeline import EnrichmentPipeline
+    from agency_identity import KnownAgencies, agency_identity_key, upsert_agencies
+    from agency_intelligence import analyze_website_with_gpt_async, generate_outreach_email_async, gpt_cache
+    from llm_dispatch import LLMDispatcher
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))  # rows enriched and committed together
+
+# Columns read from uploaded agency CSVs; anything else in the file is ignored
+TEXT_COLUMNS = ["agency_name", "owner_name", "website", "phone", "email", "city", "state"]
+NUMERIC_COLUMNS = {"num_listings": "Int64", "google_rating": "Float64"}
+
+def file_fingerprint(fileobj, block_size: int = 1 << 20) -> str:
+    """
+    sha256 of a binary file's contents, read in blocks. Leaves the file at the start.
+    """
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(block_size), b""):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+def count_csv_rows(fileobj, block_size: int = 1 << 20) -> int:
+    """
+    Data rows in a CSV, estimated from line breaks (quoted multi-line fields
+    overcount). Used for progress only. Leaves the file at the start.
+    """
+    fileobj.seek(0)
+    lines = 0
+    last = b""
+    for block in iter(lambda: fileobj.read(block_size), b""):
+        lines += block.count(b"\n")
+        last = block
+    fileobj.seek(0)
+    if last and not last.endswith(b"\n"):
+        lines += 1
+    return max(0, lines - 1)
+
+def read_agency_chunks(fileobj, chunk_size: int = IMPORT_CHUNK_SIZE, skip_rows: int = 0):
+    """
+    Yields the CSV as lists of row dicts, chunk_size rows at a time, with
+    text columns as str, num_listings as int and google_rating as float.
+    Blank or unparseable values become None. The first skip_rows rows are skipped.
+    """
+    # Decode here rather than in pandas, which would close the caller's file
+    text = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+    try:
+        reader = pd.read_csv(
+            text, dtype=str, chunksize=chunk_size,
+            usecols=lambda c: c in TEXT_COLUMNS or c in NUMERIC_COLUMNS
+        )
+        for chunk in reader:
+            if skip_rows >= len(chunk):
+                skip_rows -= len(chunk)
+                continue
+            if skip_rows:
+                chunk = chunk.iloc[skip_rows:]
+                skip_rows = 0
+
+            for column, dtype in NUMERIC_COLUMNS.items():
+                if column in chunk:
+                    chunk[column] = pd.to_numeric(chunk[column], errors="coerce").astype(dtype)
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            yield chunk.to_dict("records")
+    finally:
+        text.detach()
+
+def _start_job(session_factory, source: str, fingerprint: str):
+    """
+    Finds the unfinished import job for this file, or starts a new one.
+    Returns (job id, rows already committed).
+    """
+    db = session_factory()
+    try:
+        job = db.execute(
+            select(ImportJob)
+            .where(ImportJob.fingerprint == fingerprint, ImportJob.status == "RUNNING")
+            .order_by(ImportJob.id.desc())
+        ).scalars().first()
+        if job is None:
+            job = ImportJob(source=source, fingerprint=fingerprint)
+            db.add(job)
+            db.commit()
+        return job.id, job.rows_done
+    finally:
+        db.close()
+
+def _commit_chunk(session_factory, job_id: int, agencies: list, rows: int, failed: int):
+    """
+    Upserts a chunk's enriched agencies and advances its job checkpoint in
+    one transaction, so the checkpoint never runs ahead of the data.
+    """
+    db = session_factory()
+    try:
+        upsert_agencies(db, agencies)
+        db.execute(
+            update(ImportJob).where(ImportJob.id == job_id).values(
+                rows_done=ImportJob.rows_done + rows,
+                rows_written=ImportJob.rows_written + len(agencies),
+                rows_failed=ImportJob.rows_failed + failed,
+                updated_at=datetime.now(timezone.utc)
+            )
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def _finish_job(session_factory, job_id: int):
+    db = session_factory()
+    try:
+        db.execute(update(ImportJob).where(ImportJob.id == job_id).values(
+            status="DONE", updated_at=datetime.now(timezone.utc)
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+def _load_known_agencies(session_factory):
+    db = session_factory()
+    try:
+        return KnownAgencies.load(db)
+    finally:
+        db.close()
+
+def _new_agencies(rows, known: KnownAgencies):
+    new_rows = []
+    for row in rows:
+        key = agency_identity_key(row.get("agency_name"), row.get("website"))
+        if key in known:
+            continue
+        known.add(key)
+        new_rows.append(row)
+    return new_rows
+
+def import_agency_csv(fileobj, source: str = "upload.csv", pipeline: EnrichmentPipeline = None,
+                      session_factory=SessionLocal, chunk_size: int = IMPORT_CHUNK_SIZE, on_progress=None) -> dict:
+    """
+    Enriches and stores the agencies in a binary CSV file one chunk at a time.
+    Agencies already in the database (or earlier in the file) are skipped
+    before any network work. Each chunk is committed with its checkpoint; if
+    the same file is imported again after a failure or interruption, rows
+    already committed are skipped.
+    on_progress(rows_done, total_rows) is called after every chunk.
+    Returns written/failed/skipped counts for this run, the row it resumed
+    from and elapsed time.
+    """
+    started = time.perf_counter()
+    job_id, resumed_from = _start_job(session_factory, source, file_fingerprint(fileobj))
+    total = count_csv_rows(fileobj)
+    pipeline = pipeline or EnrichmentPipeline(session_factory)
+    known = _load_known_agencies(session_factory)
+    done = resumed_from
+    written = failed = skipped = 0
+
+    for rows in read_agency_chunks(fileobj, chunk_size, skip_rows=resumed_from):
+        new_rows = _new_agencies(rows, known)
+        skipped += len(rows) - len(new_rows)
+
+        agencies = []
+        chunk_failed = 0
+        if new_rows:
+            chunk_failed = pipeline.run_sync(new_rows, total=len(new_rows), sink=agencies.extend)["failed"]
+        _commit_chunk(session_factory, job_id, agencies, len(rows), chunk_failed)
+        done += len(rows)
+        written += len(agencies)
+        failed += chunk_failed
+        if on_progress:
+            on_progress(done, max(total, done))
+
+    _finish_job(session_factory, job_id)
+    return {
+        "written": written,
+        "failed": failed,
+        "skipped": skipped,
+        "resumed_from": resumed_from,
+        "elapsed": time.perf_counter() - started
+    }
+
+def prepare_gpt_batch(fileobj, batch_path: str, session_factory=SessionLocal,
+                      chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    """
+    Offline alternative to calling GPT during an import, for the cheaper
+    Batch API: runs the CSV's new agencies through the pipeline with a
+    dispatcher in batch mode, which appends every GPT request not answered
+    from the GPT cache to batch_path instead of sending it. Nothing is stored
+    and no checkpoint is written.
+    Outreach prompts need the analysis, so after the first batch's results are
+    loaded (agency_intelligence.ingest_batch_results) a second run writes the
+    outreach requests; once those are loaded too, an import is served
+    entirely from the cache.
+    """
+    if gpt_cache is None:
+        raise ValueError("Batch results are delivered through the GPT cache; set LLM_CACHE_PATH")
+    dispatcher = LLMDispatcher(batch_path=batch_path)
+    pipeline = EnrichmentPipeline(
+        session_factory,
+        analyze=partial(analyze_website_with_gpt_async, dispatcher=dispatcher),
+        generate=partial(generate_outreach_email_async, dispatcher=dispatcher),
+        dispatcher=dispatcher
+    )
+    known = _load_known_agencies(session_factory)
+    deferred = ready = failed = skipped = 0
+    for rows in read_agency_chunks(fileobj, chunk_size):
+        new_rows = _new_agencies(rows, known)
+        skipped += len(rows) - len(new_rows)
+        if new_rows:
+            summary = pipeline.run_sync(new_rows, total=len(new_rows), sink=lambda batch: None)
+            deferred += summary["deferred"]
+            ready += summary["written"]
+            failed += summary["failed"]
+    return {
+        "requests": dispatcher.stats["deferred"],
+        "deferred": deferred,
+        "ready": ready,
+        "failed": failed,
+        "skipped": skipped
+    }
@@ -1,14 +1,64 @@
 import requests
 from bs4 import BeautifulSoup
+import codecs
 import os
 import json
 import re
+import time
+from html.parser import HTMLParser
 from openai import OpenAI
 
+try:
+    from .http_cache import HTTPCache, HTTP_CACHE_PATH, normalize_url
+    from .llm_cache import LLMCache, LLM_CACHE_PATH, make_cache_key
+    from .tracing import span, observe, TimedIterator
+    from .llm_dispatch import LLMDispatcher, LLMDeferred, read_batch_results
+    from .prompt_compaction import compact_homepage, PROMPT_COMPACTION, PROMPT_TOKEN_BUDGET
+except ImportError:
+    from http_cache import HTTPCache, HTTP_CACHE_PATH, normalize_url
+    from llm_cache import LLMCache, LLM_CACHE_PATH, make_cache_key
+    from tracing import span, observe, TimedIterator
+    from llm_dispatch import LLMDispatcher, LLMDeferred, read_batch_results
+    from prompt_compaction import compact_homepage, PROMPT_COMPACTION, PROMPT_TOKEN_BUDGET
+
 # Initialize OpenAI client (will use OPENAI_API_KEY from env)
 client = None
+gpt_dispatcher = None
 if os.environ.get("OPENAI_API_KEY"):
     client = OpenAI()
+    # Async, rate-budgeted client used by the bulk enrichment pipeline
+    gpt_dispatcher = LLMDispatcher()
+
+# Shared connection pool for homepage fetches and the on-disk page cache
+# (set HTTP_CACHE_PATH="" to disable caching)
+http_session = requests.Session()
+homepage_cache = HTTPCache(HTTP_CACHE_PATH) if HTTP_CACHE_PATH else None
+
+# Homepage extraction limits. "stream" parses incrementally and stops reading at
+# the text budget; "soup" downloads the whole page and parses it with BeautifulSoup.
+SCRAPE_MODE = os.environ.get("SCRAPE_MODE", "stream")
+SCRAPE_TEXT_BUDGET = int(os.environ.get("SCRAPE_TEXT_BUDGET", "6000"))     # characters handed to GPT
+# With prompt compaction on, this much text is read for it to choose from:
+# 40 times the prompt budget (at ~4 characters per token), 80000 characters
+# for the default 500 tokens
+SCRAPE_SCAN_CHARS = int(os.environ.get("SCRAPE_SCAN_CHARS", str(PROMPT_TOKEN_BUDGET * 4 * 40)))
+# Bytes of markup read before giving up on the text budget; inline scripts and
+# styles do not count, SCRAPE_MAX_TOTAL_BYTES bounds the whole download
+SCRAPE_MAX_BYTES = int(os.environ.get("SCRAPE_MAX_BYTES", str(2 * 1024 * 1024)))
+SCRAPE_MAX_TOTAL_BYTES = int(os.environ.get("SCRAPE_MAX_TOTAL_BYTES", str(16 * 1024 * 1024)))
+SCRAPE_CHUNK_SIZE = 64 * 1024
+
+# Search results page scraped by discover_agencies (overridable for a local fixture server)
+SEARCH_URL = os.environ.get("SEARCH_URL", "https://www.google.com/search")
+
+GPT_MODEL = os.environ.get("GPT_MODEL", "gpt-4o-mini")
+# Bump when a prompt template (or how its output is parsed) changes, so cached
+# responses produced by the old template are no longer served.
+ANALYSIS_PROMPT_VERSION = "analysis-v1"
+OUTREACH_PROMPT_VERSION = "outreach-v1"
+
+# Content-addressed cache of GPT responses (set LLM_CACHE_PATH="" to disable)
+gpt_cache = LLMCache(LLM_CACHE_PATH) if LLM_CACHE_PATH else None
 
 def discover_agencies(query):
     """
@@ -23,7 +73,7 @@ def discover_agencies(query):
     if "site:" not in query:
         query = f"site:zillow.com {query}"
 
-    url = f"https://www.google.com/search?q={query.replace(' ', '+')}"
+    url = f"{SEARCH_URL}?q={query.replace(' ', '+')}"
 
     results = []
     try:
@@ -115,47 +165,190 @@ def clean_and_score_agency(data):
         "growth_opportunity_summary": growth_opp
     }
 
-def scrape_homepage(url):
+def _format_homepage(title, meta_desc, text, text_budget=SCRAPE_TEXT_BUDGET):
+    # Clean up whitespace
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    main_text = '\n'.join(chunk for chunk in chunks if chunk)
+
+    combined_content = f"Title: {title}\nDescription: {meta_desc}\n\nContent:\n{main_text}"
+
+    return combined_content[:text_budget] # Increased limit for better intelligence
+
+def extract_homepage_text(html, text_budget=SCRAPE_TEXT_BUDGET):
     """
-    Module 2: Scrape homepage text and metadata using BeautifulSoup.
+    Extracts title, meta description and visible text from homepage HTML.
     """
-    if not url:
-        return ""
-    if not url.startswith("http"):
-        url = "https://" + url
+    soup = BeautifulSoup(html, 'html.parser')
 
-    try:
-        headers = {"User-Agent": "Mozilla/5.0 (Enterprise Intelligence Bot)"}
-        response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
+    # Extract Meta Tags
+    meta_desc = soup.find("meta", attrs={"name": "description"})
+    meta_desc = meta_desc["content"] if meta_desc else ""
+
+    title = soup.title.string if soup.title else ""
 
-        # Extract Meta Tags
-        meta_desc = soup.find("meta", attrs={"name": "description"})
-        meta_desc = meta_desc["content"] if meta_desc else ""
+    # Remove script and style elements
+    for script in soup(["script", "style", "header", "footer", "nav"]):
+        script.decompose()
 
-        title = soup.title.string if soup.title else ""
+    return _format_homepage(title, meta_desc, soup.get_text(separator=' '), text_budget)
 
-        # Remove script and style elements
-        for script in soup(["script", "style", "header", "footer", "nav"]):
-            script.decompose()
+class _HomepageTextParser(HTMLParser):
+    """
+    Incremental counterpart of extract_homepage_text: picks up the title and
+    meta description from <head> and collects visible text until the budget
+    of non-whitespace characters is reached.
+    """
+    SKIP_TAGS = {"script", "style", "header", "footer", "nav"}
+
+    def __init__(self, text_budget):
+        super().__init__(convert_charrefs=True)
+        self.text_budget = text_budget
+        self.title = ""
+        self.meta_desc = ""
+        self.pieces = []
+        self.collected = 0
+        self.done = False
+        self._skip_depth = 0
+        self._in_title = False
+        self._continues_text = False
+
+    def handle_starttag(self, tag, attrs):
+        self._continues_text = False
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "meta" and not self.meta_desc:
+            attrs = dict(attrs)
+            if (attrs.get("name") or "").lower() == "description":
+                self.meta_desc = attrs.get("content") or ""
+
+    def handle_endtag(self, tag):
+        self._continues_text = False
+        if tag in self.SKIP_TAGS:
+            if self._skip_depth:
+                self._skip_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+
+    def handle_comment(self, data):
+        self._continues_text = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        if self._skip_depth or self.done:
+            return
+        if self._continues_text:
+            # Same text node split across feed() calls
+            self.pieces[-1] += data
+        else:
+            self.pieces.append(data)
+            self._continues_text = True
+        self.collected += len("".join(data.split()))
+        if self.collected >= self.text_budget:
+            self.done = True
+
+def extract_homepage_stream(chunks, encoding=None, text_budget=SCRAPE_TEXT_BUDGET, max_bytes=SCRAPE_MAX_BYTES,
+                            max_total_bytes=SCRAPE_MAX_TOTAL_BYTES):
+    """
+    Streaming extraction over an iterable of byte chunks. Stops consuming the
+    iterable once the text budget is filled, max_bytes of markup (chunks
+    ending inside a <script> or <style> are not counted) or max_total_bytes
+    in all have been read.
+    Returns the same "Title/Description/Content" layout as extract_homepage_text.
+    """
+    parser = _HomepageTextParser(text_budget)
+    decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    read = markup = 0
+    for chunk in chunks:
+        read += len(chunk)
+        parser.feed(decoder.decode(chunk))
+        # Megabytes of inline JS hold no text and must not stop the read
+        # before the content that follows them
+        if parser.cdata_elem is None:
+            markup += len(chunk)
+        if parser.done or markup >= max_bytes or read >= max_total_bytes:
+            break
+    else:
+        parser.feed(decoder.decode(b"", final=True))
+        parser.close()
 
-        text = soup.get_text(separator=' ')
-        # Clean up whitespace
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        main_text = '\n'.join(chunk for chunk in chunks if chunk)
+    return _format_homepage(parser.title, parser.meta_desc, " ".join(parser.pieces), text_budget)
 
-        combined_content = f"Title: {title}\nDescription: {meta_desc}\n\nContent:\n{main_text}"
+def scrape_homepage(url):
+    """
+    Module 2: Scrape homepage text and metadata.
+    The body is parsed as it streams in and the download stops once
+    SCRAPE_TEXT_BUDGET characters of text are collected (SCRAPE_MODE="soup"
+    restores full BeautifulSoup parsing). Extracted text is cached on disk
+    per normalized URL; entries older than HTTP_CACHE_TTL are revalidated
+    with a conditional GET.
+    With PROMPT_COMPACTION on, up to SCRAPE_SCAN_CHARS of text are read and
+    compacted to the sentences most relevant to the GPT analysis. The cache
+    holds the compacted text, keyed by both budgets.
+    """
+    if not url:
+        return ""
+    if PROMPT_COMPACTION:
+        return _homepage_text(normalize_url(url), SCRAPE_SCAN_CHARS, PROMPT_TOKEN_BUDGET)
+    return _homepage_text(normalize_url(url), SCRAPE_TEXT_BUDGET)
+
+def _homepage_text(url, text_budget, token_budget=None):
+    # Entries are keyed by URL and budgets: a 6000-character extract cannot
+    # stand in for a full scan, nor a 500-token compaction for an 800-token one
+    cache_key = f"{url}#{text_budget}" + (f"#{token_budget}" if token_budget else "")
+    cached = homepage_cache.get(cache_key) if homepage_cache is not None else None
+    if cached and cached.is_fresh(homepage_cache.ttl):
+        return cached.text
 
-        return combined_content[:6000] # Increased limit for better intelligence
+    try:
+        headers = {"User-Agent": "Mozilla/5.0 (Enterprise Intelligence Bot)"}
+        if cached:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        # Fetch and parse overlap when streaming, so time spent waiting on the
+        # body is counted as fetch and the rest of the extraction as parse
+        started = time.perf_counter()
+        with http_session.get(url, headers=headers, timeout=10, stream=True) as response:
+            if response.status_code == 304 and cached:
+                observe("homepage_fetch", time.perf_counter() - started)
+                homepage_cache.revalidated(cache_key)
+                return cached.text
+
+            if SCRAPE_MODE == "soup":
+                html = response.text
+                observe("homepage_fetch", time.perf_counter() - started)
+                with span("html_parse"):
+                    combined_content = extract_homepage_text(html, text_budget)
+            else:
+                fetched = time.perf_counter() - started
+                chunks = TimedIterator(response.iter_content(SCRAPE_CHUNK_SIZE))
+                parse_started = time.perf_counter()
+                # Closing the response once the budget is filled abandons the rest of the body
+                combined_content = extract_homepage_stream(chunks, response.encoding, text_budget)
+                observe("html_parse", time.perf_counter() - parse_started - chunks.waited)
+                observe("homepage_fetch", fetched + chunks.waited)
+        if token_budget and combined_content:
+            with span("prompt_compaction"):
+                combined_content = compact_homepage(combined_content, token_budget)
+        if homepage_cache is not None and response.ok:
+            homepage_cache.put(
+                cache_key, combined_content,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            )
+        return combined_content
     except Exception as e:
         print(f"Error scraping {url}: {e}")
-        return ""
+        # A stale copy beats no intelligence at all
+        return cached.text if cached else ""
 
-def analyze_website_with_gpt(homepage_text, agency_name):
-    """
-    Module 2: Website Analysis using GPT (or fallback)
-    """
+def _analysis_request(homepage_text, agency_name):
+    # Prompt and cache key of the website analysis, shared by the sync and async paths
     prompt = f"""
     You are an Enterprise Real Estate Lead Intelligence AI built for the USA market.
     You are not a chatbot. You are an Enterprise Business Intelligence Engine.
@@ -191,17 +384,13 @@ def analyze_website_with_gpt(homepage_text, agency_name):
     'market', 'niche', 'target_audience', 'positioning', 'usp', 'weaknesses', 'opportunities'.
     """
 
-    if client:
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={ "type": "json_object" }
-            )
-            return json.loads(response.choices[0].message.content)
-        except Exception as e:
-            print(f"GPT Error: {e}")
+    cache_key = make_cache_key(GPT_MODEL, ANALYSIS_PROMPT_VERSION, {
+        "agency_name": agency_name,
+        "homepage_text": homepage_text
+    })
+    return prompt, cache_key
 
+def _fallback_analysis():
     # Fallback / Mock Analysis (Professional Consultative Tone)
     return {
         "market": "US Regional Market",
@@ -213,6 +402,63 @@ def analyze_website_with_gpt(homepage_text, agency_name):
         "opportunities": ["Implementation of AI Sales Assistant Infrastructure", "Optimization of Speed-to-Lead metrics", "24/7 automated lead qualification"]
     }
 
+def analyze_website_with_gpt(homepage_text, agency_name):
+    """
+    Module 2: Website Analysis using GPT (or fallback)
+    """
+    prompt, cache_key = _analysis_request(homepage_text, agency_name)
+    if gpt_cache is not None:
+        cached = gpt_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    if client:
+        try:
+            with span("gpt_analysis"):
+                response = client.chat.completions.create(
+                    model=GPT_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={ "type": "json_object" }
+                )
+            analysis = json.loads(response.choices[0].message.content)
+            if gpt_cache is not None:
+                gpt_cache.put(cache_key, analysis)
+            return analysis
+        except Exception as e:
+            print(f"GPT Error: {e}")
+
+    return _fallback_analysis()
+
+async def analyze_website_with_gpt_async(homepage_text, agency_name, dispatcher=None):
+    """
+    analyze_website_with_gpt through the async dispatcher, so many analyses
+    can be in flight within the rate budgets. In batch mode the request is
+    written to the batch file and LLMDeferred propagates.
+    """
+    dispatcher = dispatcher or gpt_dispatcher
+    prompt, cache_key = _analysis_request(homepage_text, agency_name)
+    if gpt_cache is not None:
+        cached = gpt_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    if dispatcher is not None:
+        try:
+            response = await dispatcher.complete(
+                [{"role": "user", "content": prompt}], custom_id=f"analysis-{cache_key}", stage="gpt_analysis",
+                model=GPT_MODEL, response_format={"type": "json_object"}
+            )
+            analysis = json.loads(response.choices[0].message.content)
+            if gpt_cache is not None:
+                gpt_cache.put(cache_key, analysis)
+            return analysis
+        except LLMDeferred:
+            raise
+        except Exception as e:
+            print(f"GPT Error: {e}")
+
+    return _fallback_analysis()
+
 def qualify_agency(agency_data, analysis):
     """
     Module 3: Qualification Engine
@@ -240,10 +486,8 @@ def qualify_agency(agency_data, analysis):
         "ideal_for_premium_ai": "Yes" if listings >= 15 else "Maybe"
     }
 
-def generate_outreach_email(agency_data, analysis, qualification):
-    """
-    Module 4: Premium Personalized Outreach Generator
-    """
+def _outreach_request(agency_data, analysis, qualification):
+    # Prompt and cache key of the outreach email, shared by the sync and async paths
     agency_name = agency_data.get("agency_name")
     city = agency_data.get("city", "your area")
     niche = analysis.get("niche", "Real Estate")
@@ -278,25 +522,31 @@ def generate_outreach_email(agency_data, analysis, qualification):
     Output Subject Line and Email Body.
     """
 
-    if client:
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}]
-            )
-            content = response.choices[0].message.content
-            # Simple parsing of Subject and Body
-            if "Subject:" in content:
-                parts = content.split("Subject:", 1)[1].split("\n", 1)
-                subject = parts[0].strip()
-                body = parts[1].strip() if len(parts) > 1 else content
-            else:
-                subject = f"Scaling {agency_name} with AI Sales Infrastructure"
-                body = content
+    cache_key = make_cache_key(GPT_MODEL, OUTREACH_PROMPT_VERSION, {
+        "agency_name": agency_name,
+        "city": city,
+        "niche": niche,
+        "tier": qualification['tier'],
+        "weaknesses": analysis.get('weaknesses', []),
+        "opportunities": analysis.get('opportunities', [])
+    })
+    return prompt, cache_key
+
+def _parse_outreach(content, agency_name):
+    # Simple parsing of Subject and Body
+    if "Subject:" in content:
+        parts = content.split("Subject:", 1)[1].split("\n", 1)
+        subject = parts[0].strip()
+        body = parts[1].strip() if len(parts) > 1 else content
+    else:
+        subject = f"Scaling {agency_name or 'your agency'} with AI Sales Infrastructure"
+        body = content
+    return {"subject": subject, "body": body}
 
-            return {"subject": subject, "body": body}
-        except Exception as e:
-            print(f"GPT Error generating email: {e}")
+def _fallback_outreach(agency_data, analysis):
+    agency_name = agency_data.get("agency_name")
+    city = agency_data.get("city", "your area")
+    niche = analysis.get("niche", "Real Estate")
 
     # Fallback Template (Enterprise Consultative Style)
     subject = f"Infrastructure Optimization for {agency_name} | {city}"
@@ -326,3 +576,85 @@ SpeedToLead AI: 123 Enterprise Way, NY.
 Reply STOP to unsubscribe. [CAN-SPAM Compliant]
 """
     return {"subject": subject, "body": body}
+
+def generate_outreach_email(agency_data, analysis, qualification):
+    """
+    Module 4: Premium Personalized Outreach Generator
+    """
+    prompt, cache_key = _outreach_request(agency_data, analysis, qualification)
+    if gpt_cache is not None:
+        cached = gpt_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    if client:
+        try:
+            with span("gpt_outreach"):
+                response = client.chat.completions.create(
+                    model=GPT_MODEL,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+            outreach = _parse_outreach(response.choices[0].message.content, agency_data.get("agency_name"))
+            if gpt_cache is not None:
+                gpt_cache.put(cache_key, outreach)
+            return outreach
+        except Exception as e:
+            print(f"GPT Error generating email: {e}")
+
+    return _fallback_outreach(agency_data, analysis)
+
+async def generate_outreach_email_async(agency_data, analysis, qualification, dispatcher=None):
+    """
+    generate_outreach_email through the async dispatcher (see
+    analyze_website_with_gpt_async).
+    """
+    dispatcher = dispatcher or gpt_dispatcher
+    prompt, cache_key = _outreach_request(agency_data, analysis, qualification)
+    if gpt_cache is not None:
+        cached = gpt_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    if dispatcher is not None:
+        try:
+            response = await dispatcher.complete(
+                [{"role": "user", "content": prompt}], custom_id=f"outreach-{cache_key}", stage="gpt_outreach",
+                model=GPT_MODEL
+            )
+            outreach = _parse_outreach(response.choices[0].message.content, agency_data.get("agency_name"))
+            if gpt_cache is not None:
+                gpt_cache.put(cache_key, outreach)
+            return outreach
+        except LLMDeferred:
+            raise
+        except Exception as e:
+            print(f"GPT Error generating email: {e}")
+
+    return _fallback_outreach(agency_data, analysis)
+
+def ingest_batch_results(path, cache=None):
+    """
+    Loads a Batch API output file (requests written by a dispatcher in batch
+    mode) into the GPT cache, where the next enrichment run finds them.
+    Returns counts of stored and failed results.
+    """
+    cache = cache or gpt_cache
+    if cache is None:
+        raise ValueError("Batch results are delivered through the GPT cache; set LLM_CACHE_PATH")
+    stored = failed = 0
+    for custom_id, content, error in read_batch_results(path):
+        kind, _, cache_key = (custom_id or "").partition("-")
+        try:
+            if error is not None:
+                raise ValueError(error)
+            if kind == "analysis":
+                cache.put(cache_key, json.loads(content))
+            elif kind == "outreach":
+                cache.put(cache_key, _parse_outreach(content, None))
+            else:
+                raise ValueError("unknown request")
+            stored += 1
+        except ValueError as e:
+            print(f"Skipping batch result {custom_id}: {e}")
+            failed += 1
+    return {"stored": stored, "failed": failed}
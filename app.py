@@ -1,11 +1,10 @@
 import streamlit as st
 import pandas as pd
-import json
 from sqlalchemy.orm import Session
-from datetime import datetime, timezone
 import asyncio
 import os
 import sys
+import tempfile
 
 # Add current directory to path to allow imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -13,12 +12,17 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from database import init_db, SessionLocal
 from models import Lead, AgencyLead
 from lead_scoring import calculate_lead_score
+from dashboard import (
+    LEAD_PAGE_SIZE, get_dashboard_metrics, get_lead_page,
+    get_uncontacted_leads, get_unbooked_leads, mark_contacted, book_appointment
+)
 from telegram_bot import send_telegram_alert
 from scheduler import start_scheduler, schedule_lead_follow_ups
-from agency_intelligence import (
-    clean_and_score_agency, scrape_homepage, analyze_website_with_gpt,
-    qualify_agency, generate_outreach_email, discover_agencies
-)
+from agency_intelligence import discover_agencies, gpt_cache
+from lead_identity import save_leads, needs_alert
+from agency_import import import_agency_csv
+from agency_identity import KnownAgencies, agency_identity_key, upsert_agencies
+from agency_export import EXPORT_COLUMNS, DEFAULT_EXPORT_COLUMNS, write_agency_csv
 
 # Page Config
 st.set_page_config(page_title="SpeedToLead AI: Enterprise Engine", layout="wide", page_icon="🚀")
@@ -44,35 +48,30 @@ with tabs[0]:
 
     db = SessionLocal()
     try:
-        leads = db.query(Lead).order_by(Lead.created_at.desc()).all()
-
         # Stats
-        total_leads = len(leads)
-        hot_leads = sum(1 for l in leads if l.lead_status == "HOT")
-        appointments = sum(1 for l in leads if l.appointment_booked)
-        total_roi = sum(l.estimated_commission for l in leads if l.lead_status == "HOT")
-
-        responses = [l.response_time_minutes for l in leads if l.response_time_minutes is not None]
-        avg_response = sum(responses) / len(responses) if responses else 0
+        metrics = get_dashboard_metrics(db)
 
         col1, col2, col3, col4, col5 = st.columns(5)
-        col1.metric("Total Leads", total_leads)
-        col2.metric("🔥 HOT Leads", hot_leads)
-        col3.metric("📅 Appointments", appointments)
-        col4.metric("Avg Response", f"{avg_response:.1f} min")
-        col5.metric("Est. HOT ROI ($)", f"${total_roi:,.0f}")
+        col1.metric("Total Leads", metrics["total_leads"])
+        col2.metric("🔥 HOT Leads", metrics["hot_leads"])
+        col3.metric("📅 Appointments", metrics["appointments"])
+        col4.metric("Avg Response", f"{metrics['avg_response_minutes']:.1f} min")
+        col5.metric("Est. HOT ROI ($)", f"${metrics['hot_roi']:,.0f}")
 
         st.divider()
 
-        # Lead Table
-        if leads:
+        # Lead Table (keyset-paginated; cursors of the pages seen so far live in session state)
+        if metrics["total_leads"]:
+            cursors = st.session_state.setdefault("lead_page_cursors", [None])
+            leads, next_cursor = get_lead_page(db, after=cursors[-1])
+
             data = []
             for l in leads:
                 data.append({
                     "ID": l.id,
                     "Name": l.name,
-                    "Budget ($)": f"${l.budget:,.0f}",
-                    "Est. Commission": f"${l.estimated_commission:,.0f}",
+                    "Budget ($)": f"${(l.budget or 0):,.0f}",
+                    "Est. Commission": f"${(l.estimated_commission or 0):,.0f}",
                     "Source": l.source,
                     "Status": l.lead_status,
                     "Prob.": f"{l.close_probability}%",
@@ -86,43 +85,46 @@ with tabs[0]:
             df = pd.DataFrame(data)
             st.dataframe(df, use_container_width=True, hide_index=True)
 
+            col_prev, col_page, col_next = st.columns([1, 4, 1])
+            if col_prev.button("◀ Newer", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+            col_page.caption(f"Page {len(cursors)} of {-(-metrics['total_leads'] // LEAD_PAGE_SIZE)}")
+            if col_next.button("Older ▶", disabled=next_cursor is None):
+                cursors.append(next_cursor)
+                st.rerun()
+
             # Action Area
             st.subheader("Lead Management")
             col_act1, col_act2 = st.columns(2)
 
             with col_act1:
-                uncontacted_leads = [l for l in leads if not l.last_contacted]
+                contact_search = st.text_input("Find lead to contact", key="contact_search")
+                uncontacted_leads = get_uncontacted_leads(db, contact_search)
                 if uncontacted_leads:
                     lead_to_mark = st.selectbox("Mark as Contacted",
                                                 options=uncontacted_leads,
                                                 format_func=lambda x: f"{x.name} ({x.source})")
                     if st.button("Confirm Contact"):
-                        lead_to_mark.last_contacted = datetime.now(timezone.utc)
-                        created_at = lead_to_mark.created_at
-                        if created_at.tzinfo is None:
-                            created_at = created_at.replace(tzinfo=timezone.utc)
-
-                        diff = lead_to_mark.last_contacted - created_at
-                        lead_to_mark.response_time_minutes = diff.total_seconds() / 60
-                        db.commit()
+                        mark_contacted(db, lead_to_mark.id)
                         st.success(f"Marked {lead_to_mark.name} as contacted!")
                         st.rerun()
                 else:
-                    st.info("All leads have been contacted.")
+                    st.info("All leads have been contacted." if not contact_search else "No matching leads.")
 
             with col_act2:
-                unbooked_leads = [l for l in leads if not l.appointment_booked]
+                book_search = st.text_input("Find lead to book", key="book_search")
+                unbooked_leads = get_unbooked_leads(db, book_search)
                 if unbooked_leads:
                     lead_to_book = st.selectbox("Book Appointment",
                                                 options=unbooked_leads,
                                                 format_func=lambda x: f"{x.name} ({x.lead_status})")
                     if st.button("Schedule Appointment"):
-                        lead_to_book.appointment_booked = True
-                        db.commit()
+                        book_appointment(db, lead_to_book.id)
                         st.success(f"Appointment booked for {lead_to_book.name}!")
                         st.rerun()
                 else:
-                    st.info("All appointments booked.")
+                    st.info("All appointments booked." if not book_search else "No matching leads.")
         else:
             st.write("No leads found yet.")
 
@@ -184,31 +186,26 @@ with tabs[1]:
                         close_probability=scoring_result['probability'],
                         recommended_action=scoring_result['action'],
                         sms_opt_in=sms_opt_in,
-                        estimated_commission=scoring_result['commission']
+                        estimated_commission=scoring_result['commission'],
+                        scoring_version=scoring_result['rules_version']
                     )
-                    db.add(new_lead)
+                    # Repeat submissions (same phone or email) merge into the existing lead
+                    saved = save_leads(db, [new_lead])[0]
                     db.commit()
-                    db.refresh(new_lead)
 
                     # Telegram and Follow-ups
                     lead_details = {
                         "name": name, "budget": budget, "area": area,
-                        "timeframe": timeframe, "status": scoring_result['status'],
-                        "probability": scoring_result['probability'],
-                        "action": scoring_result['action']
+                        "timeframe": timeframe, "status": saved.status,
+                        "probability": saved.probability,
+                        "action": saved.action
                     }
 
                     # Running async in Streamlit form submission
                     async def run_tasks():
-                        await send_telegram_alert(lead_details)
-                        await schedule_lead_follow_ups(
-                            new_lead.id,
-                            name,
-                            email,
-                            phone,
-                            scoring_result['status'],
-                            sms_opt_in
-                        )
+                        if needs_alert(saved):
+                            await send_telegram_alert(lead_details)
+                        await schedule_lead_follow_ups(saved.id)
 
                     asyncio.run(run_tasks())
 
@@ -243,11 +240,21 @@ with tabs[2]:
             if st.button("Process Discovered Leads"):
                 db = SessionLocal()
                 try:
+                    # Agencies already on file are left as they are
+                    known = KnownAgencies.load(db)
+                    new_agencies = []
                     for d in st.session_state['discovered_leads']:
-                        agency_lead = AgencyLead(agency_name=d['agency_name'], website=d['website'], city=d['city'], outreach_status="PENDING")
-                        db.add(agency_lead)
+                        key = agency_identity_key(d['agency_name'], d['website'])
+                        if key not in known:
+                            known.add(key)
+                            new_agencies.append({
+                                "agency_name": d['agency_name'], "website": d['website'], "city": d['city'],
+                                "outreach_status": "PENDING", "identity_key": key
+                            })
+                    upsert_agencies(db, new_agencies, update=False)
                     db.commit()
-                    st.success("Imported for analysis.")
+                    skipped = len(st.session_state['discovered_leads']) - len(new_agencies)
+                    st.success(f"Imported {len(new_agencies)} for analysis ({skipped} already known).")
                 finally:
                     db.close()
 
@@ -259,54 +266,24 @@ with tabs[2]:
         st.subheader("📤 Bulk Upload")
         uploaded_file = st.file_uploader("Upload CSV", type="csv", key="ent_upload")
         if uploaded_file:
-            df_up = pd.read_csv(uploaded_file)
             if st.button("Process Upload"):
-                db = SessionLocal()
                 progress_bar = st.progress(0)
                 try:
-                    total = len(df_up)
-                    for idx, row in df_up.iterrows():
-                        progress_bar.progress((idx + 1) / total)
-                        agency_data = {
-                            "agency_name": row.get('agency_name'),
-                            "num_listings": row.get('num_listings', 0),
-                            "google_rating": row.get('google_rating', 0),
-                            "city": row.get('city'),
-                            "owner_name": row.get('owner_name')
-                        }
-                        init_analysis = clean_and_score_agency(agency_data)
-                        text = scrape_homepage(row.get('website'))
-                        gpt_analysis = analyze_website_with_gpt(text, agency_data['agency_name'])
-                        qual = qualify_agency(agency_data, gpt_analysis)
-                        outreach = generate_outreach_email(agency_data, gpt_analysis, qual)
-
-                        al = AgencyLead(
-                            agency_name=agency_data['agency_name'],
-                            owner_name=agency_data['owner_name'],
-                            website=row.get('website'),
-                            phone=row.get('phone'),
-                            email=row.get('email'),
-                            city=agency_data['city'],
-                            state=row.get('state'),
-                            num_listings=agency_data['num_listings'],
-                            google_rating=agency_data['google_rating'],
-                            classification=init_analysis['classification'],
-                            score=init_analysis['score'],
-                            strength_summary=init_analysis['strength_summary'],
-                            growth_opportunity_summary=init_analysis['growth_opportunity_summary'],
-                            tier=qual['tier'],
-                            market_analysis=json.dumps(gpt_analysis),
-                            weaknesses=", ".join(gpt_analysis.get('weaknesses', [])),
-                            outreach_email=f"Subject: {outreach['subject']}\n\n{outreach['body']}",
-                            outreach_status="GENERATED"
-                        )
-                        db.add(al)
-                    db.commit()
-                    st.success("Processing complete.")
+                    summary = import_agency_csv(
+                        uploaded_file, source=uploaded_file.name,
+                        on_progress=lambda done, total: progress_bar.progress(done / total)
+                    )
+                    if summary["resumed_from"]:
+                        st.info(f"Resumed an earlier import of this file after row {summary['resumed_from']}.")
+                    st.success(
+                        f"Processing complete. {summary['written']} agencies enriched"
+                        f" in {summary['elapsed']:.0f}s ({summary['failed']} failed,"
+                        f" {summary['skipped']} already known)."
+                    )
+                    if gpt_cache is not None:
+                        st.caption(f"GPT cache hit rate: {gpt_cache.hit_rate:.0%}")
                 except Exception as e:
-                    st.error(f"Processing error: {e}")
-                finally:
-                    db.close()
+                    st.error(f"Processing error: {e}. Upload the same file again to resume from the last saved chunk.")
 
     # Dashboard Section
     st.subheader("📊 Enterprise Lead Pipeline")
@@ -344,22 +321,27 @@ with tabs[2]:
                     if st.button("Send Outreach", key=f"send_{a.id}"):
                         st.info("Outreach queued via Enterprise SMTP.")
 
-            # Enhanced CSV Export including outreach emails
-            export_data = []
-            for a in agencies:
-                export_data.append({
-                    "Agency": a.agency_name,
-                    "Tier": a.tier,
-                    "Score": a.score,
-                    "City": a.city,
-                    "Listings": a.num_listings,
-                    "Weaknesses": a.weaknesses,
-                    "Outreach Email": a.outreach_email
-                })
+            # CSV export including outreach emails, streamed from the DB into a temp file on click
+            e1, e2 = st.columns([4, 1])
+            export_columns = e1.multiselect("Report columns", list(EXPORT_COLUMNS), default=DEFAULT_EXPORT_COLUMNS)
+            export_gzip = e2.checkbox("Gzip", help="Compress the report (.csv.gz)")
 
-            df_export = pd.DataFrame(export_data)
-            csv = df_export.to_csv(index=False).encode('utf-8')
-            st.download_button("📥 Export Intelligence Report & Emails", data=csv, file_name="enterprise_leads_full.csv", mime="text/csv")
+            def build_export():
+                export_file = tempfile.TemporaryFile()
+                export_db = SessionLocal()
+                try:
+                    write_agency_csv(export_db, export_file, export_columns, gzip_output=export_gzip)
+                finally:
+                    export_db.close()
+                export_file.seek(0)
+                return export_file
+
+            st.download_button(
+                "📥 Export Intelligence Report & Emails", data=build_export,
+                file_name="enterprise_leads_full.csv.gz" if export_gzip else "enterprise_leads_full.csv",
+                mime="application/gzip" if export_gzip else "text/csv",
+                disabled=not export_columns
+            )
         else:
             st.info("No agency leads found in the system.")
     finally:
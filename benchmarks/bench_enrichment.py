@@ -0,0 +1,376 @@
+"""
+Offline benchmark of the agency intelligence pipeline: discover_agencies ->
+scrape_homepage -> analyze_website_with_gpt -> qualify_agency ->
+generate_outreach_email -> database, with the internet replaced by local
+stand-ins:
+
+  * fixture web servers (one per simulated host, so ENRICH_PER_HOST_LIMIT
+    applies as in production) serving a search results page and brokerage
+    homepages from fixtures.py. Every `--pathological-every`th site is one
+    of: a 3000-listing page, a 4 MB inline-script page, a page trickled out
+    over seconds, and an endless script stream that never finishes;
+  * the OpenAI stub (openai_stub.py) with configurable latency.
+
+HTTP and GPT caches are off and the database is a temporary SQLite file.
+Reports rows/second for enriching N agencies, p50/p95/p99 per stage, and
+the peak traced memory of fetching + parsing each kind of page in the
+streaming and BeautifulSoup modes, and writes them to a JSON file so runs
+can be compared between commits:
+
+    python benchmarks/bench_enrichment.py --agencies 500 --gpt-latency 0.3 --output before.json
+    python benchmarks/bench_enrichment.py --agencies 500 --gpt-latency 0.3 --output after.json --compare before.json
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.append(ROOT)
+sys.path.append(BENCH_DIR)
+
+from helpers import free_port
+
+SEARCH_PORT = free_port()
+OPENAI_PORT = free_port()
+
+# Read at import time, so set before importing the pipeline
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_enrichment_'), 'bench.db')}")
+os.environ.update({
+    "OPENAI_API_KEY": "sk-bench",
+    "OPENAI_BASE_URL": f"http://127.0.0.1:{OPENAI_PORT}/v1",
+    "SEARCH_URL": f"http://127.0.0.1:{SEARCH_PORT}/search",
+    "HTTP_CACHE_PATH": "",
+    "LLM_CACHE_PATH": "",
+})
+# The stub has no rate limits; export LLM_RPM_LIMIT/LLM_TPM_LIMIT to include the account budgets
+os.environ.setdefault("LLM_RPM_LIMIT", "0")
+os.environ.setdefault("LLM_TPM_LIMIT", "0")
+
+import agency_intelligence
+from agency_intelligence import discover_agencies, scrape_homepage
+from database import init_db
+from enrichment_pipeline import EnrichmentPipeline, ENRICH_FETCH_CONCURRENCY, ENRICH_PER_HOST_LIMIT, \
+    ENRICH_ANALYZE_CONCURRENCY, ENRICH_GENERATE_CONCURRENCY
+from tracing import stage_metrics
+
+from fixtures import brokerage_page, NEIGHBORHOODS
+from openai_stub import OpenAIStub
+
+RESULTS_PER_SEARCH = 10
+TYPICAL_PAGES = [dict(listings=20), dict(listings=60), dict(listings=150), dict(listings=40, signals=False)]
+PATHOLOGICAL = ["large", "inline_js", "trickle", "endless"]
+STAGES = ["discovery", "homepage_fetch", "html_parse", "gpt_analysis", "gpt_outreach"]
+
+class FixtureSite(BaseHTTPRequestHandler):
+    """
+    Serves /search?q=<words> <batch> like a results page and /site/<i> as
+    the homepage of agency i. Pages are rendered once up front, so serving
+    them allocates next to nothing in the benchmark process.
+    """
+    protocol_version = "HTTP/1.1"
+    pages = {}
+    ports = []
+    pathological_every = 0
+    trickle_chunk = 8 * 1024
+    trickle_delay = 0.05
+
+    @classmethod
+    def render(cls):
+        cls.pages = {f"typical{i}": brokerage_page(seed=i, **spec).encode() for i, spec in enumerate(TYPICAL_PAGES)}
+        cls.pages["large"] = brokerage_page(listings=3000).encode()
+        cls.pages["inline_js"] = brokerage_page(listings=3000, inline_js_kb=4096).encode()
+        cls.pages["trickle"] = brokerage_page(listings=400).encode()
+
+    @classmethod
+    def kind(cls, i: int) -> str:
+        every = cls.pathological_every
+        if every and i % every == every - 1:
+            return PATHOLOGICAL[(i // every) % len(PATHOLOGICAL)]
+        return f"typical{i % len(TYPICAL_PAGES)}"
+
+    @classmethod
+    def site_url(cls, i: int) -> str:
+        return f"http://127.0.0.1:{cls.ports[i % len(cls.ports)]}/site/{i}"
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        try:
+            if parts.path == "/search":
+                words = parse_qs(parts.query).get("q", [""])[0].split()
+                return self._send(self._search_page(int(words[-1])))
+            if parts.path.startswith("/site/"):
+                kind = self.kind(int(parts.path.rsplit("/", 1)[1]))
+                if kind == "endless":
+                    return self._send_endless()
+                if kind == "trickle":
+                    return self._send_trickled(self.pages[kind])
+                return self._send(self.pages[kind])
+        except (ValueError, IndexError):
+            pass
+        self._send(b"not found", 404)
+
+    def _search_page(self, batch: int) -> bytes:
+        results = []
+        for i in range(batch * RESULTS_PER_SEARCH, (batch + 1) * RESULTS_PER_SEARCH):
+            results.append(
+                f'<div class="g"><a href="{self.site_url(i)}"><h3>Bench Realty {i} | Zillow</h3></a>'
+                f'<div class="VwiC3b">Top agents in {NEIGHBORHOODS[i % len(NEIGHBORHOODS)]}.</div></div>'
+            )
+        return ("<!DOCTYPE html><html><head><title>Search</title><script>" + "var g=1;" * 20000
+                + "</script></head><body>" + "".join(results) + "</body></html>").encode()
+
+    def _send(self, body: bytes, status: int = 200):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_trickled(self, body: bytes):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        view = memoryview(body)
+        with contextlib.suppress(OSError):
+            for i in range(0, len(body), self.trickle_chunk):
+                self.wfile.write(view[i:i + self.trickle_chunk])
+                time.sleep(self.trickle_delay)
+
+    def _send_endless(self):
+        # No length and a script that never ends: only SCRAPE_MAX_BYTES stops the reader
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        chunk = b"window.__STATE__.push('" + b"x" * 8000 + b"');\n"
+        with contextlib.suppress(OSError):
+            self.wfile.write(b"<html><head><title>Endless</title></head><body><script>")
+            while True:
+                self.wfile.write(chunk)
+
+    def log_message(self, *args):
+        pass
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Readers hang up on purpose once their byte or text budget is filled
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def start_fixture_servers(hosts: int):
+    servers = []
+    for port in [SEARCH_PORT] + [free_port() for _ in range(hosts - 1)]:
+        server = FixtureServer(("127.0.0.1", port), FixtureSite)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    FixtureSite.ports = [server.server_address[1] for server in servers]
+    return servers
+
+def percentiles(values) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    rank = lambda q: ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": rank(0.50) * 1000,
+        "p95_ms": rank(0.95) * 1000,
+        "p99_ms": rank(0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+def discover(agencies: int, samples: dict):
+    """
+    Runs discover_agencies until `agencies` results are found and fills in
+    the columns an uploaded CSV would carry.
+    """
+    rows = []
+    for batch in range(math.ceil(agencies / RESULTS_PER_SEARCH)):
+        start = time.perf_counter()
+        results = discover_agencies(f"site:zillow.com realtors {batch}")
+        samples.setdefault("discovery", []).append(time.perf_counter() - start)
+        for result in results:
+            i = len(rows)
+            rows.append({
+                "agency_name": result["agency_name"],
+                "website": result["website"],
+                "owner_name": f"Owner {i}",
+                "phone": f"+1305555{i % 10000:04d}",
+                "email": f"owner{i}@example.com",
+                "city": "Miami",
+                "state": "FL",
+                "num_listings": (5, 20, 60, 120)[i % 4],
+                "google_rating": (3.2, 4.1, 4.6, 4.9)[i % 4],
+            })
+    return rows[:agencies]
+
+def enrich(rows, args, samples: dict):
+    stage_metrics.listeners.append(lambda stage, seconds: samples.setdefault(stage, []).append(seconds))
+    try:
+        pipeline = EnrichmentPipeline(
+            fetch_concurrency=args.fetch_concurrency, per_host_limit=args.per_host_limit,
+            analyze_concurrency=args.analyze_concurrency, generate_concurrency=args.generate_concurrency
+        )
+        return pipeline.run_sync(rows, total=len(rows))
+    finally:
+        stage_metrics.listeners.clear()
+
+def memory_peaks():
+    """
+    Time and peak traced memory of scrape_homepage on each kind of page, in
+    the streaming and soup modes (soup never returns on the endless page).
+    Timing and memory are taken in separate calls; tracemalloc skews timings.
+    """
+    site = {kind: next(i for i in range(1000) if FixtureSite.kind(i) == kind)
+            for kind in ["typical2"] + PATHOLOGICAL}
+    peaks = {}
+    mode = agency_intelligence.SCRAPE_MODE
+    try:
+        for kind, i in site.items():
+            peaks[kind] = {}
+            for scrape_mode in ("stream", "soup"):
+                if scrape_mode == "soup" and kind == "endless":
+                    continue
+                agency_intelligence.SCRAPE_MODE = scrape_mode
+                start = time.perf_counter()
+                text = scrape_homepage(FixtureSite.site_url(i))
+                elapsed = time.perf_counter() - start
+                tracemalloc.start()
+                scrape_homepage(FixtureSite.site_url(i))
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                peaks[kind][scrape_mode] = {"peak_mb": peak / 2**20, "elapsed_ms": elapsed * 1000, "chars": len(text)}
+    finally:
+        agency_intelligence.SCRAPE_MODE = mode
+    return peaks
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_report(result, out):
+    run = result["enrichment"]
+    print(f"{run['agencies']} agencies: {run['rows_per_s']:.1f} rows/s "
+          f"({run['written']} written, {run['failed']} failed in {run['elapsed_s']:.1f}s)", file=out)
+    print(f"{'stage':<16} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}", file=out)
+    for stage in STAGES:
+        stats = result["stages"].get(stage)
+        if stats and stats["count"]:
+            print(f"{stage:<16} {stats['count']:>6} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}", file=out)
+    if result["memory"]:
+        print(f"\n{'page':<12} {'stream MB':>10} {'ms':>8} {'soup MB':>9} {'ms':>8}", file=out)
+        for kind, modes in result["memory"].items():
+            stream, soup = modes.get("stream"), modes.get("soup")
+            soup_cols = f"{soup['peak_mb']:>9.2f} {soup['elapsed_ms']:>8.0f}" if soup else f"{'n/a':>9} {'':>8}"
+            print(f"{kind:<12} {stream['peak_mb']:>10.2f} {stream['elapsed_ms']:>8.0f} {soup_cols}", file=out)
+
+def print_comparison(old, new, out):
+    def rows():
+        yield "rows/s", old["enrichment"]["rows_per_s"], new["enrichment"]["rows_per_s"]
+        for stage in STAGES:
+            for q in ("p50_ms", "p95_ms"):
+                yield f"{stage} {q}", old["stages"].get(stage, {}).get(q), new["stages"].get(stage, {}).get(q)
+        for kind in new["memory"]:
+            yield (f"{kind} stream MB", old["memory"].get(kind, {}).get("stream", {}).get("peak_mb"),
+                   new["memory"][kind]["stream"]["peak_mb"])
+
+    print(f"\ncompared with {old.get('git_commit')} ({old.get('timestamp')})", file=out)
+    print(f"{'metric':<26} {'before':>10} {'after':>10} {'change':>8}", file=out)
+    for name, before, after in rows():
+        if before is None or after is None:
+            continue
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"{name:<26} {before:>10.2f} {after:>10.2f} {change:>8}", file=out)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agencies", type=int, default=200)
+    parser.add_argument("--hosts", type=int, default=8, help="fixture servers the sites are spread over")
+    parser.add_argument("--pathological-every", type=int, default=25, help="every Nth site is pathological (0 = none)")
+    parser.add_argument("--gpt-latency", type=float, default=0.3, help="stub response time (s)")
+    parser.add_argument("--gpt-jitter", type=float, default=0.1, help="extra random stub response time (s)")
+    parser.add_argument("--fetch-concurrency", type=int, default=ENRICH_FETCH_CONCURRENCY)
+    parser.add_argument("--per-host-limit", type=int, default=ENRICH_PER_HOST_LIMIT)
+    parser.add_argument("--analyze-concurrency", type=int, default=ENRICH_ANALYZE_CONCURRENCY)
+    parser.add_argument("--generate-concurrency", type=int, default=ENRICH_GENERATE_CONCURRENCY)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the memory pass")
+    parser.add_argument("--output", default="bench_enrichment.json")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    FixtureSite.render()
+    FixtureSite.pathological_every = args.pathological_every
+    servers = start_fixture_servers(args.hosts)
+    stub = OpenAIStub(OPENAI_PORT, args.gpt_latency, args.gpt_jitter).start()
+    init_db()
+    samples = {}
+    try:
+        # The pipeline prints per-row failures; keep the report readable
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            rows = discover(args.agencies, samples)
+            summary = enrich(rows, args, samples)
+            memory = memory_peaks() if args.memory else {}
+    finally:
+        stub.stop()
+        for server in servers:
+            server.shutdown()
+
+    result = {
+        "benchmark": "enrichment",
+        "git_commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            "agencies": args.agencies, "hosts": args.hosts, "pathological_every": args.pathological_every,
+            "gpt_latency_s": args.gpt_latency, "gpt_jitter_s": args.gpt_jitter,
+            "fetch_concurrency": args.fetch_concurrency, "per_host_limit": args.per_host_limit,
+            "analyze_concurrency": args.analyze_concurrency, "generate_concurrency": args.generate_concurrency,
+            "scrape_mode": agency_intelligence.SCRAPE_MODE,
+        },
+        "enrichment": {
+            "agencies": len(rows),
+            "written": summary["written"],
+            "failed": summary["failed"],
+            "elapsed_s": summary["elapsed"],
+            "rows_per_s": summary["written"] / summary["elapsed"] if summary["elapsed"] else None,
+            "gpt_requests": stub.requests,
+            "prompt_tokens": stub.prompt_tokens,
+            "completion_tokens": stub.completion_tokens,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        "stages": {stage: percentiles(values) for stage, values in sorted(samples.items())},
+        "memory": memory,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    print_report(result, sys.stdout)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(json.load(f), result, sys.stdout)
+    print(f"\nresults written to {args.output}")
+
+if __name__ == "__main__":
+    main()
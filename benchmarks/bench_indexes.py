@@ -0,0 +1,178 @@
+"""
+Query benchmark for the Lead / AgencyLead index set.
+
+Seeds a scratch SQLite database with synthetic leads and agencies, runs the
+dashboard, picker and pipeline queries with only the legacy indexes, then
+creates the workload indexes through migrations.create_missing_indexes and runs
+them again. Prints EXPLAIN QUERY PLAN output and median timings for both.
+
+    python benchmarks/bench_indexes.py --leads 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, select, text
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Lead, AgencyLead
+from migrations import create_missing_indexes
+from dashboard import get_dashboard_metrics, get_lead_page, get_uncontacted_leads, get_unbooked_leads, rebuild_counters
+
+LEGACY_INDEXES = {"ix_leads_id", "ix_leads_name", "ix_agency_leads_id", "ix_agency_leads_agency_name"}
+SOURCES = ["Zillow", "Realtor.com", "Facebook Ads", "Google Ads", "Website", "Open House"]
+TIERS = ["Tier 1 – Enterprise", "Tier 2 – Growth Agency", "Tier 3 – Solo Agent"]
+
+def drop_workload_indexes(engine):
+    for table in (Lead.__table__, AgencyLead.__table__):
+        for index in table.indexes:
+            if index.name not in LEGACY_INDEXES:
+                index.drop(bind=engine, checkfirst=True)
+
+def stamp(dt):
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+def seed(engine, leads, agencies, chunk=50_000):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    span = 2 * 365 * 24 * 3600
+    with engine.begin() as conn:
+        for offset in range(0, leads, chunk):
+            rows = []
+            for i in range(offset, min(offset + chunk, leads)):
+                created = start + timedelta(seconds=span * i / leads)
+                status = rng.choices(["HOT", "WARM", "COLD"], [15, 35, 50])[0]
+                # Older leads have almost all been worked; the recent tail has not
+                contacted = created + timedelta(minutes=rng.randint(1, 600)) if rng.random() < (0.97 if i < leads * 0.99 else 0.3) else None
+                budget = rng.randrange(100_000, 3_000_000, 10_000)
+                rows.append((
+                    f"Lead {i}", f"lead{i}@example.com", f"555{i:07d}", budget, rng.choice(SOURCES), status,
+                    rng.random() < 0.05, budget * 0.025, 60.0,
+                    stamp(created), stamp(contacted) if contacted else None,
+                    (contacted - created).total_seconds() / 60 if contacted else None
+                ))
+            conn.exec_driver_sql(
+                "INSERT INTO leads (name, email, phone, budget, source, lead_status, appointment_booked,"
+                " estimated_commission, close_probability, created_at, last_contacted, response_time_minutes)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        for offset in range(0, agencies, chunk):
+            rows = []
+            for i in range(offset, min(offset + chunk, agencies)):
+                created = start + timedelta(seconds=span * i / agencies)
+                rows.append((
+                    f"Agency {i}", f"agency{i}.example.com", rng.choice(TIERS), rng.randint(1, 10),
+                    rng.choices(["PENDING", "GENERATED", "SENT"], [5, 60, 35])[0], stamp(created)
+                ))
+            conn.exec_driver_sql(
+                "INSERT INTO agency_leads (agency_name, website, tier, score, outreach_status, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+
+def workloads(mid_cursor):
+    return {
+        "dashboard metrics": lambda db: get_dashboard_metrics(db),
+        "lead table page 1": lambda db: get_lead_page(db),
+        "lead table deep page": lambda db: get_lead_page(db, after=mid_cursor),
+        "uncontacted picker": lambda db: get_uncontacted_leads(db),
+        "unbooked picker": lambda db: get_unbooked_leads(db),
+        "newest HOT leads": lambda db: db.execute(
+            select(Lead.id).where(Lead.lead_status == "HOT").order_by(Lead.created_at.desc()).limit(50)
+        ).all(),
+        "agency pipeline page": lambda db: db.execute(
+            select(AgencyLead.id, AgencyLead.agency_name).order_by(AgencyLead.created_at.desc()).limit(50)
+        ).all(),
+        "pending outreach": lambda db: db.execute(
+            select(AgencyLead.id).where(AgencyLead.outreach_status == "PENDING")
+            .order_by(AgencyLead.created_at).limit(50)
+        ).all(),
+        "top Tier 1 agencies": lambda db: db.execute(
+            select(AgencyLead.id).where(AgencyLead.tier == TIERS[0]).order_by(AgencyLead.score.desc()).limit(50)
+        ).all(),
+    }
+
+def run_phase(engine, Session, label, mid_cursor, repeat):
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    print(f"\n=== {label} ===")
+    results = {}
+    for name, fn in workloads(mid_cursor).items():
+        db = Session()
+        try:
+            event.listen(engine, "before_cursor_execute", capture)
+            captured.clear()
+            fn(db)
+            event.remove(engine, "before_cursor_execute", capture)
+            statement, parameters = captured[-1]
+
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn(db)
+                timings.append(time.perf_counter() - start)
+            results[name] = statistics.median(timings)
+
+            plan = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        finally:
+            db.close()
+        print(f"{name:<24} {results[name] * 1000:>9.2f} ms")
+        for row in plan:
+            print(f"    {row[-1]}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=1_000_000)
+    parser.add_argument("--agencies", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", help="database file (default: a temporary file)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="bench_indexes_"), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Session = sessionmaker(bind=engine)
+
+    Base.metadata.create_all(bind=engine)
+    drop_workload_indexes(engine)
+    started = time.perf_counter()
+    seed(engine, args.leads, args.agencies)
+    with Session() as db:
+        # The seed bypasses the write paths that keep the counters in step
+        rebuild_counters(db)
+        db.commit()
+    print(f"Seeded {args.leads:,} leads and {args.agencies:,} agencies in {time.perf_counter() - started:.1f}s ({path})")
+
+    with engine.connect() as conn:
+        mid = conn.execute(text("SELECT created_at, id FROM leads ORDER BY id LIMIT 1 OFFSET :n"),
+                           {"n": args.leads // 2}).one()
+    mid_cursor = (datetime.fromisoformat(mid[0]), mid[1])
+
+    before = run_phase(engine, Session, "legacy indexes only", mid_cursor, args.repeat)
+
+    started = time.perf_counter()
+    create_missing_indexes(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    print(f"\nCreated workload indexes in {time.perf_counter() - started:.1f}s")
+
+    after = run_phase(engine, Session, "workload indexes", mid_cursor, args.repeat)
+
+    print(f"\n{'query':<24} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name in before:
+        print(f"{name:<24} {before[name] * 1000:>10.2f} {after[name] * 1000:>10.2f} {before[name] / after[name]:>7.1f}x")
+
+    if not args.db:
+        os.remove(path)
+
+if __name__ == "__main__":
+    main()
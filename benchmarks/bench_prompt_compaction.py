@@ -0,0 +1,109 @@
+"""
+Prompt compaction benchmark over a corpus of fixture homepages (small to
+1000-listing pages, some with long neighborhood guides or behind inline
+scripts, each with and without lead-capture signals). For each page
+compares the analysis prompt built from
+  * before: the first SCRAPE_TEXT_BUDGET characters of extracted text, and
+  * after:  SCRAPE_SCAN_CHARS of text compacted into PROMPT_TOKEN_BUDGET tokens
+by prompt tokens, recall of the page's lead-capture signal sentences (what the
+analysis is mostly asked to judge), share of boilerplate text, and
+extraction + compaction time. Tokens are counted with tiktoken when it is
+installed, else estimated at 4 characters per token.
+
+    python benchmarks/bench_prompt_compaction.py --budgets 300 500 800
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agency_intelligence import (
+    extract_homepage_stream, _analysis_request, SCRAPE_TEXT_BUDGET, SCRAPE_SCAN_CHARS, SCRAPE_CHUNK_SIZE
+)
+from llm_dispatch import approx_tokens
+from prompt_compaction import compact_homepage, PROMPT_TOKEN_BUDGET
+from fixtures import brokerage_page, BOILERPLATE, SIGNALS
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+    count_tokens = lambda text: len(_encoding.encode(text))
+    TOKENIZER = "tiktoken o200k_base"
+except ImportError:
+    count_tokens = approx_tokens
+    TOKENIZER = "estimate (4 chars/token)"
+
+CORPUS = [
+    dict(listings=listings, guides=guides, inline_js_kb=js, signals=signals, seed=seed)
+    for seed, (listings, guides, js) in enumerate([
+        (10, 0, 0), (40, 0, 0), (150, 0, 0), (400, 0, 0), (1000, 0, 0),
+        (20, 40, 0), (150, 120, 0), (40, 0, 256), (400, 60, 256),
+    ])
+    for signals in (True, False)
+]
+
+def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+def measure(html: bytes, compact_budget=None):
+    start = time.perf_counter()
+    if compact_budget is None:
+        text = extract_homepage_stream(chunked(html, SCRAPE_CHUNK_SIZE), "utf-8", SCRAPE_TEXT_BUDGET)
+    else:
+        text = compact_homepage(
+            extract_homepage_stream(chunked(html, SCRAPE_CHUNK_SIZE), "utf-8", SCRAPE_SCAN_CHARS), compact_budget
+        )
+    elapsed = time.perf_counter() - start
+    prompt, _ = _analysis_request(text, "Sunset Realty Group")
+    boilerplate = sum(text.count(phrase) * len(phrase) for phrase in BOILERPLATE)
+    return {
+        "prompt_tokens": count_tokens(prompt),
+        "text_tokens": count_tokens(text),
+        "signals": sum(signal in text for signal in SIGNALS),
+        "boilerplate": boilerplate / len(text) if text else 0.0,
+        "ms": elapsed * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[PROMPT_TOKEN_BUDGET],
+                        help="PROMPT_TOKEN_BUDGET values to compare")
+    parser.add_argument("--verbose", action="store_true", help="print every page")
+    args = parser.parse_args()
+
+    pages = [(spec, brokerage_page(**spec).encode("utf-8")) for spec in CORPUS]
+    print(f"{len(pages)} pages, tokens counted with {TOKENIZER}")
+    runs = [("before", None)] + [(f"budget {budget}", budget) for budget in args.budgets]
+    signal_pages = sum(spec["signals"] for spec, _ in pages)
+
+    totals = {}
+    for label, budget in runs:
+        results = [measure(html, budget) for _, html in pages]
+        totals[label] = results
+        if args.verbose:
+            print(f"\n{label}")
+            for (spec, html), r in zip(pages, results):
+                print(f"  {spec['listings']:>5} listings {spec['guides']:>3} guides js={spec['inline_js_kb']:>3}KB"
+                      f" signals={spec['signals']!s:<5}"
+                      f" {len(html) / 1024:>6.0f}KB -> {r['prompt_tokens']:>5} prompt tokens,"
+                      f" {r['signals']}/{len(SIGNALS) if spec['signals'] else 0} signals, {r['ms']:.1f} ms")
+
+    print(f"\n{'':<12} {'prompt tokens':>14} {'page text':>10} {'reduction':>10} {'signal recall':>14}"
+          f" {'boilerplate':>12} {'ms/page':>8}")
+    before_tokens = sum(r["prompt_tokens"] for r in totals["before"])
+    for label, results in totals.items():
+        prompt_tokens = sum(r["prompt_tokens"] for r in results)
+        text_tokens = sum(r["text_tokens"] for r in results)
+        recall = sum(r["signals"] for r in results) / (signal_pages * len(SIGNALS))
+        boilerplate = sum(r["boilerplate"] for r in results) / len(results)
+        ms = sum(r["ms"] for r in results) / len(results)
+        reduction = f"{(1 - prompt_tokens / before_tokens) * 100:.1f}%" if label != "before" else ""
+        print(f"{label:<12} {prompt_tokens:>14} {text_tokens:>10} {reduction:>10} {recall:>14.0%}"
+              f" {boilerplate:>12.0%} {ms:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Homepage extraction benchmark: full BeautifulSoup parse (extract_homepage_text)
+versus the streaming, size-capped parser (extract_homepage_stream) on fixture
+pages from small to multi-megabyte with huge inline JavaScript.
+
+    python benchmarks/bench_scrape_extract.py
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agency_intelligence import extract_homepage_text, extract_homepage_stream, SCRAPE_CHUNK_SIZE
+from fixtures import brokerage_page
+
+PAGES = {
+    "small (40 listings)": dict(listings=40),
+    "medium (400 listings)": dict(listings=400),
+    "large (3000 listings)": dict(listings=3000),
+    "inline JS 4MB + 3000 listings": dict(listings=3000, inline_js_kb=4096),
+}
+
+def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+def measure(fn, repeat):
+    # Timing and memory are taken in separate passes; tracemalloc skews timings
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'page':<32} {'size':>9} {'soup ms':>9} {'soup MB':>8} {'chars':>6}"
+          f" {'stream ms':>10} {'stream MB':>10} {'chars':>6} {'read KB':>8}")
+    for label, spec in PAGES.items():
+        html = brokerage_page(**spec)
+        body = html.encode("utf-8")
+
+        soup_text, soup_time, soup_peak = measure(lambda: extract_homepage_text(body.decode("utf-8")), args.repeat)
+
+        consumed = [0]
+        def stream():
+            consumed[0] = 0
+            def counting():
+                for chunk in chunked(body, SCRAPE_CHUNK_SIZE):
+                    consumed[0] += len(chunk)
+                    yield chunk
+            return extract_homepage_stream(counting(), "utf-8")
+        stream_text, stream_time, stream_peak = measure(stream, args.repeat)
+
+        print(f"{label:<32} {len(body) / 1024:>7.0f}KB {soup_time * 1000:>9.1f} {soup_peak / 2**20:>8.1f}"
+              f" {len(soup_text):>6} {stream_time * 1000:>10.1f} {stream_peak / 2**20:>10.1f}"
+              f" {len(stream_text):>6} {consumed[0] / 1024:>8.0f}")
+
+if __name__ == "__main__":
+    main()
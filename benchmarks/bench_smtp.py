@@ -0,0 +1,109 @@
+"""
+SMTP throughput benchmark against a local aiosmtpd stand-in.
+
+Compares the old per-message transport (new connection + login for every
+email, run inline on the event loop) with the pooled transport used by
+communication.send_email_lead. Reports messages/second and the longest
+event-loop stall observed while sending.
+
+    pip install aiosmtpd
+    python benchmarks/bench_smtp.py --messages 500
+"""
+import argparse
+import asyncio
+import logging
+import os
+import smtplib
+import sys
+import time
+from email.mime.text import MIMEText
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+from communication import SMTPPool
+from helpers import free_port
+
+class CountingHandler:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.count = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.count += 1
+        return "250 OK"
+
+def make_message(i):
+    msg = MIMEText("Hi, just checking in on your home search.")
+    msg["From"] = "agent@example.com"
+    msg["To"] = f"buyer{i}@example.com"
+    msg["Subject"] = "Quick question regarding your home search"
+    return msg
+
+async def watch_loop_lag(stop: asyncio.Event, interval: float = 0.005):
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        worst = max(worst, loop.time() - start - interval)
+    return worst
+
+async def run_legacy(host, port, n):
+    for i in range(n):
+        with smtplib.SMTP(host, port) as server:
+            server.login("agent", "secret")
+            server.send_message(make_message(i))
+
+async def run_pooled(host, port, n, size):
+    pool = SMTPPool(host, port, "agent", "secret", starttls=False, size=size)
+    await asyncio.gather(*(asyncio.to_thread(pool.send, make_message(i)) for i in range(n)))
+    pool.close()
+
+async def measure(label, coro):
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop_lag(stop))
+    await asyncio.sleep(0.01)  # let the watcher arm its first timer
+    start = time.perf_counter()
+    await coro
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lag = await watcher
+    return label, elapsed, lag
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated server latency per message (s)")
+    args = parser.parse_args()
+    # aiosmtpd logs a deprecation warning on every AUTH
+    logging.getLogger("mail.log").setLevel(logging.ERROR)
+
+    port = free_port()
+
+    handler = CountingHandler(args.latency)
+    controller = Controller(handler, hostname="127.0.0.1", port=port,
+                            authenticator=lambda *a: AuthResult(success=True), auth_require_tls=False)
+    controller.start()
+    try:
+        async def run_all():
+            return [
+                await measure("legacy (connect per message, inline)", run_legacy("127.0.0.1", port, args.messages)),
+                await measure(f"pooled ({args.pool_size} connections, threaded)",
+                              run_pooled("127.0.0.1", port, args.messages, args.pool_size)),
+            ]
+        results = asyncio.run(run_all())
+    finally:
+        controller.stop()
+
+    print(f"{'transport':<42} {'msgs/s':>10} {'max loop stall (ms)':>20}")
+    for label, elapsed, lag in results:
+        print(f"{label:<42} {args.messages / elapsed:>10.1f} {lag * 1000:>20.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Concurrency benchmark for POST /submit-lead: async session path vs the old
+synchronous one.
+
+Drives the FastAPI app in-process over httpx's ASGI transport with a fixed
+number of concurrent clients, against a scratch SQLite database:
+
+    sync    the previous handler: SessionLocal from get_db, add/commit/refresh
+            inside the async route, blocking the event loop
+    async   the current handler: group commit through AsyncSession
+
+Both run the same scoring, Telegram alert and drip scheduling. Reports
+requests/second, p50/p99 latency and failed requests. With more concurrent
+requests than pooled connections the sync handler can stall the loop while
+waiting for a connection that only the loop can release, so DB_POOL_TIMEOUT
+is lowered here to surface those failures quickly.
+
+    python benchmarks/bench_submit_async.py --requests 300 --concurrency 20
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_POOL_TIMEOUT", "2")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_submit_'), 'bench.db')}")
+
+import httpx
+from fastapi import Depends, Form
+from fastapi.responses import HTMLResponse
+
+import main
+from database import get_db
+from models import Lead
+from lead_scoring import calculate_lead_score
+from dashboard import count_new_leads
+
+FORM = {
+    "name": "Bench Buyer", "email": "buyer@example.com", "phone": "5550100",
+    "budget": "750000", "area": "Austin", "property_type": "House",
+    "timeframe": "ASAP", "mortgage_status": "approved", "cash_buyer": "false",
+    "sms_opt_in": "true", "message": "Looking to buy soon"
+}
+
+@main.app.post("/bench/submit-lead-sync")
+async def submit_lead_sync(
+    name: str = Form(...), email: str = Form(...), phone: str = Form(...), budget: float = Form(...),
+    area: str = Form(...), property_type: str = Form(...), timeframe: str = Form(...),
+    source: str = Form("Website"), mortgage_status: str = Form(...), cash_buyer: bool = Form(False),
+    sms_opt_in: bool = Form(False), message: str = Form(""), db=Depends(get_db)
+):
+    scoring_result = calculate_lead_score({
+        "budget": budget, "timeframe": timeframe, "mortgage_status": mortgage_status,
+        "cash_buyer": cash_buyer, "message": message
+    })
+    new_lead = Lead(
+        name=name, email=email, phone=phone, budget=budget, area=area, property_type=property_type,
+        timeframe=timeframe, source=source, mortgage_status=mortgage_status, cash_buyer=cash_buyer,
+        message=message, score=scoring_result['score'], lead_status=scoring_result['status'],
+        close_probability=scoring_result['probability'], recommended_action=scoring_result['action'],
+        sms_opt_in=sms_opt_in, estimated_commission=scoring_result['commission']
+    )
+    db.add(new_lead)
+    db.flush()
+    count_new_leads(db, [new_lead])
+    db.commit()
+    db.refresh(new_lead)
+
+    asyncio.create_task(main.send_telegram_alert({
+        "name": name, "budget": budget, "area": area, "timeframe": timeframe,
+        "status": scoring_result['status'], "probability": scoring_result['probability'],
+        "action": scoring_result['action']
+    }))
+    asyncio.create_task(main.schedule_lead_follow_ups(new_lead.id))
+    return HTMLResponse(content="<h2>Thank you for your inquiry! An agent will contact you shortly.</h2>")
+
+# Each request is a different buyer, so intake inserts rather than merging repeats
+buyer_ids = itertools.count()
+
+def form_data():
+    i = next(buyer_ids)
+    return dict(FORM, email=f"buyer{i}@example.com", phone=f"+1555{i:07d}")
+
+async def run(path, requests, concurrency):
+    latencies = []
+    failed = 0
+    remaining = iter(range(requests))
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def client_loop():
+            nonlocal failed
+            for _ in remaining:
+                start = time.perf_counter()
+                response = await client.post(path, data=form_data())
+                latencies.append(time.perf_counter() - start)
+                failed += response.status_code != 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return requests / elapsed, statistics.median(latencies), p99, failed
+
+async def drain_background_tasks():
+    # The ingest queue's worker runs until shutdown, so it is not waited for
+    while True:
+        pending = [task for task in asyncio.all_tasks()
+                   if task is not asyncio.current_task() and task is not main.ingest_queue._worker and not task.done()]
+        if not pending:
+            return
+        await asyncio.wait(pending)
+
+async def main_async(args):
+    async with main.app.router.lifespan_context(main.app):
+        print(f"{'mode':<7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'failed':>7}", file=sys.__stdout__)
+        for mode, path in (("sync", "/bench/submit-lead-sync"), ("async", "/submit-lead")):
+            await run(path, min(100, args.requests), args.concurrency)  # warm-up
+            rps, p50, p99, failed = await run(path, args.requests, args.concurrency)
+            print(f"{mode:<7} {rps:>9.1f} {p50 * 1000:>9.2f} {p99 * 1000:>9.2f} {failed:>7}", file=sys.__stdout__)
+            # Let the alert and drip tasks of this mode finish before the next one,
+            # or they compete with its requests for the loop and the database
+            await drain_background_tasks()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    # Unconfigured Telegram alerts print every lead; keep the report readable
+    print(f"{args.requests} requests, {args.concurrency} concurrent clients")
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            asyncio.run(main_async(args))
@@ -0,0 +1,305 @@
+"""
+Load test for POST /submit-lead with every outside service replaced by a
+local stand-in: Telegram by a stub Bot API server, SMTP by an aiosmtpd
+server. SMS has no network transport yet (communication.send_sms_lead is a
+print stub), so it runs as is. Each request is a distinct buyer.
+
+Drives main.app in-process at the given concurrency after a warm-up, then
+lets the background alerts and drip enrollments finish, and finally makes
+every enrolled drip step due and runs the drip poller once over them.
+Reports throughput, p50/p95/p99 latency and the same percentiles per stage
+(form_parse, scoring, lead_save = queueing + group commit, task_scheduling,
+plus the background stages), and writes them to a JSON file so runs can be
+compared between commits:
+
+    pip install aiosmtpd
+    python benchmarks/bench_submit_lead.py --requests 2000 --concurrency 50 --output before.json
+    python benchmarks/bench_submit_lead.py --requests 2000 --concurrency 50 --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from helpers import free_port
+
+TELEGRAM_PORT = free_port()
+SMTP_PORT = free_port()
+
+# Everything below is read at import time or per call, so set it before importing the app
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_submit_lead_'), 'bench.db')}")
+os.environ.update({
+    "TELEGRAM_BOT_TOKEN": "123456:bench",
+    "TELEGRAM_CHAT_ID": "-1001",
+    "TELEGRAM_API_URL": f"http://127.0.0.1:{TELEGRAM_PORT}/bot",
+    # Measure the app, not the Telegram flood-control pacing
+    "TELEGRAM_GLOBAL_RATE": "100000",
+    "TELEGRAM_CHAT_RATE": "6000000",
+    "SMTP_SERVER": "127.0.0.1",
+    "SMTP_PORT": str(SMTP_PORT),
+    "SMTP_USER": "agent",
+    "SMTP_PASSWORD": "secret",
+    "SMTP_STARTTLS": "0",
+    "DRIP_POLL_INTERVAL": "3600",  # the benchmark runs the poller itself
+})
+
+import httpx
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+from sqlalchemy import update
+
+import main
+import scheduler
+from database import SessionLocal, engine
+from models import DripStep
+from tracing import stage_metrics
+
+FORM = {
+    "name": "Bench Buyer", "budget": "750000", "area": "Austin", "property_type": "Condo",
+    "timeframe": "3 months", "mortgage_status": "approved", "cash_buyer": "false",
+    "sms_opt_in": "true", "message": "Looking to buy soon"
+}
+REQUEST_STAGES = ["form_parse", "scoring", "lead_save", "task_scheduling"]
+
+class TelegramStub(BaseHTTPRequestHandler):
+    """
+    Answers getMe and sendMessage like the Bot API, after `latency` seconds.
+    """
+    latency = 0.0
+    messages = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.latency:
+            time.sleep(self.latency)
+        if self.path.endswith("/getMe"):
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        else:
+            with TelegramStub.lock:
+                TelegramStub.messages += 1
+                message_id = TelegramStub.messages
+            result = {"message_id": message_id, "date": int(time.time()),
+                      "chat": {"id": int(os.environ["TELEGRAM_CHAT_ID"]), "type": "supergroup"}, "text": "ok"}
+        body = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class SMTPStub:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.messages = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.messages += 1
+        return "250 OK"
+
+def percentiles(values) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    rank = lambda q: ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": rank(0.50) * 1000,
+        "p95_ms": rank(0.95) * 1000,
+        "p99_ms": rank(0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+buyer_ids = itertools.count()
+
+async def drive(client, requests: int, concurrency: int):
+    latencies = []
+    failed = 0
+    remaining = iter(range(requests))
+
+    async def client_loop():
+        nonlocal failed
+        for _ in remaining:
+            i = next(buyer_ids)
+            data = dict(FORM, email=f"buyer{i}@example.com", phone=f"+1555{i:07d}")
+            start = time.perf_counter()
+            response = await client.post("/submit-lead", data=data)
+            latencies.append(time.perf_counter() - start)
+            failed += response.status_code != 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return latencies, failed, time.perf_counter() - start
+
+async def wait_for(condition, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    return condition()
+
+async def run(args, smtp_stub):
+    samples = {}
+    stage_metrics.listeners.append(lambda stage, seconds: samples.setdefault(stage, []).append(seconds))
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await drive(client, args.warmup, args.concurrency)
+            await wait_for(lambda: len(samples.get("drip_schedule", [])) >= args.warmup, 60)
+            samples.clear()
+
+            latencies, failed, elapsed = await drive(client, args.requests, args.concurrency)
+            settled = await wait_for(
+                lambda: len(samples.get("drip_schedule", [])) >= args.requests
+                and len(samples.get("alert_dispatch", [])) >= args.requests, args.settle_timeout
+            )
+
+        drips = {}
+        if args.drip_steps:
+            # Make every enrolled step due now and run one poller pass over them
+            with SessionLocal() as db:
+                db.execute(update(DripStep).where(DripStep.status == "PENDING").values(due_at=datetime.now(timezone.utc)))
+                db.commit()
+            emails_before, telegram_before = smtp_stub.messages, TelegramStub.messages
+            scheduler.DRIP_BATCH_SIZE = args.drip_batch
+            start = time.perf_counter()
+            await scheduler.poll_due_drips()
+            drip_elapsed = time.perf_counter() - start
+            steps = len(samples.get("drip_step", []))
+            drips = {
+                "steps": steps,
+                "elapsed_s": drip_elapsed,
+                "steps_per_s": steps / drip_elapsed if drip_elapsed else None,
+                "emails_received": smtp_stub.messages - emails_before,
+                "telegram_messages": TelegramStub.messages - telegram_before,
+                "step_latency": percentiles(samples.get("drip_step", [])),
+            }
+
+    stage_metrics.listeners.clear()
+    return {
+        "requests": {
+            "total": args.requests,
+            "failed": failed,
+            "elapsed_s": elapsed,
+            "throughput_rps": args.requests / elapsed,
+            "latency": percentiles(latencies),
+            "background_settled": settled,
+        },
+        "stages": {stage: percentiles(values) for stage, values in sorted(samples.items()) if stage != "drip_step"},
+        "drips": drips,
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_report(result, out):
+    req = result["requests"]
+    print(f"{req['total']} requests, {result['config']['concurrency']} concurrent: "
+          f"{req['throughput_rps']:.1f} req/s, {req['failed']} failed", file=out)
+    print(f"{'stage':<18} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}", file=out)
+    rows = [("request", req["latency"])] + [
+        (stage, result["stages"][stage]) for stage in REQUEST_STAGES + sorted(set(result["stages"]) - set(REQUEST_STAGES))
+        if stage in result["stages"]
+    ]
+    for name, stats in rows:
+        print(f"{name:<18} {stats['count']:>7} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}", file=out)
+    if result["drips"]:
+        drips = result["drips"]
+        print(f"drip poller: {drips['steps']} steps in {drips['elapsed_s']:.2f}s ({drips['steps_per_s']:.1f}/s), "
+              f"{drips['emails_received']} emails, {drips['telegram_messages']} Telegram reminders", file=out)
+
+def print_comparison(old, new, out):
+    def rows():
+        yield "throughput req/s", old["requests"]["throughput_rps"], new["requests"]["throughput_rps"]
+        for q in ("p50_ms", "p95_ms", "p99_ms"):
+            yield f"request {q}", old["requests"]["latency"].get(q), new["requests"]["latency"].get(q)
+        for stage in REQUEST_STAGES:
+            for q in ("p50_ms", "p99_ms"):
+                yield (f"{stage} {q}", old["stages"].get(stage, {}).get(q), new["stages"].get(stage, {}).get(q))
+
+    print(f"\ncompared with {old.get('git_commit')} ({old.get('timestamp')})", file=out)
+    print(f"{'metric':<26} {'before':>10} {'after':>10} {'change':>8}", file=out)
+    for name, before, after in rows():
+        if before is None or after is None:
+            continue
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"{name:<26} {before:>10.2f} {after:>10.2f} {change:>8}", file=out)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--telegram-latency", type=float, default=0.02, help="stub Bot API response time (s)")
+    parser.add_argument("--smtp-latency", type=float, default=0.01, help="stub SMTP DATA response time (s)")
+    parser.add_argument("--no-drips", dest="drip_steps", action="store_false", help="skip the drip poller pass")
+    parser.add_argument("--drip-batch", type=int, default=200)
+    parser.add_argument("--settle-timeout", type=float, default=120, help="seconds to wait for background tasks")
+    parser.add_argument("--output", default="bench_submit_lead.json")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    logging.getLogger("mail.log").setLevel(logging.ERROR)
+    TelegramStub.latency = args.telegram_latency
+    telegram = ThreadingHTTPServer(("127.0.0.1", TELEGRAM_PORT), TelegramStub)
+    threading.Thread(target=telegram.serve_forever, daemon=True).start()
+    smtp_stub = SMTPStub(args.smtp_latency)
+    smtp = Controller(smtp_stub, hostname="127.0.0.1", port=SMTP_PORT,
+                      authenticator=lambda *a: AuthResult(success=True), auth_require_tls=False)
+    smtp.start()
+    try:
+        # The app prints every alert and drip; keep the report readable
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result = asyncio.run(run(args, smtp_stub))
+    finally:
+        smtp.stop()
+        telegram.shutdown()
+
+    result = {
+        "benchmark": "submit_lead",
+        "git_commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "config": {
+            "requests": args.requests, "concurrency": args.concurrency, "warmup": args.warmup,
+            "telegram_latency_s": args.telegram_latency, "smtp_latency_s": args.smtp_latency,
+        },
+        **result,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    print_report(result, sys.stdout)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(json.load(f), result, sys.stdout)
+    print(f"\nresults written to {args.output}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,93 @@
+"""
+Synthetic brokerage homepages shared by the benchmarks.
+Pages are deterministic for a given seed so runs are comparable between commits.
+"""
+import random
+
+NEIGHBORHOODS = ["Coral Gables", "Brickell", "Coconut Grove", "Wynwood", "Key Biscayne", "Aventura"]
+BOILERPLATE = [
+    "We use cookies to improve your browsing experience. By continuing you accept our cookie policy.",
+    "Accept all cookies. Manage preferences. Privacy policy. Terms of use.",
+    "Equal Housing Opportunity. All information deemed reliable but not guaranteed.",
+    "Listing courtesy of MLS. Data last updated today. Square footage is approximate.",
+]
+SIGNALS = [
+    "Chat with us 24/7 using our live chat assistant.",
+    "Text us anytime at (305) 555-0100 for instant answers.",
+    "Fill out our contact form and an agent will reach out within one business day.",
+    "Schedule a showing online with our automated booking calendar.",
+    "Sign up for instant SMS alerts when new listings hit the market.",
+    "Our team specializes in luxury waterfront estates and new construction condos.",
+]
+
+AGENTS = ["Maria Lopez", "James Carter", "Aisha Patel", "Tom Becker", "Lena Novak", "Chris Adeyemi"]
+ADJECTIVES = ["strong", "steady", "record", "cooling", "renewed", "seasonal"]
+FEATURES = ["tree-lined streets", "top-rated schools", "marina access", "walkable cafes", "quiet cul-de-sacs",
+            "historic architecture", "bay views", "weekend farmers markets"]
+GUIDE_TEMPLATES = [
+    "{hood} has seen {adj} demand this season, with {n} homes going under contract in the last month.",
+    "{agent} recently closed on a {beds}-bedroom home in {hood} after {n} days on the market.",
+    "Market update: median prices in {hood} moved {pct}% year over year as inventory stayed {adj}.",
+    "{hood} is known for its {feature}, {feature2} and an easy commute to downtown.",
+    "Ask {agent} about open houses in {hood} this weekend and the {feature} nearby.",
+]
+
+def guide_paragraph(rng):
+    return rng.choice(GUIDE_TEMPLATES).format(
+        hood=rng.choice(NEIGHBORHOODS), adj=rng.choice(ADJECTIVES), agent=rng.choice(AGENTS),
+        feature=rng.choice(FEATURES), feature2=rng.choice(FEATURES), n=rng.randint(3, 90),
+        beds=rng.randint(2, 6), pct=rng.randint(1, 14)
+    )
+
+def listing_card(rng, i):
+    beds = rng.randint(1, 6)
+    price = rng.randrange(300_000, 9_000_000, 5_000)
+    hood = rng.choice(NEIGHBORHOODS)
+    return (
+        f'<div class="listing"><h3>{beds} Bed Home in {hood}</h3>'
+        f'<p>${price:,} &middot; {beds + 1} baths &middot; {rng.randint(900, 8000):,} sqft</p>'
+        f'<p>{rng.choice(BOILERPLATE)}</p><a href="/listing/{i}">View details</a></div>\n'
+    )
+
+def brokerage_page(name: str = "Sunset Realty Group", listings: int = 40,
+                   inline_js_kb: int = 0, seed: int = 7, signals: bool = True, guides: int = 0) -> str:
+    """
+    Returns a homepage with a nav/header, cookie banner, `listings` listing
+    cards, `guides` neighborhood-guide paragraphs, optional lead-capture
+    signals near the bottom, an inline script of roughly `inline_js_kb` KB,
+    and a footer.
+    """
+    rng = random.Random(seed)
+    script = ""
+    if inline_js_kb:
+        line = "window.__STATE__.push({id: %d, payload: '" + "x" * 200 + "'});\n"
+        script = "<script>\nwindow.__STATE__ = [];\n" + "".join(
+            line % i for i in range(inline_js_kb * 1024 // (len(line) + 4))
+        ) + "</script>\n"
+
+    parts = [
+        "<!DOCTYPE html><html><head>",
+        f"<title>{name} | Homes for Sale in Miami</title>",
+        f'<meta name="description" content="{name} helps buyers and sellers across South Florida.">',
+        "<style>body{font-family:sans-serif} .listing{margin:1em}</style>",
+        "</head><body>",
+        f'<header><nav><a href="/">Home</a> <a href="/buy">Buy</a> <a href="/sell">Sell</a></nav></header>',
+        f'<div class="cookie-banner">{BOILERPLATE[0]} {BOILERPLATE[1]}</div>',
+        script,
+        f"<main><h1>Welcome to {name}</h1>",
+        "".join(listing_card(rng, i) for i in range(listings)),
+    ]
+    if guides:
+        # Drawn from their own generator so the listings match pages without guides
+        guide_rng = random.Random(seed + 1)
+        parts.append('<section class="guides"><h2>Neighborhood guides</h2>'
+                     + "".join(f"<p>{guide_paragraph(guide_rng)}</p>" for _ in range(guides)) + "</section>")
+    if signals:
+        parts.append('<section class="about"><h2>Why work with us</h2>'
+                     + "".join(f"<p>{s}</p>" for s in SIGNALS) + "</section>")
+    parts += [
+        "</main>",
+        f"<footer><p>&copy; {name}. {BOILERPLATE[2]}</p></footer>",
+        "</body></html>",
+    ]
+    return "".join(parts)
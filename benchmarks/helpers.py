@@ -0,0 +1,13 @@
+"""
+Small utilities shared by the benchmarks (and the tests that start local servers).
+"""
+import socket
+
+def free_port() -> int:
+    """
+    A TCP port on 127.0.0.1 that nothing is listening on right now, for
+    local stand-in servers.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
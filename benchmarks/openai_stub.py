@@ -0,0 +1,150 @@
+"""
+Local stand-in for the OpenAI chat completions API, so the GPT stages can be
+benchmarked (and tested) without network access or cost. Point the client
+at it with OPENAI_BASE_URL=<stub.url> and any OPENAI_API_KEY.
+
+Requests asking for a JSON object get an agency analysis built from the
+lead-capture signals found in the prompt; other requests get a
+"Subject: ..." outreach email. Every response waits `latency` seconds
+(plus up to `jitter`) and reports token usage estimated at 4 characters
+per token.
+
+    python benchmarks/openai_stub.py --port 8089 --latency 0.3
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SIGNAL_WEAKNESSES = [
+    (("live chat", "chat with us"), "No chatbot"),
+    (("text us", "sms"), "No SMS follow-up"),
+    (("contact form",), "Manual contact forms"),
+    (("automated", "instant"), "No instant response system"),
+]
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def analysis_for(prompt: str) -> dict:
+    lowered = prompt.lower()
+    weaknesses = [weakness for keywords, weakness in SIGNAL_WEAKNESSES
+                  if not any(keyword in lowered for keyword in keywords)]
+    return {
+        "market": "Miami, FL",
+        "niche": "luxury" if "luxury" in lowered else "residential",
+        "target_audience": "Home buyers and sellers",
+        "positioning": "Local market authority",
+        "usp": "Neighborhood expertise",
+        "weaknesses": weaknesses or ["No automation mentioned"],
+        "opportunities": ["Speed to lead", "24/7 response", "Follow-up automation"],
+    }
+
+def outreach_for(prompt: str) -> str:
+    return ("Subject: Faster lead response for your team\n\n"
+            "Hi,\n\nWe help brokerages answer every inquiry within 60 seconds.\n"
+            "Do you have 15 minutes for a demo next week?\n\nReply STOP to unsubscribe.")
+
+class OpenAIStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def do_POST(self):
+        stub = self.server
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            return self._reply(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+        status = stub.next_status()
+        delay = stub.latency + (random.random() * stub.jitter if stub.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        if status != 200:
+            return self._reply(status, {"error": {"message": "stub error", "type": "rate_limit_error"}},
+                               {"Retry-After": "0"} if status == 429 else None)
+
+        prompt = "\n".join(str(m.get("content", "")) for m in payload.get("messages", []))
+        if (payload.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps(analysis_for(prompt))
+        else:
+            content = outreach_for(prompt)
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(content)
+        stub.record(prompt_tokens, completion_tokens)
+        self._reply(200, {
+            "id": f"chatcmpl-stub-{next(stub.ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    def _reply(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+class OpenAIStub(ThreadingHTTPServer):
+    """
+    The stub server. `fail_with` queues HTTP statuses (e.g. 429, 503) to
+    answer the next requests with; counters record what was served.
+    """
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0, jitter: float = 0.0):
+        super().__init__(("127.0.0.1", port), OpenAIStubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.ids = itertools.count(1)
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._failures = []
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def fail_with(self, *statuses: int):
+        with self._lock:
+            self._failures.extend(statuses)
+
+    def next_status(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self._failures.pop(0) if self._failures else 200
+
+    def record(self, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="openai-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per response")
+    args = parser.parse_args()
+    stub = OpenAIStub(args.port, args.latency, args.jitter)
+    print(f"OpenAI stub listening on {stub.url}")
+    stub.serve_forever()
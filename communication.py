@@ -1,5 +1,9 @@
+import asyncio
 import os
 import smtplib
+import threading
+import time
+from collections import deque
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
@@ -33,6 +37,123 @@ async def send_sms_lead(phone: str, message: str, opt_in: bool):
     print("---------------------------------------------")
     return True
 
+# SMTP connection pool tuning
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))            # seconds
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+
+def _transient_smtp_error(error) -> bool:
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    # smtplib's own errors are OSErrors too; only socket-level ones are retried
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+class SMTPPool:
+    """
+    A small pool of authenticated SMTP connections shared by worker threads.
+    Connections are reused for many messages and recycled after an error, after
+    SMTP_IDLE_TIMEOUT seconds unused, or after SMTP_MAX_MESSAGES_PER_CONNECTION sends.
+    """
+
+    def __init__(self, host: str, port: int, user: str, password: str, starttls: bool = True,
+                 size: int = SMTP_POOL_SIZE, idle_timeout: float = SMTP_IDLE_TIMEOUT,
+                 max_messages: int = SMTP_MAX_MESSAGES_PER_CONNECTION, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = deque()  # (connection, messages_sent, last_used)
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            self._discard(server)
+            raise
+        return server
+
+    @staticmethod
+    def _discard(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _acquire(self):
+        now = time.monotonic()
+        stale = []
+        found = None
+        with self._lock:
+            while self._idle:
+                server, sent, last_used = self._idle.pop()
+                if now - last_used < self.idle_timeout:
+                    found = (server, sent)
+                    break
+                stale.append(server)
+        for server in stale:
+            self._discard(server)
+        return found or (self._connect(), 0)
+
+    def _release(self, server, sent):
+        if sent >= self.max_messages:
+            self._discard(server)
+            return
+        with self._lock:
+            self._idle.append((server, sent, time.monotonic()))
+
+    def send(self, msg):
+        """
+        Sends one message, blocking the calling thread. The connection goes back
+        to the pool only after a successful send; any error drops it. A dropped
+        connection or a transient (4xx) reply is retried once on a fresh one.
+        """
+        with self._slots:
+            for attempt in range(2):
+                server, sent = self._acquire()
+                try:
+                    server.send_message(msg)
+                except BaseException as e:
+                    self._discard(server)
+                    if attempt or not _transient_smtp_error(e):
+                        raise
+                else:
+                    self._release(server, sent + 1)
+                    return
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+_smtp_pools = {}
+_smtp_pools_lock = threading.Lock()
+
+def get_smtp_pool(host: str, port: int, user: str, password: str, starttls: bool = True) -> SMTPPool:
+    """
+    Returns the process-wide pool for these SMTP settings.
+    """
+    key = (host, port, user, password, starttls)
+    with _smtp_pools_lock:
+        pool = _smtp_pools.get(key)
+        if pool is None:
+            pool = _smtp_pools[key] = SMTPPool(host, port, user, password, starttls)
+        return pool
+
 async def send_email_lead(email: str, subject: str, body: str):
     """
     Sends a professional US-style Email drip.
@@ -50,6 +171,7 @@ async def send_email_lead(email: str, subject: str, body: str):
     smtp_port = int(os.environ.get("SMTP_PORT", 587))
     smtp_user = os.environ.get("SMTP_USER")
     smtp_password = os.environ.get("SMTP_PASSWORD")
+    smtp_starttls = os.environ.get("SMTP_STARTTLS", "1").lower() not in ("0", "false", "no")
 
     if smtp_server and smtp_user and smtp_password:
         try:
@@ -59,10 +181,9 @@ async def send_email_lead(email: str, subject: str, body: str):
             msg['Subject'] = subject
             msg.attach(MIMEText(full_body, 'plain'))
 
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()
-                server.login(smtp_user, smtp_password)
-                server.send_message(msg)
+            # smtplib blocks, so the send runs in a worker thread on a pooled connection
+            pool = get_smtp_pool(smtp_server, smtp_port, smtp_user, smtp_password, smtp_starttls)
+            await asyncio.to_thread(pool.send, msg)
             print(f"Successfully sent email to {email} via SMTP.")
             return True
         except Exception as e:
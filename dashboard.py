@@ -0,0 +1,217 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from sqlalchemy import select, update, func, case, tuple_
+
+try:
+    from .models import Lead, DashboardCounters
+except ImportError:
+    from models import Lead, DashboardCounters
+
+LEAD_PAGE_SIZE = 50
+PICKER_LIMIT = 50
+COUNTERS_ID = 1
+
+# Only what the lead table renders; message and other wide columns stay in the DB
+LEAD_TABLE_COLUMNS = (
+    Lead.id, Lead.name, Lead.budget, Lead.estimated_commission, Lead.source,
+    Lead.lead_status, Lead.close_probability, Lead.recommended_action,
+    Lead.appointment_booked, Lead.sms_opt_in, Lead.created_at, Lead.last_contacted
+)
+
+def _metrics(counters) -> dict:
+    return {
+        "total_leads": counters.total_leads,
+        "hot_leads": counters.hot_leads,
+        "appointments": counters.appointments,
+        "hot_roi": float(counters.hot_roi),
+        "avg_response_minutes": counters.response_minutes_total / counters.responses if counters.responses else 0.0
+    }
+
+def get_dashboard_metrics(db) -> dict:
+    """
+    Headline dashboard metrics, read from the single dashboard_counters row.
+    """
+    row = db.execute(
+        select(
+            DashboardCounters.total_leads, DashboardCounters.hot_leads, DashboardCounters.appointments,
+            DashboardCounters.hot_roi, DashboardCounters.responses, DashboardCounters.response_minutes_total
+        ).where(DashboardCounters.id == COUNTERS_ID)
+    ).one_or_none()
+    if row is None:
+        metrics = rebuild_counters(db)
+        db.commit()
+        return metrics
+    return _metrics(row)
+
+def rebuild_counters(db) -> dict:
+    """
+    Recomputes the dashboard counters from the leads table in one aggregate
+    query and stores them. Runs in the caller's transaction.
+    """
+    is_hot = Lead.lead_status == "HOT"
+    row = db.execute(
+        select(
+            func.count(Lead.id),
+            func.coalesce(func.sum(case((is_hot, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Lead.appointment_booked == True, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((is_hot, Lead.estimated_commission), else_=0)), 0),
+            func.count(Lead.response_time_minutes),
+            func.coalesce(func.sum(Lead.response_time_minutes), 0)
+        )
+    ).one()
+    values = dict(
+        total_leads=row[0], hot_leads=row[1], appointments=row[2],
+        hot_roi=float(row[3] or 0), responses=row[4], response_minutes_total=float(row[5] or 0)
+    )
+    _insert_counters_row(db)
+    db.execute(update(DashboardCounters).where(DashboardCounters.id == COUNTERS_ID).values(**values))
+    return _metrics(SimpleNamespace(**values))
+
+def _insert_counters_row(db):
+    # Concurrent writers may all find the row missing; only one INSERT may win
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        if db.get(DashboardCounters, COUNTERS_ID) is None:
+            db.add(DashboardCounters(id=COUNTERS_ID))
+            db.flush()
+        return
+    db.execute(insert(DashboardCounters).values(id=COUNTERS_ID).on_conflict_do_nothing(index_elements=["id"]))
+
+def adjust_counters(db, **deltas):
+    """
+    Adds deltas (e.g. hot_leads=1, hot_roi=12500.0) to the dashboard counters
+    in the caller's transaction, so they commit or roll back with the lead
+    change they describe.
+    """
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+    columns = DashboardCounters.__table__.c
+    result = db.execute(
+        update(DashboardCounters)
+        .where(DashboardCounters.id == COUNTERS_ID)
+        .values({name: columns[name] + value for name, value in deltas.items()})
+    )
+    if result.rowcount == 0:
+        # No counters row yet: build it from leads, which already include this change
+        db.flush()
+        rebuild_counters(db)
+
+def count_new_leads(db, leads):
+    """
+    Adds newly inserted leads to the dashboard counters.
+    """
+    hot = [lead for lead in leads if lead.lead_status == "HOT"]
+    responses = [lead.response_time_minutes for lead in leads if lead.response_time_minutes is not None]
+    adjust_counters(
+        db,
+        total_leads=len(leads),
+        hot_leads=len(hot),
+        appointments=sum(1 for lead in leads if lead.appointment_booked),
+        hot_roi=float(sum(lead.estimated_commission or 0 for lead in hot)),
+        responses=len(responses),
+        response_minutes_total=float(sum(responses))
+    )
+
+def get_lead_page(db, after=None, page_size: int = LEAD_PAGE_SIZE):
+    """
+    One page of the lead table, newest first, using keyset pagination on
+    (created_at, id). `after` is the cursor returned for the previous page.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    query = select(*LEAD_TABLE_COLUMNS).order_by(Lead.created_at.desc(), Lead.id.desc())
+    if after is not None:
+        # Row-value comparison lets the (created_at, id) index seek straight to the cursor
+        query = query.where(tuple_(Lead.created_at, Lead.id) < tuple(after))
+    rows = db.execute(query.limit(page_size + 1)).all()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+def _candidates(db, condition, search: str, limit: int):
+    query = select(Lead.id, Lead.name, Lead.source, Lead.lead_status).where(condition)
+    if search:
+        query = query.where(Lead.name.ilike(f"%{search}%"))
+    return db.execute(query.order_by(Lead.created_at.desc(), Lead.id.desc()).limit(limit)).all()
+
+def get_uncontacted_leads(db, search: str = "", limit: int = PICKER_LIMIT):
+    """
+    Most recent leads not yet contacted, optionally filtered by name.
+    """
+    # Same predicate as the ix_leads_uncontacted partial index
+    return _candidates(db, Lead.last_contacted.is_(None), search, limit)
+
+def get_unbooked_leads(db, search: str = "", limit: int = PICKER_LIMIT):
+    """
+    Most recent leads without a booked appointment, optionally filtered by name.
+    """
+    # Same predicate as the ix_leads_unbooked partial index
+    return _candidates(db, Lead.appointment_booked.isnot(True), search, limit)
+
+def mark_contacted(db, lead_id: int):
+    """
+    Records first contact and the resulting speed-to-lead response time.
+    Returns None if the lead is missing or was already contacted, including
+    by a concurrent click that got there first.
+    """
+    created_at = db.execute(select(Lead.created_at).where(Lead.id == lead_id)).scalar_one_or_none()
+    if created_at is None:
+        return None
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    now = datetime.now(timezone.utc)
+    response_minutes = (now - created_at).total_seconds() / 60
+
+    # Conditional update: only one of several concurrent requests matches the row
+    result = db.execute(
+        update(Lead)
+        .where(Lead.id == lead_id, Lead.last_contacted.is_(None))
+        .values(last_contacted=now, response_time_minutes=response_minutes)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        return None
+    adjust_counters(db, responses=1, response_minutes_total=response_minutes)
+    db.commit()
+    return db.get(Lead, lead_id)
+
+def book_appointment(db, lead_id: int):
+    result = db.execute(
+        update(Lead)
+        .where(Lead.id == lead_id, Lead.appointment_booked.isnot(True))
+        .values(appointment_booked=True)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        return None
+    adjust_counters(db, appointments=1)
+    db.commit()
+    return db.get(Lead, lead_id)
+
+if __name__ == "__main__":
+    # Repair entry point: python dashboard.py --rebuild-counters
+    import sys
+    try:
+        from .database import init_db, SessionLocal
+    except ImportError:
+        from database import init_db, SessionLocal
+
+    if sys.argv[1:] != ["--rebuild-counters"]:
+        print("Usage: python dashboard.py --rebuild-counters")
+        sys.exit(1)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        metrics = rebuild_counters(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt dashboard counters: {metrics}")
@@ -1,61 +1,129 @@
-from sqlalchemy import create_engine, inspect, text
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 try:
-    from .models import Base
+    from .migrations import migrate
 except ImportError:
-    from models import Base
+    from migrations import migrate
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./real_estate.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./real_estate.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a pooled connection
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# FastAPI, Streamlit and the scheduler all write to the same SQLite file
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # ms to wait on a locked database
+
+def _sqlite_pragmas(journal_mode, synchronous, busy_timeout):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if journal_mode:
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        if synchronous:
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+        cursor.close()
+    return on_connect
+
+# Async drivers substituted for the sync ones when building the AsyncEngine
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+def _engine_options(url, pool_size, max_overflow, pool_timeout, journal_mode, synchronous, busy_timeout):
+    """
+    create_engine keyword arguments for `url`, plus the SQLite connect hook
+    (None for in-memory SQLite and server databases).
+    """
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        options = dict(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout, pool_pre_ping=True)
+        return options, None
+    if not url.database or url.database == ":memory:":
+        return dict(connect_args={"check_same_thread": False}), None
+    options = dict(
+        connect_args={"check_same_thread": False, "timeout": busy_timeout / 1000},
+        pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout
+    )
+    return options, _sqlite_pragmas(journal_mode, synchronous, busy_timeout)
+
+def make_engine(url: str = SQLALCHEMY_DATABASE_URL, pool_size: int = DB_POOL_SIZE,
+                max_overflow: int = DB_MAX_OVERFLOW, pool_timeout: float = DB_POOL_TIMEOUT,
+                journal_mode: str = SQLITE_JOURNAL_MODE, synchronous: str = SQLITE_SYNCHRONOUS,
+                busy_timeout: int = SQLITE_BUSY_TIMEOUT):
+    """
+    Engine for SQLite or a server database such as Postgres. File-backed
+    SQLite gets WAL journaling, a busy timeout and relaxed fsyncs so
+    concurrent writers wait for the lock instead of failing.
+    """
+    options, on_connect = _engine_options(url, pool_size, max_overflow, pool_timeout,
+                                          journal_mode, synchronous, busy_timeout)
+    engine = create_engine(url, **options)
+    if on_connect:
+        event.listen(engine, "connect", on_connect)
+    return engine
+
+def make_async_engine(url: str = SQLALCHEMY_DATABASE_URL, pool_size: int = DB_POOL_SIZE,
+                      max_overflow: int = DB_MAX_OVERFLOW, pool_timeout: float = DB_POOL_TIMEOUT,
+                      journal_mode: str = SQLITE_JOURNAL_MODE, synchronous: str = SQLITE_SYNCHRONOUS,
+                      busy_timeout: int = SQLITE_BUSY_TIMEOUT):
+    """
+    AsyncEngine for the same database as make_engine, over aiosqlite or
+    asyncpg, with the same pool and SQLite settings.
+    """
+    url = make_url(url)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+    options, on_connect = _engine_options(url, pool_size, max_overflow, pool_timeout,
+                                          journal_mode, synchronous, busy_timeout)
+    engine = create_async_engine(url, **options)
+    if on_connect:
+        event.listen(engine.sync_engine, "connect", on_connect)
+    return engine
+
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
+# Used by the FastAPI app; Streamlit and background jobs stay on SessionLocal.
+# Built on first use, so processes that never touch it never load aiosqlite/asyncpg.
+_async_engine = None
+_async_sessionmaker = None
 
-    # Simple migration logic for existing databases
-    inspector = inspect(engine)
-    if 'leads' not in inspector.get_table_names():
-        return
+def get_async_engine():
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        _async_engine = make_async_engine()
+        _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
 
-    existing_columns = [c['name'] for c in inspector.get_columns('leads')]
+def AsyncSessionLocal():
+    """
+    New AsyncSession on the shared async engine.
+    """
+    get_async_engine()
+    return _async_sessionmaker()
 
-    # Define all expected columns and their types for SQLite
-    # This ensures even very old databases are upgraded
-    expected_columns = {
-        "phone": "VARCHAR",
-        "email": "VARCHAR",
-        "budget": "FLOAT",
-        "area": "VARCHAR",
-        "property_type": "VARCHAR",
-        "timeframe": "VARCHAR",
-        "source": "VARCHAR",
-        "mortgage_status": "VARCHAR",
-        "cash_buyer": "BOOLEAN DEFAULT 0",
-        "message": "TEXT",
-        "sms_opt_in": "BOOLEAN DEFAULT 0",
-        "appointment_booked": "BOOLEAN DEFAULT 0",
-        "crm_synced": "BOOLEAN DEFAULT 0",
-        "estimated_commission": "FLOAT DEFAULT 0.0",
-        "score": "INTEGER DEFAULT 0",
-        "close_probability": "FLOAT DEFAULT 0.0",
-        "lead_status": "VARCHAR DEFAULT 'COLD'",
-        "recommended_action": "VARCHAR",
-        "last_contacted": "DATETIME",
-        "response_time_minutes": "FLOAT"
-    }
+async def dispose_async_engine():
+    """
+    Closes the async engine's pooled connections, if it was ever created.
+    """
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        engine, _async_engine, _async_sessionmaker = _async_engine, None, None
+        await engine.dispose()
 
-    with engine.connect() as conn:
-        for col_name, col_type in expected_columns.items():
-            if col_name not in existing_columns:
-                try:
-                    conn.execute(text(f"ALTER TABLE leads ADD COLUMN {col_name} {col_type}"))
-                    conn.commit()
-                    print(f"Added missing column: {col_name}")
-                except Exception as e:
-                    print(f"Error adding column {col_name}: {e}")
+def init_db():
+    """
+    Applies any pending schema migrations. On an up-to-date database this is
+    one version lookup, so it is cheap to call on every process start.
+    """
+    migrate(engine)
 
 def get_db():
     db = SessionLocal()
@@ -63,3 +131,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    # FastAPI closes it once the response, streamed bodies included, is sent
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,148 @@
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, delete, and_
+
+try:
+    from .database import SessionLocal
+    from .models import DripStep, Lead
+except ImportError:
+    from database import SessionLocal
+    from models import DripStep, Lead
+
+# US drip cadence: step label -> delay after enrollment
+DRIP_SEQUENCE = (
+    ("1 day follow-up", timedelta(days=1)),
+    ("3 day follow-up", timedelta(days=3)),
+    ("7 day follow-up", timedelta(days=7)),
+)
+
+DRIP_BATCH_SIZE = int(os.getenv("DRIP_BATCH_SIZE", "200"))
+# A claimed step whose poller died is handed out again after this many seconds.
+# Must outlast a full batch, which is paced by the Telegram per-chat rate limit.
+DRIP_CLAIM_LEASE = int(os.getenv("DRIP_CLAIM_LEASE", "3600"))
+DRIP_MAX_ATTEMPTS = int(os.getenv("DRIP_MAX_ATTEMPTS", "3"))
+DRIP_RETRY_DELAY = int(os.getenv("DRIP_RETRY_DELAY", "900"))
+
+def enqueue_lead_drips(lead_id: int, start=None, session_factory=SessionLocal):
+    """
+    Stores the drip sequence for a lead, replacing any steps still pending for
+    it so a lead never has two sequences running.
+    """
+    start = start or datetime.now(timezone.utc)
+    db = session_factory()
+    try:
+        db.execute(delete(DripStep).where(DripStep.lead_id == lead_id, DripStep.status != "CLAIMED"))
+        db.add_all([
+            DripStep(lead_id=lead_id, step=step, due_at=start + delay, status="PENDING", attempts=0)
+            for step, delay in DRIP_SEQUENCE
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def release_stale_claims(now=None, session_factory=SessionLocal):
+    """
+    Returns steps claimed longer than DRIP_CLAIM_LEASE ago to the pending pool.
+    """
+    now = now or datetime.now(timezone.utc)
+    db = session_factory()
+    try:
+        result = db.execute(
+            update(DripStep)
+            .where(DripStep.status == "CLAIMED", DripStep.claimed_at < now - timedelta(seconds=DRIP_CLAIM_LEASE))
+            .values(status="PENDING", claim_token=None, claimed_at=None)
+        )
+        db.commit()
+        return result.rowcount
+    finally:
+        db.close()
+
+def claim_due_steps(limit: int = DRIP_BATCH_SIZE, now=None, session_factory=SessionLocal):
+    """
+    Atomically claims up to `limit` due steps and returns them joined with the
+    lead fields run_us_drip needs. Concurrent pollers never receive the same step.
+    """
+    now = now or datetime.now(timezone.utc)
+    token = uuid.uuid4().hex
+    due_ids = (
+        select(DripStep.id)
+        .where(DripStep.status == "PENDING", DripStep.due_at <= now)
+        .order_by(DripStep.due_at)
+        .limit(limit)
+        .scalar_subquery()
+    )
+    db = session_factory()
+    try:
+        db.execute(
+            update(DripStep)
+            .where(DripStep.id.in_(due_ids), DripStep.status == "PENDING")
+            .values(status="CLAIMED", claim_token=token, claimed_at=now),
+            execution_options={"synchronize_session": False}
+        )
+        db.commit()
+
+        rows = db.execute(
+            select(
+                DripStep.id, DripStep.lead_id, DripStep.step, DripStep.attempts, DripStep.sent_channels,
+                Lead.name, Lead.email, Lead.phone, Lead.lead_status, Lead.sms_opt_in
+            )
+            .join(Lead, Lead.id == DripStep.lead_id, isouter=True)
+            .where(DripStep.claim_token == token)
+            .order_by(DripStep.due_at)
+        ).all()
+        return rows
+    finally:
+        db.close()
+
+def record_sent_channels(step_id: int, channels, session_factory=SessionLocal):
+    """
+    Stores the channels a claimed step has delivered so far, so a retry (or a
+    re-claim after the poller died) only sends the ones still missing.
+    """
+    db = session_factory()
+    try:
+        db.execute(
+            update(DripStep)
+            .where(DripStep.id == step_id, DripStep.status == "CLAIMED")
+            .values(sent_channels=",".join(sorted(channels)))
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def complete_steps(step_ids, session_factory=SessionLocal):
+    """
+    Removes delivered (or no longer deliverable) steps.
+    """
+    if not step_ids:
+        return
+    db = session_factory()
+    try:
+        db.execute(delete(DripStep).where(DripStep.id.in_(step_ids)))
+        db.commit()
+    finally:
+        db.close()
+
+def fail_step(step_id: int, attempts: int, now=None, session_factory=SessionLocal):
+    """
+    Puts a failed step back in the queue with a delay, or parks it as FAILED
+    once it has used up DRIP_MAX_ATTEMPTS.
+    """
+    now = now or datetime.now(timezone.utc)
+    attempts += 1
+    values = {"attempts": attempts, "claim_token": None, "claimed_at": None}
+    if attempts >= DRIP_MAX_ATTEMPTS:
+        values["status"] = "FAILED"
+    else:
+        values.update(status="PENDING", due_at=now + timedelta(seconds=DRIP_RETRY_DELAY * attempts))
+
+    db = session_factory()
+    try:
+        db.execute(update(DripStep).where(and_(DripStep.id == step_id, DripStep.status == "CLAIMED")).values(**values))
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,277 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+try:
+    from .database import SessionLocal
+    from .agency_identity import agency_identity_key, upsert_agencies
+    from .agency_intelligence import (
+        clean_and_score_agency, scrape_homepage, analyze_website_with_gpt_async,
+        qualify_agency, generate_outreach_email_async, gpt_cache, gpt_dispatcher
+    )
+    from .llm_dispatch import LLMDeferred
+except ImportError:
+    from database import SessionLocal
+    from agency_identity import agency_identity_key, upsert_agencies
+    from agency_intelligence import (
+        clean_and_score_agency, scrape_homepage, analyze_website_with_gpt_async,
+        qualify_agency, generate_outreach_email_async, gpt_cache, gpt_dispatcher
+    )
+    from llm_dispatch import LLMDeferred
+
+# Stage limits for the bulk enrichment pipeline
+ENRICH_FETCH_CONCURRENCY = int(os.getenv("ENRICH_FETCH_CONCURRENCY", "16"))
+ENRICH_PER_HOST_LIMIT = int(os.getenv("ENRICH_PER_HOST_LIMIT", "2"))
+# GPT stages run on the event loop; LLM_RPM_LIMIT/LLM_TPM_LIMIT pace the requests
+ENRICH_ANALYZE_CONCURRENCY = int(os.getenv("ENRICH_ANALYZE_CONCURRENCY", "32"))
+ENRICH_GENERATE_CONCURRENCY = int(os.getenv("ENRICH_GENERATE_CONCURRENCY", "32"))
+ENRICH_WRITE_BATCH = int(os.getenv("ENRICH_WRITE_BATCH", "25"))
+
+_DONE = object()
+
+def _clean(value):
+    # CSV rows come through pandas, where blanks are NaN
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+def _host(url):
+    if not url:
+        return ""
+    if not url.startswith("http"):
+        url = "https://" + url
+    return urlparse(url).netloc.lower()
+
+def build_agency_lead(row: dict, init_analysis: dict, gpt_analysis: dict, qual: dict, outreach: dict) -> dict:
+    """
+    Maps an uploaded row plus its analysis results onto AgencyLead columns.
+    """
+    return {
+        "agency_name": init_analysis["agency_name"],
+        "owner_name": row.get("owner_name"),
+        "website": row.get("website"),
+        "phone": row.get("phone"),
+        "email": row.get("email"),
+        "city": row.get("city"),
+        "state": row.get("state"),
+        "num_listings": row.get("num_listings", 0),
+        "google_rating": row.get("google_rating", 0),
+        "classification": init_analysis["classification"],
+        "score": init_analysis["score"],
+        "strength_summary": init_analysis["strength_summary"],
+        "growth_opportunity_summary": init_analysis["growth_opportunity_summary"],
+        "tier": qual["tier"],
+        "market_analysis": json.dumps(gpt_analysis),
+        "weaknesses": ", ".join(gpt_analysis.get("weaknesses", [])),
+        "outreach_email": f"Subject: {outreach['subject']}\n\n{outreach['body']}",
+        "outreach_status": "GENERATED",
+        "identity_key": agency_identity_key(row.get("agency_name"), row.get("website"))
+    }
+
+class EnrichmentPipeline:
+    """
+    Enriches uploaded agency rows (fetch homepage -> GPT analysis -> outreach
+    email) with bounded concurrency per stage and per website host, streaming
+    finished AgencyLead rows to the database in small batches.
+    Blocking stage functions run in a dedicated thread pool; coroutine
+    functions (the GPT stages by default) are awaited on the event loop.
+    """
+
+    def __init__(self, session_factory=SessionLocal,
+                 fetch=scrape_homepage, analyze=analyze_website_with_gpt_async, generate=generate_outreach_email_async,
+                 fetch_concurrency: int = ENRICH_FETCH_CONCURRENCY,
+                 per_host_limit: int = ENRICH_PER_HOST_LIMIT,
+                 analyze_concurrency: int = ENRICH_ANALYZE_CONCURRENCY,
+                 generate_concurrency: int = ENRICH_GENERATE_CONCURRENCY,
+                 write_batch: int = ENRICH_WRITE_BATCH,
+                 on_progress=None, dispatcher=gpt_dispatcher):
+        self.session_factory = session_factory
+        self.fetch = fetch
+        self.analyze = analyze
+        self.generate = generate
+        self.fetch_concurrency = fetch_concurrency
+        self.per_host_limit = per_host_limit
+        self.analyze_concurrency = analyze_concurrency
+        self.generate_concurrency = generate_concurrency
+        self.write_batch = max(1, write_batch)
+        self.on_progress = on_progress
+        # LLMDispatcher the GPT stages send through; its HTTP client is
+        # closed at the end of each run, since run_sync ends the event loop
+        self.dispatcher = dispatcher
+
+    async def run(self, rows, total: int = None, sink=None) -> dict:
+        """
+        Processes an iterable of row dicts. Only a bounded number of rows is in
+        flight at once, so the input may be a lazy generator of any length.
+        Finished rows are inserted in write batches, or handed to `sink(batch)`
+        instead when given. Returns counts of rows written, rows that failed and
+        rows deferred to a GPT batch (see LLMDispatcher's batch mode).
+        """
+        loop = asyncio.get_running_loop()
+        workers = self.fetch_concurrency + sum(
+            limit for fn, limit in ((self.analyze, self.analyze_concurrency), (self.generate, self.generate_concurrency))
+            if not asyncio.iscoroutinefunction(fn)
+        )
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="enrich")
+        fetch_slots = asyncio.Semaphore(self.fetch_concurrency)
+        analyze_slots = asyncio.Semaphore(self.analyze_concurrency)
+        generate_slots = asyncio.Semaphore(self.generate_concurrency)
+        host_slots = {}
+        in_flight = asyncio.Semaphore(
+            2 * (self.fetch_concurrency + self.analyze_concurrency + self.generate_concurrency)
+        )
+        results = asyncio.Queue()
+        stats = {"written": 0, "failed": 0, "deferred": 0, "done": 0}
+        started = time.perf_counter()
+
+        def call(fn, *args):
+            if asyncio.iscoroutinefunction(fn):
+                return fn(*args)
+            return loop.run_in_executor(executor, fn, *args)
+
+        async def process(row):
+            try:
+                row = {k: _clean(v) for k, v in row.items()}
+                agency_data = {
+                    "agency_name": row.get("agency_name"),
+                    # Blank counts score as zero
+                    "num_listings": row.get("num_listings") or 0,
+                    "google_rating": row.get("google_rating") or 0,
+                    "city": row.get("city"),
+                    "owner_name": row.get("owner_name")
+                }
+                init_analysis = clean_and_score_agency(agency_data)
+
+                host = _host(row.get("website"))
+                host_slot = host_slots.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+                async with fetch_slots, host_slot:
+                    text = await call(self.fetch, row.get("website"))
+
+                async with analyze_slots:
+                    gpt_analysis = await call(self.analyze, text, agency_data["agency_name"])
+                qual = qualify_agency(agency_data, gpt_analysis)
+
+                async with generate_slots:
+                    outreach = await call(self.generate, agency_data, gpt_analysis, qual)
+
+                await results.put(build_agency_lead(row, init_analysis, gpt_analysis, qual, outreach))
+            except LLMDeferred:
+                stats["deferred"] += 1
+                await results.put(None)
+            except Exception as e:
+                print(f"Enrichment failed for {row.get('agency_name')}: {e}")
+                stats["failed"] += 1
+                await results.put(None)
+            finally:
+                in_flight.release()
+
+        async def feed():
+            tasks = set()
+            for row in rows:
+                await in_flight.acquire()
+                task = asyncio.create_task(process(row))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+            await results.put(_DONE)
+
+        async def write():
+            batch = []
+            while True:
+                item = await results.get()
+                finished = item is _DONE
+                if item is not None and not finished:
+                    batch.append(item)
+                if not finished:
+                    stats["done"] += 1
+                    if self.on_progress:
+                        self.on_progress(stats["done"], total)
+                if batch and (finished or len(batch) >= self.write_batch or results.empty()):
+                    try:
+                        await asyncio.to_thread(sink or self._insert, batch)
+                        stats["written"] += len(batch)
+                    except Exception as e:
+                        print(f"Failed to save {len(batch)} enriched agencies: {e}")
+                        stats["failed"] += len(batch)
+                    batch = []
+                if finished:
+                    break
+
+        try:
+            await asyncio.gather(feed(), write())
+        finally:
+            executor.shutdown(wait=False)
+            if self.dispatcher is not None:
+                await self.dispatcher.aclose()
+
+        return {
+            "written": stats["written"],
+            "failed": stats["failed"],
+            "deferred": stats["deferred"],
+            "elapsed": time.perf_counter() - started
+        }
+
+    def run_sync(self, rows, total: int = None, sink=None) -> dict:
+        return asyncio.run(self.run(rows, total, sink))
+
+    def _insert(self, batch):
+        db = self.session_factory()
+        try:
+            upsert_agencies(db, batch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+USAGE = """Usage:
+  python enrichment_pipeline.py <agencies.csv>                             enrich and import
+  python enrichment_pipeline.py --gpt-batch <requests.jsonl> <agencies.csv>  write GPT requests for the Batch API
+  python enrichment_pipeline.py --ingest-batch <results.jsonl>              load Batch API results into the GPT cache"""
+
+if __name__ == "__main__":
+    # Batch job entry point: python enrichment_pipeline.py agencies.csv
+    try:
+        from .database import init_db
+        from .agency_import import import_agency_csv, prepare_gpt_batch
+        from .agency_intelligence import ingest_batch_results
+    except ImportError:
+        from database import init_db
+        from agency_import import import_agency_csv, prepare_gpt_batch
+        from agency_intelligence import ingest_batch_results
+
+    args = sys.argv[1:]
+    if args[:1] == ["--ingest-batch"] and len(args) == 2:
+        summary = ingest_batch_results(args[1])
+        print(f"Stored {summary['stored']} GPT results in the cache ({summary['failed']} failed)")
+        sys.exit(0)
+    if not (len(args) == 1 or (args[:1] == ["--gpt-batch"] and len(args) == 3)):
+        print(USAGE)
+        sys.exit(1)
+
+    init_db()
+    if args[0] == "--gpt-batch":
+        with open(args[2], "rb") as f:
+            summary = prepare_gpt_batch(f, args[1])
+        print(f"Wrote {summary['requests']} GPT requests to {args[1]} for {summary['deferred']} agencies"
+              f" ({summary['ready']} already fully cached, {summary['failed']} failed, {summary['skipped']} already known)")
+        sys.exit(0)
+
+    with open(args[0], "rb") as f:
+        summary = import_agency_csv(f, source=os.path.basename(args[0]))
+    if summary["resumed_from"]:
+        print(f"Resumed after {summary['resumed_from']} rows committed by an earlier run")
+    print(f"Enriched {summary['written']} agencies ({summary['failed']} failed,"
+          f" {summary['skipped']} already known) in {summary['elapsed']:.1f}s")
+    if gpt_cache is not None:
+        print(f"GPT cache hit rate: {gpt_cache.hit_rate:.0%} ({gpt_cache.hits} hits, {gpt_cache.misses} misses)")
+    if gpt_dispatcher is not None:
+        stats = gpt_dispatcher.stats
+        print(f"GPT requests: {stats['requests']} ({stats['retries']} retried, {stats['errors']} failed),"
+              f" {stats['prompt_tokens'] + stats['completion_tokens']} tokens")
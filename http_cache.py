@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", "./http_cache.db")
+HTTP_CACHE_TTL = float(os.getenv("HTTP_CACHE_TTL", str(24 * 3600)))     # seconds before revalidating
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "20000"))
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical cache key for a homepage URL: scheme defaulted to https, host
+    lowercased, default ports and fragments dropped, query parameters sorted.
+    """
+    url = url.strip()
+    if not url.startswith("http"):
+        url = "https://" + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not (scheme == "http" and parts.port == 80) and not (scheme == "https" and parts.port == 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+class CachedPage:
+    __slots__ = ("url", "text", "etag", "last_modified", "fetched_at")
+
+    def __init__(self, url, text, etag, last_modified, fetched_at):
+        self.url = url
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def is_fresh(self, ttl: float, now: float = None) -> bool:
+        return ((now or time.time()) - self.fetched_at) < ttl
+
+class HTTPCache:
+    """
+    Persistent, size-bounded LRU cache of extracted homepage text plus the
+    validators (ETag / Last-Modified) needed for conditional revalidation.
+    Backed by a standalone SQLite file so it is shared across runs and processes.
+    """
+
+    def __init__(self, path: str = HTTP_CACHE_PATH, ttl: float = HTTP_CACHE_TTL,
+                 max_entries: int = HTTP_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = None  # opened on first use
+
+    @property
+    def _conn(self):
+        # Callers hold self._lock; importing a module that builds a cache
+        # should not create its file
+        if self._connection is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " url TEXT PRIMARY KEY,"
+                " text TEXT NOT NULL,"
+                " etag TEXT,"
+                " last_modified TEXT,"
+                " fetched_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_pages_last_access ON pages (last_access)")
+            self._connection = conn
+        return self._connection
+
+    def get(self, url: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, text, etag, last_modified, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE pages SET last_access = ? WHERE url = ?", (time.time(), url))
+        return CachedPage(*row)
+
+    def put(self, url: str, text: str, etag: str = None, last_modified: str = None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, text, etag, last_modified, fetched_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url, text, etag, last_modified, now, now)
+            )
+            self._evict()
+
+    def revalidated(self, url: str):
+        """
+        Marks an entry fresh again after a 304 Not Modified.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ?, last_access = ? WHERE url = ?", (now, now, url))
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM pages WHERE url IN (SELECT url FROM pages ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,159 @@
+import re
+from collections import namedtuple
+from sqlalchemy import select, or_
+
+try:
+    from .models import Lead
+    from .lead_scoring import calculate_lead_score
+    from .dashboard import adjust_counters, count_new_leads
+except ImportError:
+    from models import Lead
+    from lead_scoring import calculate_lead_score
+    from dashboard import adjust_counters, count_new_leads
+
+DEFAULT_COUNTRY_CODE = "1"  # US numbers are often entered without +1
+
+# Timeframes from most to least urgent; a merge keeps the more urgent one
+TIMEFRAME_URGENCY = {"Immediate": 0, "1 month": 1, "3 months": 2, "6 months+": 3, "Just Browsing": 4}
+
+# Outcome of saving a submitted lead. For a merge, previous_status is the
+# status the existing lead had before this submission was folded in.
+SavedLead = namedtuple("SavedLead", ["id", "merged", "status", "probability", "action", "previous_status"])
+
+def normalize_phone(phone: str, default_country_code: str = DEFAULT_COUNTRY_CODE):
+    """
+    E.164 form of a phone number ("(555) 123-4567" -> "+15551234567"), or
+    None if it has too few digits to identify anyone.
+    """
+    phone = (phone or "").strip()
+    digits = re.sub(r"\D", "", phone)
+    if phone.startswith("00"):
+        digits = digits[2:]
+    elif not phone.startswith("+") and len(digits) == 10:
+        digits = default_country_code + digits
+    if not 8 <= len(digits) <= 15:
+        return None
+    return "+" + digits
+
+def normalize_email(email: str):
+    email = (email or "").strip().lower()
+    return email if "@" in email else None
+
+def set_lead_keys(lead):
+    lead.phone_key = normalize_phone(lead.phone)
+    lead.email_key = normalize_email(lead.email)
+
+def _stronger_timeframe(current, incoming):
+    rank = lambda t: TIMEFRAME_URGENCY.get(t, len(TIMEFRAME_URGENCY))
+    return incoming if rank(incoming) < rank(current) else current
+
+def merge_lead(existing, incoming):
+    """
+    Folds a repeat submission into the existing lead, keeping the stronger
+    buying signal of each field, and re-scores it. Consent (sms_opt_in)
+    follows the latest submission.
+    """
+    existing.cash_buyer = bool(existing.cash_buyer or incoming.cash_buyer)
+    if incoming.mortgage_status == "approved" or not existing.mortgage_status:
+        existing.mortgage_status = incoming.mortgage_status
+    existing.timeframe = _stronger_timeframe(existing.timeframe, incoming.timeframe)
+    existing.budget = max(existing.budget or 0, incoming.budget or 0)
+    message = (incoming.message or "").strip()
+    if message and message not in (existing.message or ""):
+        existing.message = f"{existing.message}\n{message}" if existing.message else message
+    if incoming.sms_opt_in is not None:
+        existing.sms_opt_in = incoming.sms_opt_in
+    for field in ("name", "phone", "email", "area", "property_type"):
+        if not getattr(existing, field) and getattr(incoming, field):
+            setattr(existing, field, getattr(incoming, field))
+    set_lead_keys(existing)
+
+    result = calculate_lead_score({
+        "budget": existing.budget,
+        "timeframe": existing.timeframe,
+        "mortgage_status": existing.mortgage_status,
+        "cash_buyer": existing.cash_buyer,
+        "message": existing.message or ""
+    })
+    existing.score = result["score"]
+    existing.lead_status = result["status"]
+    existing.close_probability = result["probability"]
+    existing.recommended_action = result["action"]
+    existing.estimated_commission = result["commission"]
+    existing.scoring_version = result["rules_version"]
+
+def needs_alert(saved) -> bool:
+    """
+    Agents are alerted about new leads, and about repeat submissions only when
+    they change the lead's status.
+    """
+    return not saved.merged or saved.status != saved.previous_status
+
+def _find_existing(db, phone_keys, email_keys):
+    """
+    Existing leads matching any of the keys, oldest first, so a person who
+    already has several rows is always merged into the first one.
+    """
+    conditions = []
+    if phone_keys:
+        conditions.append(Lead.phone_key.in_(phone_keys))
+    if email_keys:
+        conditions.append(Lead.email_key.in_(email_keys))
+    if not conditions:
+        return []
+    return db.execute(select(Lead).where(or_(*conditions)).order_by(Lead.id)).scalars().all()
+
+def _hot_totals(lead):
+    if lead.lead_status == "HOT":
+        return 1, lead.estimated_commission or 0.0
+    return 0, 0.0
+
+def save_leads(db, leads):
+    """
+    Stores submitted leads, merging each into an existing lead with the same
+    normalized phone or email (including one earlier in the same batch).
+    Looks all keys up in one query, flushes, keeps the dashboard counters in
+    step and returns a SavedLead per submission. Runs in the caller's
+    transaction.
+    """
+    for lead in leads:
+        set_lead_keys(lead)
+    by_key = {}
+    for lead in _find_existing(db, {l.phone_key for l in leads if l.phone_key},
+                               {l.email_key for l in leads if l.email_key}):
+        for key in (("phone", lead.phone_key), ("email", lead.email_key)):
+            if key[1]:
+                by_key.setdefault(key, lead)
+
+    new_leads = []
+    before = {}  # merged pre-existing lead -> its HOT count/ROI before this batch
+    results = []
+    for lead in leads:
+        keys = [key for key in (("phone", lead.phone_key), ("email", lead.email_key)) if key[1]]
+        target = next((by_key[key] for key in keys if key in by_key), None)
+        if target is None:
+            db.add(lead)
+            new_leads.append(lead)
+            target, merged, previous_status = lead, False, None
+        else:
+            if target not in new_leads:
+                before.setdefault(target, _hot_totals(target))
+            merged, previous_status = True, target.lead_status
+            merge_lead(target, lead)
+        for key in keys:
+            by_key.setdefault(key, target)
+        results.append((target, merged, previous_status))
+
+    db.flush()
+    # New leads are counted in their final state; merged ones move between statuses
+    count_new_leads(db, new_leads)
+    hot_delta, roi_delta = 0, 0.0
+    for lead, (hot, roi) in before.items():
+        new_hot, new_roi = _hot_totals(lead)
+        hot_delta += new_hot - hot
+        roi_delta += new_roi - roi
+    adjust_counters(db, hot_leads=hot_delta, hot_roi=roi_delta)
+    return [
+        SavedLead(lead.id, merged, lead.lead_status, lead.close_probability, lead.recommended_action, previous_status)
+        for lead, merged, previous_status in results
+    ]
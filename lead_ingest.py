@@ -0,0 +1,141 @@
+import asyncio
+import os
+
+try:
+    from .database import AsyncSessionLocal
+    from .lead_identity import save_leads
+    from .tracing import span
+except ImportError:
+    from database import AsyncSessionLocal
+    from lead_identity import save_leads
+    from tracing import span
+
+# Group-commit tuning. A lead waits at most LEAD_INGEST_FLUSH_INTERVAL seconds
+# for company before its batch is committed; a full batch is committed at once.
+LEAD_INGEST_FLUSH_INTERVAL = float(os.getenv("LEAD_INGEST_FLUSH_INTERVAL", "0.02"))
+LEAD_INGEST_MAX_BATCH = int(os.getenv("LEAD_INGEST_MAX_BATCH", "100"))
+
+class LeadIngestQueue:
+    """
+    Accumulates incoming Lead rows and commits them in small, time/size-bounded
+    batches so that a burst of form posts shares one transaction (and one fsync).
+    Commits go through an AsyncSession, so the event loop never blocks on the
+    database.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal,
+                 flush_interval: float = LEAD_INGEST_FLUSH_INTERVAL,
+                 max_batch: int = LEAD_INGEST_MAX_BATCH):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_batch = max(1, max_batch)
+        self._queue = None
+        self._worker = None
+
+    @property
+    def running(self):
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        if not self.running:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Flushes everything queued so far and stops the worker.
+        """
+        if self.running:
+            await self._queue.put(None)
+            await self._worker
+        self._worker = None
+
+    async def submit(self, lead):
+        """
+        Queues a Lead for the next group commit and returns its SavedLead
+        (id, and whether it was merged into an existing lead) once the batch
+        containing it has been committed.
+        """
+        if not self.running:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((lead, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        leads = [lead for lead, _ in batch]
+        try:
+            with span("db_commit"):
+                results = await self._commit(leads)
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _commit(self, leads):
+        """
+        Commits the batch in one transaction. If that fails, falls back to one
+        transaction per lead so a single bad row only fails its own request.
+        Repeat submissions are merged into the existing lead (see save_leads).
+        Returns a list holding either the SavedLead or the exception for each lead.
+        """
+        # Ids handed out by a flush that is rolled back may be taken by another
+        # writer before the retry, so those leads start over without one
+        unassigned = [lead for lead in leads if lead.id is None]
+        async with self.session_factory() as db:
+            try:
+                saved = await db.run_sync(save_leads, leads)
+                await db.commit()
+                return saved
+            except Exception as e:
+                await db.rollback()
+                if len(leads) == 1:
+                    return [e]
+                print(f"Group commit of {len(leads)} leads failed ({e}). Retrying individually.")
+
+            for lead in unassigned:
+                lead.id = None
+
+            results = []
+            for lead in leads:
+                try:
+                    saved = await db.run_sync(save_leads, [lead])
+                    await db.commit()
+                    results.append(saved[0])
+                except Exception as e:
+                    await db.rollback()
+                    results.append(e)
+            return results
+
+ingest_queue = LeadIngestQueue()
@@ -1,4 +1,16 @@
-def calculate_lead_score(lead_data: dict):
+import pandas as pd
+from sqlalchemy import select, update
+
+try:
+    from .models import Lead
+    from .dashboard import adjust_counters
+    from .scoring_rules import rule_loader
+except ImportError:
+    from models import Lead
+    from dashboard import adjust_counters
+    from scoring_rules import rule_loader
+
+def calculate_lead_score(lead_data: dict, rules=None):
     """
     Calculates lead score, status and close probability based on lead data.
     lead_data should contain:
@@ -7,56 +19,79 @@ def calculate_lead_score(lead_data: dict):
     - timeframe (str)
     - budget (float)
     - message (str)
+    Weights and thresholds come from the scoring rules file (see
+    scoring_rules.py) unless a RuleSet is passed; the result includes the
+    rules_version that produced it.
+    """
+    return (rules or rule_loader.current()).score(lead_data)
+
+def score_leads_batch(leads, rules=None):
+    """
+    Vectorized counterpart of calculate_lead_score for bulk imports.
+    Accepts a pandas DataFrame or a mapping of column arrays with the same keys
+    as lead_data (missing columns take the same defaults as the scalar version).
+    Returns a DataFrame with score, status, probability, action, commission
+    and rules_version columns whose values match calculate_lead_score row for row.
+    """
+    if not isinstance(leads, pd.DataFrame):
+        leads = pd.DataFrame(dict(leads))
+    return (rules or rule_loader.current()).score_batch(leads)
+
+def rescore_all_leads(db, chunk_size: int = 5000):
     """
-    score = 0
-
-    if lead_data.get("cash_buyer"):
-        score += 40
-
-    if lead_data.get("mortgage_status") == "approved":
-        score += 30
-
-    timeframe = lead_data.get("timeframe")
-    if timeframe == "Immediate":
-        score += 30
-    elif timeframe == "3 months":
-        score += 15
-
-    budget = lead_data.get("budget", 0)
-    # US Market high value threshold often starts at $800k - $1M
-    if budget >= 1_000_000:
-        score += 20
-    elif budget >= 500_000:
-        score += 10
-
-    message = lead_data.get("message", "").lower()
-    if "urgent" in message:
-        score += 10
-
-    # US ROI Calculation (Conservative 2.5% commission)
-    estimated_commission = budget * 0.025
-
-    # Cap score at 100
-    score = min(score, 100)
-
-    # US Realtor Classification & Action
-    if score >= 70:
-        status = "HOT"
-        action = "Call & Text Immediately. Book Appointment."
-    elif score >= 35:
-        status = "WARM"
-        action = "Send matching listings. Enroll in SMS drip."
-    else:
-        status = "COLD"
-        action = "Long-term nurture. Monthly email."
-
-    # Close probability (Speed-to-lead factor)
-    probability = min(score * 1.2, 95)
-
-    return {
-        "score": score,
-        "status": status,
-        "probability": probability,
-        "action": action,
-        "commission": estimated_commission
-    }
+    Re-scores every stored Lead with score_leads_batch and writes the results
+    back with bulk UPDATEs keyed on primary key, one transaction per chunk.
+    All chunks use the rules current when the run starts.
+    Returns the number of leads re-scored.
+    """
+    rules = rule_loader.current()
+    columns = (Lead.id, Lead.budget, Lead.timeframe, Lead.mortgage_status, Lead.cash_buyer, Lead.message,
+               Lead.lead_status, Lead.estimated_commission)
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.execute(
+            select(*columns).where(Lead.id > last_id).order_by(Lead.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+
+        frame = pd.DataFrame(rows, columns=[c.key for c in columns])
+        frame["budget"] = frame["budget"].fillna(0)
+        frame["cash_buyer"] = frame["cash_buyer"].fillna(False)
+        result = score_leads_batch(frame, rules)
+
+        db.execute(update(Lead), [
+            {
+                "id": lead_id,
+                "score": score,
+                "lead_status": status,
+                "close_probability": probability,
+                "recommended_action": action,
+                "estimated_commission": commission,
+                "scoring_version": rules.version
+            }
+            for lead_id, score, status, probability, action, commission in zip(
+                frame["id"].tolist(),
+                result["score"].tolist(),
+                result["status"].tolist(),
+                result["probability"].tolist(),
+                result["action"].tolist(),
+                result["commission"].tolist()
+            )
+        ])
+
+        # HOT count and HOT ROI move with the new statuses and commissions
+        was_hot = frame["lead_status"] == "HOT"
+        is_hot = result["status"] == "HOT"
+        adjust_counters(
+            db,
+            hot_leads=int(is_hot.sum() - was_hot.sum()),
+            hot_roi=float(result["commission"][is_hot].sum() - frame["estimated_commission"].fillna(0)[was_hot].sum())
+        )
+        db.commit()
+
+        last_id = rows[-1].id
+        total += len(rows)
+
+    return total
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache.db")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))  # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1024"))
+
+def make_cache_key(model: str, template_version: str, inputs: dict) -> str:
+    """
+    Content address for one LLM call: identical model, prompt template version
+    and inputs always map to the same key.
+    """
+    payload = json.dumps([model, template_version, inputs], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """
+    Persistent cache of LLM responses in a standalone SQLite file, with TTL
+    expiry and LRU eviction beyond max_entries. Recently used entries are also
+    kept in memory so repeat hits skip SQLite entirely; their access times are
+    written back in batches, before any eviction, so hot entries stay on disk.
+    """
+    TOUCH_BATCH = 256  # memory hits buffered before their last_access is written
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES, memory_entries: int = LLM_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> (serialized value, expires_at)
+        self._touched = {}  # key -> last memory hit not yet written to SQLite
+        self._lock = threading.Lock()
+        self._connection = None  # opened on first use
+
+    @property
+    def _conn(self):
+        # Callers hold self._lock; importing a module that builds a cache
+        # should not create its file
+        if self._connection is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_access ON responses (last_access)")
+            self._connection = conn
+        return self._connection
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+    def _remember(self, key, serialized, expires_at):
+        self._memory[key] = (serialized, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                self._memory.move_to_end(key)
+                self._touched[key] = now
+                if len(self._touched) >= self.TOUCH_BATCH:
+                    self._flush_touched()
+                self.hits += 1
+                return json.loads(entry[0])
+
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._memory.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key: str, value):
+        now = time.time()
+        expires_at = now + self.ttl
+        serialized = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, serialized, expires_at, now)
+            )
+            self._remember(key, serialized, expires_at)
+            self._evict(now)
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET last_access = ? WHERE key = ? AND last_access < ?",
+                [(at, key, at) for key, at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _evict(self, now):
+        self._flush_touched()
+        self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+            self._memory.clear()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._flush_touched()
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError
+
+try:
+    from .tracing import span, observe
+except ImportError:
+    from tracing import span, observe
+
+# Budgets of the OpenAI account tier (0 = unlimited); requests wait for budget
+# instead of being rejected with 429s
+LLM_RPM_LIMIT = float(os.getenv("LLM_RPM_LIMIT", "500"))
+LLM_TPM_LIMIT = float(os.getenv("LLM_TPM_LIMIT", "200000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))   # requests in flight
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))            # retries of 429/5xx/connection errors
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))      # seconds, doubled per retry
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+# Completion tokens reserved per request until the response reports real usage
+LLM_COMPLETION_ESTIMATE = int(os.getenv("LLM_COMPLETION_ESTIMATE", "600"))
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+
+class LLMDeferred(Exception):
+    """
+    Raised in batch mode: the request was written to the batch file and its
+    result arrives later through the Batch API.
+    """
+
+def approx_tokens(text: str) -> int:
+    # ~4 characters per token for English text
+    return (len(text) + 3) // 4
+
+def estimate_tokens(messages) -> int:
+    # Plus per-message overhead
+    return sum(approx_tokens(str(m.get("content", ""))) + 4 for m in messages)
+
+class RateBudget:
+    """
+    Per-minute budget that refills continuously (a token bucket holding one
+    minute's worth). A request larger than the whole budget waits for a full
+    bucket rather than forever.
+    """
+
+    def __init__(self, per_minute: float, now: float = None):
+        self.capacity = per_minute
+        self.available = per_minute
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` is available (0 when it is available now).
+        """
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.available
+        return missing * 60 / self.capacity if missing > 0 else 0.0
+
+    def take(self, amount: float, now: float):
+        """
+        Spends `amount`; a negative amount gives unused budget back.
+        """
+        if self.capacity > 0:
+            self._refill(now)
+            self.available = min(self.capacity, self.available - amount)
+
+def backoff_delay(attempt: int, retry_after: float = None) -> float:
+    """
+    "Full jitter" exponential backoff, never shorter than the server's Retry-After.
+    """
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+def _retry_after(error) -> float:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+def _retryable(error) -> bool:
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, APIConnectionError)
+
+class LLMDispatcher:
+    """
+    Async chat-completions client for running many GPT requests at once.
+    Requests wait for room in the requests-per-minute and tokens-per-minute
+    budgets, at most `max_concurrency` are in flight per event loop, and
+    429/5xx/connection errors are retried with jittered exponential backoff.
+
+    With `batch_path` set nothing is sent: each request is appended to that
+    JSONL file in the OpenAI Batch API format and LLMDeferred is raised.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM_LIMIT, tpm: float = LLM_TPM_LIMIT,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES,
+                 client_factory=None, batch_path: str = None):
+        self.requests_budget = RateBudget(rpm)
+        self.tokens_budget = RateBudget(tpm)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        # The SDK's own retries are off; they would bypass the budgets
+        self.client_factory = client_factory or (lambda: AsyncOpenAI(max_retries=0))
+        self.batch_path = batch_path
+        self.stats = {"requests": 0, "retries": 0, "errors": 0, "deferred": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0}
+        # Event loop -> (client, semaphore); threads running their own loops
+        # (one per Streamlit session, or per batch chunk) each get their own
+        self._bound = {}
+        self._bound_lock = threading.Lock()
+        self._budget_lock = threading.Lock()
+        self._batch_ids = set()
+        self._batch_lock = threading.Lock()
+
+    def _bind(self):
+        # The client's connection pool and the semaphore belong to one event
+        # loop; batch jobs start a new loop per chunk (and close the client
+        # at the end of it, see aclose)
+        loop = asyncio.get_running_loop()
+        with self._bound_lock:
+            bound = self._bound.get(loop)
+            if bound is None:
+                # Loops that ended without aclose leave nothing to close
+                for old in [old for old in self._bound if old.is_closed()]:
+                    del self._bound[old]
+                bound = self._bound[loop] = (self.client_factory(), asyncio.Semaphore(self.max_concurrency))
+        return bound
+
+    async def aclose(self):
+        """
+        Closes the HTTP client bound to the running event loop. Call it before
+        that loop ends; the next request binds a new client.
+        """
+        with self._bound_lock:
+            bound = self._bound.pop(asyncio.get_running_loop(), None)
+        if bound is not None:
+            await bound[0].close()
+
+    async def _wait_for_budget(self, tokens: int):
+        started = time.perf_counter()
+        while True:
+            # The budgets are shared by every loop, so check and take atomically
+            with self._budget_lock:
+                now = time.monotonic()
+                wait = max(self.requests_budget.delay(1, now), self.tokens_budget.delay(tokens, now))
+                if wait <= 0:
+                    self.requests_budget.take(1, now)
+                    self.tokens_budget.take(tokens, now)
+                    break
+            await asyncio.sleep(wait)
+        observe("gpt_budget_wait", time.perf_counter() - started)
+
+    async def complete(self, messages: list, custom_id: str = None, stage: str = "gpt_request", **params):
+        """
+        Sends one chat completion and returns the response. `params` go to
+        the API as is (model, response_format, max_tokens, ...). The whole
+        call, budget waits and retries included, is timed as `stage`. In
+        batch mode `custom_id` identifies the request in the results file.
+        """
+        if self.batch_path:
+            self._write_batch_request(custom_id, dict(params, messages=messages))
+            raise LLMDeferred(custom_id)
+
+        client, slots = self._bind()
+        with span(stage):
+            return await self._send(client, slots, messages, params)
+
+    async def _send(self, client, slots, messages: list, params: dict):
+        reserved = estimate_tokens(messages) + params.get("max_tokens", LLM_COMPLETION_ESTIMATE)
+        attempt = 0
+        while True:
+            # Budget is only taken by requests about to be sent, so reservations
+            # do not pile up behind the concurrency limit and burst out later
+            async with slots:
+                await self._wait_for_budget(reserved)
+                try:
+                    self.stats["requests"] += 1
+                    response = await client.chat.completions.create(messages=messages, **params)
+                except Exception as e:
+                    # A failed attempt used no tokens
+                    with self._budget_lock:
+                        self.tokens_budget.take(-reserved, time.monotonic())
+                    error = e
+                else:
+                    usage = getattr(response, "usage", None)
+                    if usage is not None:
+                        self.stats["prompt_tokens"] += usage.prompt_tokens
+                        self.stats["completion_tokens"] += usage.completion_tokens
+                        # Settle the reservation against what the request really used
+                        with self._budget_lock:
+                            self.tokens_budget.take(usage.total_tokens - reserved, time.monotonic())
+                    return response
+
+            if not _retryable(error) or attempt >= self.max_retries:
+                self.stats["errors"] += 1
+                raise error
+            self.stats["retries"] += 1
+            await asyncio.sleep(backoff_delay(attempt, _retry_after(error)))
+            attempt += 1
+
+    def _write_batch_request(self, custom_id: str, body: dict):
+        if not custom_id:
+            raise ValueError("Batch requests need a custom_id")
+        line = json.dumps({"custom_id": custom_id, "method": "POST", "url": CHAT_COMPLETIONS_URL, "body": body})
+        with self._batch_lock:
+            # The same prompt is only billed once per batch
+            if custom_id in self._batch_ids:
+                return
+            self._batch_ids.add(custom_id)
+            with open(self.batch_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.stats["deferred"] += 1
+
+def read_batch_results(path: str):
+    """
+    Yields (custom_id, content, error) for each line of a Batch API output
+    (or error) file; content is None for failed requests.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            body = response.get("body") or {}
+            error = record.get("error") or body.get("error")
+            if error or response.get("status_code", 200) != 200:
+                yield record.get("custom_id"), None, error or f"HTTP {response.get('status_code')}"
+                continue
+            try:
+                yield record.get("custom_id"), body["choices"][0]["message"]["content"], None
+            except (KeyError, IndexError, TypeError):
+                yield record.get("custom_id"), None, "Malformed response body"
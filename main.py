@@ -1,31 +1,53 @@
 import uvicorn
-from fastapi import FastAPI, Request, Form, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Request, Form, HTTPException, Header, Depends
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+import asyncio
 import os
+import secrets
+import time
 from contextlib import asynccontextmanager
+from sqlalchemy.ext.asyncio import AsyncSession
 
 try:
-    from database import init_db, get_db
+    from database import init_db, dispose_async_engine, get_async_db
     from models import Lead
     from lead_scoring import calculate_lead_score
-    from telegram_bot import send_telegram_alert
+    from telegram_bot import send_telegram_alert, telegram_sender
     from scheduler import start_scheduler, schedule_lead_follow_ups
+    from lead_ingest import ingest_queue
+    from lead_identity import needs_alert
+    from agency_export import export_query, aiter_agency_csv
+    from tracing import (
+        span, observe, stage_metrics, should_profile, StackSampler, save_request_profile, PROFILE_SLOW_MS
+    )
 except ImportError:
-    from .database import init_db, get_db
+    from .database import init_db, dispose_async_engine, get_async_db
     from .models import Lead
     from .lead_scoring import calculate_lead_score
-    from .telegram_bot import send_telegram_alert
+    from .telegram_bot import send_telegram_alert, telegram_sender
     from .scheduler import start_scheduler, schedule_lead_follow_ups
+    from .lead_ingest import ingest_queue
+    from .lead_identity import needs_alert
+    from .agency_export import export_query, aiter_agency_csv
+    from .tracing import (
+        span, observe, stage_metrics, should_profile, StackSampler, save_request_profile, PROFILE_SLOW_MS
+    )
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
     start_scheduler()
+    await ingest_queue.start()
     yield
-    # Shutdown (if needed)
+    # Shutdown: commit any leads still waiting in the ingest queue
+    await ingest_queue.stop()
+    await telegram_sender.close()
+    await dispose_async_engine()
+
+# Bearer token for GET /export/agencies; the export is disabled while it is unset
+EXPORT_API_TOKEN = os.getenv("EXPORT_API_TOKEN")
 
 app = FastAPI(title="SpeedToLead AI: US Appointment Engine", lifespan=lifespan)
 
@@ -33,12 +55,48 @@ app = FastAPI(title="SpeedToLead AI: US Appointment Engine", lifespan=lifespan)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
 
+class ProfileRequests:
+    """
+    Stamps the arrival time (handlers use it to time request parsing) and runs
+    the opt-in sampling profiler (PROFILE_SAMPLE_RATE > 0): samples the stacks
+    of a fraction of requests and saves a flame graph of those slower than
+    PROFILE_SLOW_MS. A plain ASGI middleware, so requests that are not
+    sampled only pay for the timestamp.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        # Read back as request.state.received_at
+        scope.setdefault("state", {})["received_at"] = time.perf_counter()
+        if not should_profile():
+            await self.app(scope, receive, send)
+            return
+        sampler = StackSampler().start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = time.perf_counter() - start
+            stacks = sampler.stop()
+            if elapsed * 1000 >= PROFILE_SLOW_MS and stacks:
+                # Writing the file is blocking I/O, kept off the event loop
+                path = await asyncio.to_thread(save_request_profile, stacks, scope["method"], scope["path"], elapsed)
+                print(f"Slow request {scope['method']} {scope['path']} ({elapsed * 1000:.0f} ms) profiled to {path}")
+
+app.add_middleware(ProfileRequests)
+
 @app.get("/", response_class=HTMLResponse)
 async def read_form(request: Request):
     return templates.TemplateResponse("form.html", {"request": request})
 
 @app.post("/submit-lead")
 async def submit_lead(
+    request: Request,
     name: str = Form(...),
     email: str = Form(...),
     phone: str = Form(...),
@@ -50,9 +108,11 @@ async def submit_lead(
     mortgage_status: str = Form(...),
     cash_buyer: bool = Form(False),
     sms_opt_in: bool = Form(False),
-    message: str = Form(""),
-    db: Session = Depends(get_db)
+    message: str = Form("")
 ):
+    # Routing, form decoding and validation happen before the handler runs
+    observe("form_parse", time.perf_counter() - request.state.received_at)
+
     # 1. Lead Scoring
     lead_data = {
         "budget": budget,
@@ -61,9 +121,11 @@ async def submit_lead(
         "cash_buyer": cash_buyer,
         "message": message
     }
-    scoring_result = calculate_lead_score(lead_data)
+    with span("scoring"):
+        scoring_result = calculate_lead_score(lead_data)
 
-    # 2. Save to Database
+    # 2. Save to Database (async, group-committed with other concurrent submissions).
+    # A repeat submission by phone or email is merged into the existing lead and re-scored.
     new_lead = Lead(
         name=name,
         email=email,
@@ -81,37 +143,71 @@ async def submit_lead(
         close_probability=scoring_result['probability'],
         recommended_action=scoring_result['action'],
         sms_opt_in=sms_opt_in,
-        estimated_commission=scoring_result.get('commission', 0.0)
+        estimated_commission=scoring_result.get('commission', 0.0),
+        scoring_version=scoring_result['rules_version']
     )
-    db.add(new_lead)
-    db.commit()
-    db.refresh(new_lead)
+    with span("lead_save"):
+        saved = await ingest_queue.submit(new_lead)
 
-    # 3. Send Telegram Alert
-    lead_details_for_alert = {
-        "name": name,
-        "budget": budget,
-        "area": area,
-        "timeframe": timeframe,
-        "status": scoring_result['status'],
-        "probability": scoring_result['probability'],
-        "action": scoring_result['action']
-    }
+    # Both follow-ups run as background tasks; the span times handing them off
+    with span("task_scheduling"):
+        # 3. Send Telegram Alert (repeat submissions only when their status changed)
+        if needs_alert(saved):
+            lead_details_for_alert = {
+                "name": name,
+                "budget": budget,
+                "area": area,
+                "timeframe": timeframe,
+                "status": saved.status,
+                "probability": saved.probability,
+                "action": saved.action
+            }
+            asyncio.create_task(send_telegram_alert(lead_details_for_alert))
 
-    import asyncio
-    asyncio.create_task(send_telegram_alert(lead_details_for_alert))
-
-    # 4. Schedule Follow-ups (US Drip Campaign)
-    asyncio.create_task(schedule_lead_follow_ups(
-        new_lead.id,
-        name,
-        email,
-        phone,
-        scoring_result['status'],
-        sms_opt_in
-    ))
+        # 4. Schedule Follow-ups (US Drip Campaign). For a merged lead this
+        # replaces its pending steps, so it never receives two sequences.
+        asyncio.create_task(schedule_lead_follow_ups(saved.id))
 
     return HTMLResponse(content="<h2>Thank you for your inquiry! An agent will contact you shortly.</h2><a href='/'>Go Back</a>")
 
+def require_export_token(authorization: str = Header(None)):
+    """
+    The agency export holds every agency's contacts and outreach emails, so
+    it is only served to callers presenting EXPORT_API_TOKEN.
+    """
+    if not EXPORT_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Agency export is disabled; set EXPORT_API_TOKEN")
+    expected = f"Bearer {EXPORT_API_TOKEN}".encode()
+    if authorization is None or not secrets.compare_digest(authorization.encode(), expected):
+        raise HTTPException(status_code=401, detail="Invalid or missing export token",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+@app.get("/export/agencies", dependencies=[Depends(require_export_token)])
+async def export_agencies(columns: str = "", gzip: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """
+    Streams the agency intelligence report as CSV. `columns` is a comma-separated
+    list of report headers (default: the dashboard export); `gzip=true` compresses it.
+    """
+    selected = [c.strip() for c in columns.split(",") if c.strip()] or None
+    try:
+        export_query(selected)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    file_name = "enterprise_leads_full.csv.gz" if gzip else "enterprise_leads_full.csv"
+    return StreamingResponse(
+        aiter_agency_csv(db, selected, gzip_output=gzip),
+        media_type="application/gzip" if gzip else "text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Per-stage latency histograms (scoring, db_commit, alert_dispatch,
+    drip_schedule, homepage_fetch, html_parse, gpt_*) in the Prometheus format.
+    """
+    return PlainTextResponse(stage_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,207 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+
+try:
+    from .models import Base, DashboardCounters, ImportJob
+    from .dashboard import rebuild_counters
+    from .agency_identity import agency_identity_key
+    from .lead_identity import normalize_phone, normalize_email
+except ImportError:
+    from models import Base, DashboardCounters, ImportJob
+    from dashboard import rebuild_counters
+    from agency_identity import agency_identity_key
+    from lead_identity import normalize_phone, normalize_email
+
+logger = logging.getLogger(__name__)
+
+class MigrationError(RuntimeError):
+    pass
+
+def create_missing_indexes(bind, names=None):
+    """
+    create_all only builds indexes together with new tables; this adds any
+    index declared on the models (or only those in `names`) that an existing
+    database is still missing.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if names is None or index.name in names:
+                index.create(bind=bind, checkfirst=True)
+
+def _add_missing_columns(conn, table: str, columns: dict):
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    for col_name, col_type in columns.items():
+        if col_name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_type}"))
+            print(f"Added missing column: {table}.{col_name}")
+
+def _create_missing_tables(conn):
+    Base.metadata.create_all(bind=conn)
+
+def _upgrade_leads(conn):
+    # Every column added since the first release, so even very old databases are upgraded
+    _add_missing_columns(conn, "leads", {
+        "phone": "VARCHAR",
+        "email": "VARCHAR",
+        "budget": "FLOAT",
+        "area": "VARCHAR",
+        "property_type": "VARCHAR",
+        "timeframe": "VARCHAR",
+        "source": "VARCHAR",
+        "mortgage_status": "VARCHAR",
+        "cash_buyer": "BOOLEAN DEFAULT 0",
+        "message": "TEXT",
+        "sms_opt_in": "BOOLEAN DEFAULT 0",
+        "appointment_booked": "BOOLEAN DEFAULT 0",
+        "crm_synced": "BOOLEAN DEFAULT 0",
+        "estimated_commission": "FLOAT DEFAULT 0.0",
+        "score": "INTEGER DEFAULT 0",
+        "close_probability": "FLOAT DEFAULT 0.0",
+        "lead_status": "VARCHAR DEFAULT 'COLD'",
+        "recommended_action": "VARCHAR",
+        "last_contacted": "DATETIME",
+        "response_time_minutes": "FLOAT"
+    })
+
+def _upgrade_agency_leads(conn):
+    # Analysis, market (modules 2 & 3) and outreach (module 4) fields
+    _add_missing_columns(conn, "agency_leads", {
+        "owner_name": "VARCHAR",
+        "phone": "VARCHAR",
+        "email": "VARCHAR",
+        "city": "VARCHAR",
+        "state": "VARCHAR",
+        "google_rating": "FLOAT",
+        "num_listings": "INTEGER",
+        "classification": "VARCHAR",
+        "score": "INTEGER DEFAULT 0",
+        "strength_summary": "TEXT",
+        "growth_opportunity_summary": "TEXT",
+        "tier": "VARCHAR",
+        "market_analysis": "TEXT",
+        "weaknesses": "TEXT",
+        "outreach_email": "TEXT",
+        "outreach_status": "VARCHAR DEFAULT 'PENDING'",
+        "created_at": "DATETIME"
+    })
+
+def _create_workload_indexes(conn):
+    create_missing_indexes(conn, names={
+        "ix_leads_created_at_id", "ix_leads_status_created_at", "ix_leads_metrics",
+        "ix_leads_uncontacted", "ix_leads_unbooked", "ix_agency_leads_created_at",
+        "ix_agency_leads_tier_score", "ix_agency_leads_outreach_status",
+    })
+
+def _create_dashboard_counters(conn):
+    DashboardCounters.__table__.create(bind=conn, checkfirst=True)
+    with Session(bind=conn) as db:
+        rebuild_counters(db)
+
+def _create_import_jobs(conn):
+    ImportJob.__table__.create(bind=conn, checkfirst=True)
+
+def _add_agency_identity_key(conn):
+    _add_missing_columns(conn, "agency_leads", {"identity_key": "VARCHAR"})
+    # Newest row of each existing duplicate group keeps the key; older copies stay unkeyed
+    seen = set()
+    keyed = []
+    for agency_id, name, website in conn.execute(
+        text("SELECT id, agency_name, website FROM agency_leads WHERE identity_key IS NULL ORDER BY id DESC")
+    ):
+        key = agency_identity_key(name, website)
+        if key is not None and key not in seen:
+            seen.add(key)
+            keyed.append({"id": agency_id, "key": key})
+    if keyed:
+        conn.execute(text("UPDATE agency_leads SET identity_key = :key WHERE id = :id"), keyed)
+    create_missing_indexes(conn, names={"ux_agency_leads_identity_key"})
+
+def _add_lead_contact_keys(conn):
+    _add_missing_columns(conn, "leads", {"phone_key": "VARCHAR", "email_key": "VARCHAR"})
+    # Existing duplicates are keyed but left as they are; new submissions merge into the oldest
+    keyed = [
+        {"id": lead_id, "phone_key": normalize_phone(phone), "email_key": normalize_email(email)}
+        for lead_id, phone, email in conn.execute(
+            text("SELECT id, phone, email FROM leads WHERE phone_key IS NULL AND email_key IS NULL")
+        )
+    ]
+    if keyed:
+        conn.execute(text("UPDATE leads SET phone_key = :phone_key, email_key = :email_key WHERE id = :id"), keyed)
+    create_missing_indexes(conn, names={"ix_leads_phone_key", "ix_leads_email_key"})
+
+def _add_lead_scoring_version(conn):
+    _add_missing_columns(conn, "leads", {"scoring_version": "VARCHAR"})
+
+def _add_drip_sent_channels(conn):
+    _add_missing_columns(conn, "drip_steps", {"sent_channels": "VARCHAR"})
+
+# Ordered and append-only: a database at version N has run the first N steps.
+# Steps must be safe to re-run, since databases created before versioning
+# start from 0 whatever shape they are in.
+MIGRATIONS = [
+    ("create missing tables", _create_missing_tables),
+    ("leads: add scoring, CRM and tracking columns", _upgrade_leads),
+    ("agency_leads: add analysis and outreach columns", _upgrade_agency_leads),
+    ("add dashboard and pipeline indexes", _create_workload_indexes),
+    ("add incrementally maintained dashboard counters", _create_dashboard_counters),
+    ("add checkpoints for chunked agency imports", _create_import_jobs),
+    ("agency_leads: add unique identity key", _add_agency_identity_key),
+    ("leads: add normalized phone and email keys", _add_lead_contact_keys),
+    ("leads: record the scoring rules version", _add_lead_scoring_version),
+    ("drip_steps: record channels already delivered", _add_drip_sent_channels),
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn):
+    """
+    Stored schema version, or None if the database predates versioning.
+    """
+    try:
+        return conn.execute(text("SELECT version FROM schema_version")).scalar()
+    except (OperationalError, ProgrammingError):
+        conn.rollback()
+        return None
+
+def _set_schema_version(conn, version: int):
+    conn.execute(text("DELETE FROM schema_version"))
+    conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": version})
+
+def migrate(engine) -> int:
+    """
+    Brings the database up to SCHEMA_VERSION and returns the version it
+    started from. When the schema is already current this is a single query.
+    """
+    with engine.connect() as conn:
+        start = get_schema_version(conn)
+    if start == SCHEMA_VERSION:
+        return start
+    if start is not None and start > SCHEMA_VERSION:
+        raise MigrationError(f"Database schema version {start} is newer than this code ({SCHEMA_VERSION})")
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+        if start is None and not inspect(conn).has_table("leads"):
+            # Brand-new database: the models already describe the latest schema
+            Base.metadata.create_all(bind=conn)
+            with Session(bind=conn) as db:
+                rebuild_counters(db)
+            _set_schema_version(conn, SCHEMA_VERSION)
+            return 0
+
+    version = start or 0
+    for number, (description, step) in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            with engine.begin() as conn:
+                # Another process may have migrated while this one was waiting
+                current = get_schema_version(conn) or 0
+                if current >= number:
+                    continue
+                step(conn)
+                _set_schema_version(conn, number)
+        except Exception as e:
+            raise MigrationError(f"Schema migration {number} ({description}) failed: {e}") from e
+        logger.info("Applied schema migration %d: %s", number, description)
+    return version
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, Index, event
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime, timezone
 
@@ -31,12 +31,35 @@ class Lead(Base):
     close_probability = Column(Float, default=0.0)
     lead_status = Column(String, default="COLD") # HOT, WARM, COLD
     recommended_action = Column(String)
+    scoring_version = Column(String, nullable=True) # version of scoring_rules.json that set the score
 
     # Tracking fields
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     last_contacted = Column(DateTime, nullable=True)
     response_time_minutes = Column(Float, nullable=True)
 
+    # Normalized contact keys used to merge repeat submissions (see lead_identity.py)
+    phone_key = Column(String, nullable=True)  # E.164
+    email_key = Column(String, nullable=True)  # lowercased
+
+    # Indexes matching the dashboard queries (see dashboard.py)
+    __table_args__ = (
+        # Lead table pages: ORDER BY created_at DESC, id DESC
+        Index("ix_leads_created_at_id", created_at, id),
+        Index("ix_leads_status_created_at", lead_status, created_at),
+        # Covering index for the headline metrics aggregate
+        Index("ix_leads_metrics", lead_status, appointment_booked, estimated_commission, response_time_minutes),
+        # "Mark as Contacted" / "Book Appointment" pickers
+        Index("ix_leads_uncontacted", created_at, id,
+              sqlite_where=last_contacted.is_(None), postgresql_where=last_contacted.is_(None)),
+        Index("ix_leads_unbooked", created_at, id,
+              sqlite_where=appointment_booked.isnot(True), postgresql_where=appointment_booked.isnot(True)),
+        # Duplicate lookup on submission. Not unique: older databases may hold
+        # duplicates, and one person can match different leads by phone and email.
+        Index("ix_leads_phone_key", phone_key),
+        Index("ix_leads_email_key", email_key),
+    )
+
     def __repr__(self):
         return f"<Lead(name='{self.name}', status='{self.lead_status}', score={self.score})>"
 
@@ -71,5 +94,82 @@ class AgencyLead(Base):
 
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    # Canonical domain + normalized name (see agency_identity.py); NULL never conflicts
+    identity_key = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ux_agency_leads_identity_key", identity_key, unique=True),
+        # Enterprise pipeline listing: ORDER BY created_at DESC
+        Index("ix_agency_leads_created_at", created_at),
+        Index("ix_agency_leads_tier_score", tier, score),
+        Index("ix_agency_leads_outreach_status", outreach_status, created_at),
+    )
+
     def __repr__(self):
         return f"<AgencyLead(name='{self.agency_name}', tier='{self.tier}', score={self.score})>"
+
+class DripStep(Base):
+    """
+    One pending step of a lead's US drip campaign. Rows only carry the lead id
+    and the step label; contact details are read from `leads` at send time.
+    """
+    __tablename__ = "drip_steps"
+    __table_args__ = (
+        Index("ix_drip_steps_status_due_at", "status", "due_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    lead_id = Column(Integer, index=True, nullable=False)
+    step = Column(String, nullable=False) # "1 day follow-up", "3 day follow-up", ...
+    due_at = Column(DateTime, nullable=False)
+    status = Column(String, default="PENDING", nullable=False) # PENDING, CLAIMED, FAILED
+    attempts = Column(Integer, default=0, nullable=False)
+    claim_token = Column(String(32), nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    sent_channels = Column(String, nullable=True) # "telegram,sms" - delivered by an earlier attempt
+
+    def __repr__(self):
+        return f"<DripStep(lead_id={self.lead_id}, step='{self.step}', due_at={self.due_at})>"
+
+class ImportJob(Base):
+    """
+    Checkpoint of one bulk agency CSV import. rows_done only advances when a
+    chunk's agencies are committed, so an interrupted import of the same file
+    resumes after the last committed chunk.
+    """
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True)
+    source = Column(String) # uploaded file name
+    fingerprint = Column(String(64), index=True, nullable=False) # sha256 of the file contents
+    status = Column(String, default="RUNNING", nullable=False) # RUNNING, DONE
+    rows_done = Column(Integer, default=0, nullable=False)
+    rows_written = Column(Integer, default=0, nullable=False)
+    rows_failed = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class DashboardCounters(Base):
+    """
+    Single-row running totals behind the dashboard headline metrics. Kept in
+    step with `leads` by the code paths that write leads (see dashboard.py);
+    `python dashboard.py --rebuild-counters` recomputes it from scratch.
+    """
+    __tablename__ = "dashboard_counters"
+
+    id = Column(Integer, primary_key=True)
+    total_leads = Column(Integer, default=0, nullable=False)
+    hot_leads = Column(Integer, default=0, nullable=False)
+    appointments = Column(Integer, default=0, nullable=False)
+    hot_roi = Column(Float, default=0.0, nullable=False)
+    # Average response time is response_minutes_total / responses
+    responses = Column(Integer, default=0, nullable=False)
+    response_minutes_total = Column(Float, default=0.0, nullable=False)
+
+@event.listens_for(DashboardCounters.__table__, "after_create")
+def _seed_dashboard_counters(table, connection, **kw):
+    # A new table starts with the single row (dashboard.COUNTERS_ID) at zero,
+    # so writers only ever UPDATE it
+    connection.execute(table.insert().values(
+        id=1, total_leads=0, hot_leads=0, appointments=0, hot_roi=0.0, responses=0, response_minutes_total=0.0
+    ))
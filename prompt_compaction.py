@@ -0,0 +1,114 @@
+import math
+import os
+import re
+
+try:
+    from .llm_dispatch import approx_tokens
+except ImportError:
+    from llm_dispatch import approx_tokens
+
+# Homepage text handed to the GPT analysis is compacted to the sentences most
+# relevant to it, packed into PROMPT_TOKEN_BUDGET tokens (PROMPT_COMPACTION=0
+# hands over the first SCRAPE_TEXT_BUDGET characters instead)
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "1") != "0"
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "500"))
+
+# Phrases answering what the analysis prompt asks for, with their weight. Matched
+# as word prefixes, so "automat" covers "automated" and "automation".
+SIGNAL_TERMS = {
+    # Lead capture and response infrastructure (the weaknesses GPT looks for)
+    "chat": 3, "chatbot": 3, "live chat": 3, "text us": 3, "sms": 3, "texting": 3, "text message": 3,
+    "contact form": 3, "contact us": 2, "fill out": 2, "inquiry": 1.5, "schedule": 2, "book": 2,
+    "calendar": 2, "showing": 1, "24/7": 3, "instant": 2, "automat": 2, "respond": 2, "response": 2,
+    "call": 1.5, "email": 1, "newsletter": 1, "alert": 1.5, "app": 1,
+    # Market, niche, audience, positioning and USP
+    "luxury": 2, "commercial": 2, "rental": 2, "property management": 2, "residential": 1.5,
+    "waterfront": 1.5, "new construction": 1.5, "condo": 1, "investor": 1.5, "first-time": 1.5,
+    "relocat": 1.5, "specializ": 2, "serving": 1.5, "expert": 1, "award": 1.5, "years": 1,
+    "top": 1, "team": 1, "agents": 1, "buyers": 1, "sellers": 1, "neighborhood": 1,
+}
+# Phrases of cookie banners, legal notices and listing-card furniture
+BOILERPLATE_TERMS = [
+    "cookie", "privacy policy", "terms of use", "terms of service", "all rights reserved",
+    "equal housing", "deemed reliable", "manage preferences", "courtesy of", "mls",
+    "square footage is approximate", "view details", "data last updated",
+]
+MAX_LISTINGS = 3  # listing cards kept as examples of the price range
+
+_SIGNAL_RE = re.compile(r"\b(" + "|".join(
+    re.escape(term) for term in sorted(SIGNAL_TERMS, key=len, reverse=True)
+) + ")", re.IGNORECASE)
+_BOILERPLATE_RE = re.compile("|".join(re.escape(term) for term in BOILERPLATE_TERMS), re.IGNORECASE)
+_LISTING_RE = re.compile(r"\$\s?\d[\d,.]*\s*(?:[kKmM]\b)?.*\b(?:beds?|baths?|sq\s?ft|sqft)\b", re.IGNORECASE)
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[A-Z0-9$])")
+_DIGITS_RE = re.compile(r"\d+")
+
+def split_sentences(text: str):
+    """
+    Splits extracted homepage text into sentence-sized units, in order.
+    """
+    for line in text.splitlines():
+        for sentence in _SENTENCE_END_RE.split(line.strip()):
+            sentence = sentence.strip()
+            if sentence:
+                yield sentence
+
+def score_sentence(sentence: str) -> float:
+    """
+    Relevance of one sentence to the website analysis: the weights of the
+    distinct signal phrases it contains, minus a penalty per boilerplate
+    phrase. Any other sentence scores a little, as general context.
+    """
+    terms = {match.lower() for match in _SIGNAL_RE.findall(sentence)}
+    score = 0.5 + sum(SIGNAL_TERMS[term] for term in terms)
+    return score - 4 * len(_BOILERPLATE_RE.findall(sentence))
+
+def compact_text(text: str, token_budget: int) -> str:
+    """
+    Extractive compaction: keeps the highest-scoring sentences (per token, so
+    one long sentence does not crowd out several relevant ones) that fit in
+    token_budget, in their original order. Boilerplate, repeated sentences
+    and all but MAX_LISTINGS listing cards are dropped first.
+    """
+    candidates = []
+    seen = set()
+    listings = 0
+    for position, sentence in enumerate(split_sentences(text)):
+        # Sentences differing only in numbers (prices, phone numbers) are repeats
+        fingerprint = _DIGITS_RE.sub("0", sentence.lower())
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+
+        listing = _LISTING_RE.search(sentence)
+        if listing:
+            listings += 1
+            if listings > MAX_LISTINGS:
+                continue
+            # Card text runs into whatever follows it (often a disclaimer)
+            sentence = sentence[:listing.end()]
+        score = score_sentence(sentence)
+        if score <= 0:
+            continue
+        tokens = approx_tokens(sentence) + 1  # plus the joining newline
+        candidates.append((score / math.sqrt(tokens), -position, position, tokens, sentence))
+
+    chosen = []
+    remaining = token_budget
+    for _, _, position, tokens, sentence in sorted(candidates, reverse=True):
+        if tokens <= remaining:
+            chosen.append((position, sentence))
+            remaining -= tokens
+    return "\n".join(sentence for _, sentence in sorted(chosen))
+
+def compact_homepage(content: str, token_budget: int = PROMPT_TOKEN_BUDGET) -> str:
+    """
+    Compacts scrape_homepage's "Title/Description/Content" layout: title and
+    description are kept as they are and the content is compacted into what
+    is left of token_budget.
+    """
+    header, separator, body = content.partition("\n\nContent:\n")
+    if not separator:
+        return compact_text(content, token_budget)
+    header += separator
+    return header + compact_text(body, max(0, token_budget - approx_tokens(header)))
@@ -6,15 +6,26 @@ except ImportError:
     AsyncIOScheduler = None
     BackgroundScheduler = None
 
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 import asyncio
+import os
 
 try:
     from .telegram_bot import send_follow_up_reminder
     from .communication import send_sms_lead, send_email_lead, get_us_realtor_script
+    from .drip_engine import (
+        DRIP_BATCH_SIZE, enqueue_lead_drips, release_stale_claims,
+        claim_due_steps, complete_steps, fail_step, record_sent_channels
+    )
+    from .tracing import span
 except ImportError:
     from telegram_bot import send_follow_up_reminder
     from communication import send_sms_lead, send_email_lead, get_us_realtor_script
+    from drip_engine import (
+        DRIP_BATCH_SIZE, enqueue_lead_drips, release_stale_claims,
+        claim_due_steps, complete_steps, fail_step, record_sent_channels
+    )
+    from tracing import span
 
 # Detect if we are in an environment that prefers BackgroundScheduler (like Streamlit)
 # or AsyncIOScheduler (like FastAPI)
@@ -22,6 +33,9 @@ except ImportError:
 
 scheduler = AsyncIOScheduler()
 
+# How often the drip poller looks for due steps (seconds)
+DRIP_POLL_INTERVAL = int(os.getenv("DRIP_POLL_INTERVAL", "30"))
+
 def start_scheduler():
     global scheduler
     if not scheduler.running:
@@ -36,6 +50,17 @@ def start_scheduler():
             if not isinstance(scheduler, BackgroundScheduler):
                 scheduler = BackgroundScheduler()
             scheduler.start()
+
+        job_func = poll_due_drips if isinstance(scheduler, AsyncIOScheduler) else _run_poller_sync
+        scheduler.add_job(
+            job_func,
+            'interval',
+            seconds=DRIP_POLL_INTERVAL,
+            id="drip_poller",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
         print(f"Scheduler started using {type(scheduler).__name__}.")
 
 def is_quiet_hours():
@@ -47,71 +72,93 @@ def is_quiet_hours():
     now_hour = datetime.now().hour
     return now_hour < 8 or now_hour > 20
 
-async def run_us_drip(lead_id: int, name: str, email: str, phone: str, status: str, opt_in: bool, timeframe: str):
+async def run_us_drip(lead_id: int, name: str, email: str, phone: str, status: str, opt_in: bool, timeframe: str,
+                      sent=(), on_sent=None):
     """
     Executes a US-style SMS/Email drip step.
+    Channels in `sent` were delivered by an earlier attempt and are skipped;
+    `on_sent(channel)` is awaited after each delivery. Raises RuntimeError
+    once every channel was tried if any of them failed.
     """
     script = get_us_realtor_script(name, status)
+    failed = []
+
+    async def delivered(channel):
+        if on_sent is not None:
+            await on_sent(channel)
 
     # Send Internal Telegram Alert to Agent (Always send to agent)
-    await send_follow_up_reminder(name, status, timeframe)
+    if "telegram" not in sent:
+        if await send_follow_up_reminder(name, status, timeframe):
+            await delivered("telegram")
+        else:
+            failed.append("Telegram reminder")
 
     # Send Customer SMS (Compliance check + Quiet Hours check)
-    if not is_quiet_hours():
-        await send_sms_lead(phone, script, opt_in)
-    else:
-        print(f"Quiet hours active. Skipping SMS for {name} at this time.")
+    if "sms" not in sent:
+        if not is_quiet_hours():
+            await send_sms_lead(phone, script, opt_in)
+            await delivered("sms")
+        else:
+            print(f"Quiet hours active. Skipping SMS for {name} at this time.")
 
     # Send Customer Email (Usually okay 24/7, but we could restrict it too)
-    await send_email_lead(email, f"Quick question regarding your home search", script)
+    if "email" not in sent:
+        if await send_email_lead(email, f"Quick question regarding your home search", script):
+            await delivered("email")
+        else:
+            failed.append(f"Email to {email}")
+
+    if failed:
+        raise RuntimeError(f"{' and '.join(failed)} not sent")
 
-async def schedule_lead_follow_ups(lead_id: int, lead_name: str, lead_email: str, lead_phone: str, lead_status: str, sms_opt_in: bool):
+async def poll_due_drips():
     """
-    Schedules US-style 1, 3, and 7-day drip campaigns for a new lead.
+    Claims due drip steps from the drip_steps table in batches and runs them.
+    Memory stays bounded by DRIP_BATCH_SIZE however large the backlog is.
     """
-    now = datetime.now(timezone.utc)
+    await asyncio.to_thread(release_stale_claims)
 
-    def run_drip_wrapper(id, n, e, p, s, opt, t):
-        try:
-            asyncio.run(run_us_drip(id, n, e, p, s, opt, t))
-        except RuntimeError:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                loop.create_task(run_us_drip(id, n, e, p, s, opt, t))
-            else:
-                loop.run_until_complete(run_us_drip(id, n, e, p, s, opt, t))
-
-    is_async = isinstance(scheduler, AsyncIOScheduler)
-    job_func = run_us_drip if is_async else run_drip_wrapper
-
-    # 1 Day Drip
-    scheduler.add_job(
-        job_func,
-        'date',
-        run_date=now + timedelta(days=1),
-        args=[lead_id, lead_name, lead_email, lead_phone, lead_status, sms_opt_in, "1 day follow-up"],
-        id=f"followup_1d_{lead_id}",
-        replace_existing=True
-    )
-
-    # 3 Day Drip
-    scheduler.add_job(
-        job_func,
-        'date',
-        run_date=now + timedelta(days=3),
-        args=[lead_id, lead_name, lead_email, lead_phone, lead_status, sms_opt_in, "3 day follow-up"],
-        id=f"followup_3d_{lead_id}",
-        replace_existing=True
-    )
+    async def run_step(step):
+        if step.name is None:
+            # Lead was deleted after enrollment; nothing left to send
+            await asyncio.to_thread(complete_steps, [step.id])
+            return
+        sent = set(filter(None, (step.sent_channels or "").split(",")))
 
-    # 7 Day Drip
-    scheduler.add_job(
-        job_func,
-        'date',
-        run_date=now + timedelta(days=7),
-        args=[lead_id, lead_name, lead_email, lead_phone, lead_status, sms_opt_in, "7 day follow-up"],
-        id=f"followup_7d_{lead_id}",
-        replace_existing=True
-    )
+        async def on_sent(channel):
+            # Recorded before the next channel goes out, so a retry skips it
+            sent.add(channel)
+            await asyncio.to_thread(record_sent_channels, step.id, sent)
 
-    print(f"Follow-ups scheduled for lead {lead_id}: {lead_name}")
+        try:
+            with span("drip_step"):
+                await run_us_drip(step.lead_id, step.name, step.email, step.phone,
+                                  step.lead_status, step.sms_opt_in, step.step, sent, on_sent)
+        except Exception as e:
+            print(f"Drip step {step.step} failed for lead {step.lead_id}: {e}")
+            await asyncio.to_thread(fail_step, step.id, step.attempts)
+            return
+        await asyncio.to_thread(complete_steps, [step.id])
+
+    while True:
+        steps = await asyncio.to_thread(claim_due_steps, DRIP_BATCH_SIZE)
+        if not steps:
+            break
+        await asyncio.gather(*(run_step(step) for step in steps))
+        if len(steps) < DRIP_BATCH_SIZE:
+            break
+
+def _run_poller_sync():
+    # BackgroundScheduler runs jobs in worker threads without an event loop
+    asyncio.run(poll_due_drips())
+
+async def schedule_lead_follow_ups(lead_id: int):
+    """
+    Enrolls a lead in the US-style 1, 3, and 7-day drip campaign.
+    Steps are persisted in drip_steps, so they survive restarts; re-enrolling
+    a lead replaces its pending steps.
+    """
+    with span("drip_schedule"):
+        await asyncio.to_thread(enqueue_lead_drips, lead_id)
+    print(f"Follow-ups scheduled for lead {lead_id}")
@@ -0,0 +1,333 @@
+import json
+import os
+import threading
+import time
+from numbers import Real
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCORING_RULES_PATH = os.getenv("SCORING_RULES_PATH", os.path.join(BASE_DIR, "scoring_rules.json"))
+SCORING_RULES_CHECK_INTERVAL = float(os.getenv("SCORING_RULES_CHECK_INTERVAL", "2"))  # seconds between mtime checks
+
+_monotonic = time.monotonic
+
+class ScoringRulesError(ValueError):
+    pass
+
+def _number(value, where: str):
+    if isinstance(value, bool) or not isinstance(value, Real):
+        raise ScoringRulesError(f"{where} must be a number, got {value!r}")
+    return value
+
+def _text(value, where: str):
+    if not isinstance(value, str) or not value:
+        raise ScoringRulesError(f"{where} must be a non-empty string, got {value!r}")
+    return value
+
+def _list(value, where: str) -> list:
+    if not isinstance(value, list):
+        raise ScoringRulesError(f"{where} must be a list, got {value!r}")
+    return value
+
+def _object(value, where: str) -> dict:
+    if not isinstance(value, dict):
+        raise ScoringRulesError(f"{where} must be an object, got {value!r}")
+    return value
+
+def _tier(value, where: str) -> tuple:
+    if not isinstance(value, list) or len(value) != 2:
+        raise ScoringRulesError(f"{where} must be a [threshold, points] pair, got {value!r}")
+    return _number(value[0], f"{where} threshold"), _number(value[1], f"{where} points")
+
+def _validate(config: dict) -> dict:
+    """
+    Checks a rules config and returns it normalized: threshold tiers and
+    statuses sorted from highest to lowest, keywords lowercased.
+    """
+    if not isinstance(config, dict):
+        raise ScoringRulesError("Scoring rules must be a JSON object")
+    if "version" not in config:
+        raise ScoringRulesError("Scoring rules need a version")
+
+    rules = []
+    for i, rule in enumerate(_list(config.get("rules", []), "rules")):
+        where = f"rules[{i}]"
+        if not isinstance(rule, dict):
+            raise ScoringRulesError(f"{where} must be an object")
+        kind = rule.get("type")
+        field = _text(rule.get("field"), f"{where}.field")
+        if kind == "flag":
+            rules.append({"type": kind, "field": field, "points": _number(rule.get("points"), f"{where}.points")})
+        elif kind == "match":
+            points = rule.get("points")
+            if not isinstance(points, dict) or not points:
+                raise ScoringRulesError(f"{where}.points must map values to points")
+            rules.append({"type": kind, "field": field, "points": {
+                _text(value, f"{where} value"): _number(p, f"{where}.points[{value!r}]") for value, p in points.items()
+            }})
+        elif kind == "threshold":
+            tiers = [_tier(t, f"{where}.tiers[{j}]") for j, t in enumerate(_list(rule.get("tiers", []), f"{where}.tiers"))]
+            if not tiers:
+                raise ScoringRulesError(f"{where}.tiers must not be empty")
+            rules.append({"type": kind, "field": field, "tiers": sorted(tiers, reverse=True)})
+        elif kind == "keyword":
+            keywords = [_text(k, f"{where} keyword").lower() for k in _list(rule.get("keywords", []), f"{where}.keywords")]
+            if not keywords:
+                raise ScoringRulesError(f"{where}.keywords must not be empty")
+            rules.append({"type": kind, "field": field, "keywords": keywords,
+                          "points": _number(rule.get("points"), f"{where}.points")})
+        else:
+            raise ScoringRulesError(f"{where}: unknown rule type {kind!r}")
+
+    statuses = []
+    for i, status in enumerate(_list(config.get("statuses", []), "statuses")):
+        where = f"statuses[{i}]"
+        status = _object(status, where)
+        statuses.append({"status": _text(status.get("status"), f"{where}.status"),
+                         "min_score": _number(status.get("min_score"), f"{where}.min_score"),
+                         "action": _text(status.get("action"), f"{where}.action")})
+    statuses.sort(key=lambda s: s["min_score"], reverse=True)
+    if not statuses:
+        raise ScoringRulesError("Scoring rules need at least one status")
+
+    probability = _object(config.get("probability", {}), "probability")
+    commission = _object(config.get("commission", {}), "commission")
+    return {
+        "version": str(config["version"]),
+        "rules": rules,
+        "max_score": _number(config.get("max_score", 100), "max_score"),
+        "statuses": statuses,
+        "probability": {
+            "per_point": _number(probability.get("per_point"), "probability.per_point"),
+            "max": _number(probability.get("max"), "probability.max")
+        },
+        "commission": {
+            "field": _text(commission.get("field"), "commission.field"),
+            "rate": _number(commission.get("rate"), "commission.rate")
+        }
+    }
+
+def _all_points(config: dict) -> list:
+    points = [config["max_score"]]
+    for rule in config["rules"]:
+        if rule["type"] == "match":
+            points += rule["points"].values()
+        elif rule["type"] == "threshold":
+            points += [p for _, p in rule["tiers"]]
+        else:
+            points.append(rule["points"])
+    return points
+
+def _outcome(config: dict, score):
+    """
+    (status, action, probability) for a final score.
+    """
+    status = next((s for s in config["statuses"] if score >= s["min_score"]), config["statuses"][-1])
+    probability = config["probability"]
+    return status["status"], status["action"], min(score * probability["per_point"], probability["max"])
+
+def _outcome_table(config: dict):
+    """
+    Outcome of every possible score when scores can only be whole numbers in
+    0..max_score (non-negative integer points), else None.
+    """
+    points = _all_points(config)
+    if not all(isinstance(p, int) and p >= 0 for p in points):
+        return None
+    return tuple(_outcome(config, score) for score in range(config["max_score"] + 1))
+
+def _scalar_source(config: dict, table: bool) -> str:
+    """
+    Python source of a score_lead(lead_data) function implementing the rules.
+    Every value from the config is embedded with repr() after validation, so
+    the result is plain straight-line code with no per-call interpretation.
+    With table, status, action and probability are looked up by score in the
+    precomputed _outcomes tuple instead of being worked out per call.
+    """
+    lines = ["def score_lead(lead_data, _outcomes=_OUTCOMES):" if table else "def score_lead(lead_data):",
+             "    score = 0"]
+    numeric = {}  # field -> local holding lead_data.get(field, 0), shared with the commission
+
+    def numeric_local(field):
+        if field not in numeric:
+            numeric[field] = f"number_{len(numeric)}"
+            lines.append(f"    {numeric[field]} = lead_data.get({field!r}, 0)")
+        return numeric[field]
+
+    for rule in config["rules"]:
+        field = rule["field"]
+        if rule["type"] == "flag":
+            lines += [f"    if lead_data.get({field!r}):", f"        score += {rule['points']!r}"]
+        elif rule["type"] == "match":
+            lines.append(f"    value = lead_data.get({field!r})")
+            for i, (value, points) in enumerate(rule["points"].items()):
+                lines += [f"    {'if' if i == 0 else 'elif'} value == {value!r}:", f"        score += {points!r}"]
+        elif rule["type"] == "threshold":
+            value = numeric_local(field)
+            for i, (threshold, points) in enumerate(rule["tiers"]):
+                lines += [f"    {'if' if i == 0 else 'elif'} {value} >= {threshold!r}:", f"        score += {points!r}"]
+        elif rule["type"] == "keyword":
+            condition = " or ".join(f"{k!r} in text" for k in rule["keywords"])
+            lines += [f"    text = (lead_data.get({field!r}) or '').lower()",
+                      f"    if {condition}:", f"        score += {rule['points']!r}"]
+
+    commission = config["commission"]
+    lines += [
+        f"    commission = {numeric_local(commission['field'])} * {commission['rate']!r}",
+        f"    if score > {config['max_score']!r}:",
+        f"        score = {config['max_score']!r}",
+    ]
+    if table:
+        lines.append("    status, action, probability = _outcomes[score]")
+    else:
+        statuses = config["statuses"]
+        for i, status in enumerate(statuses[:-1]):
+            lines += [f"    {'if' if i == 0 else 'elif'} score >= {status['min_score']!r}:",
+                      f"        status, action = {status['status']!r}, {status['action']!r}"]
+        last = statuses[-1]
+        indent = "        " if len(statuses) > 1 else "    "
+        if len(statuses) > 1:
+            lines.append("    else:")
+        probability = config["probability"]
+        lines += [
+            f"{indent}status, action = {last['status']!r}, {last['action']!r}",
+            f"    probability = min(score * {probability['per_point']!r}, {probability['max']!r})",
+        ]
+
+    lines += [
+        "    return {",
+        "        'score': score,",
+        "        'status': status,",
+        "        'probability': probability,",
+        "        'action': action,",
+        "        'commission': commission,",
+        f"        'rules_version': {config['version']!r}",
+        "    }",
+    ]
+    return "\n".join(lines) + "\n"
+
+class RuleSet:
+    """
+    A validated, compiled scoring config. score() is generated Python (see
+    _scalar_source); score_batch() applies the same rules with numpy.
+    """
+
+    def __init__(self, config: dict):
+        self.config = _validate(config)
+        self.version = self.config["version"]
+        outcomes = _outcome_table(self.config)
+        self.source = _scalar_source(self.config, table=outcomes is not None)
+        namespace = {"_OUTCOMES": outcomes}
+        exec(compile(self.source, f"<scoring rules {self.version}>", "exec"), namespace)
+        self.score = namespace["score_lead"]
+
+    def score_batch(self, leads: pd.DataFrame) -> pd.DataFrame:
+        """
+        Vectorized score() over a DataFrame with one column per lead_data key
+        (missing columns take the same defaults as score()).
+        """
+        n = len(leads)
+
+        def column(name, default):
+            if name in leads:
+                return leads[name]
+            return pd.Series([default] * n, index=leads.index, dtype=object)
+
+        score = np.zeros(n, dtype=np.int64 if self._integral() else float)
+        for rule in self.config["rules"]:
+            field = rule["field"]
+            if rule["type"] == "flag":
+                values = column(field, False)
+                if values.dtype == object:
+                    # Python truthiness, exactly as the scalar `if lead_data.get(...)`
+                    flags = values.map(bool).to_numpy(dtype=bool)
+                else:
+                    flags = values.to_numpy() != 0
+                score += np.where(flags, rule["points"], 0)
+            elif rule["type"] == "match":
+                values = column(field, None).to_numpy(dtype=object)
+                score += np.select([values == v for v in rule["points"]], list(rule["points"].values()), 0)
+            elif rule["type"] == "threshold":
+                values = pd.to_numeric(column(field, 0)).to_numpy(dtype=float)
+                score += np.select([values >= t for t, _ in rule["tiers"]], [p for _, p in rule["tiers"]], 0)
+            elif rule["type"] == "keyword":
+                text = column(field, "").fillna("").astype(str).str.lower()
+                hit = np.zeros(n, dtype=bool)
+                for keyword in rule["keywords"]:
+                    hit |= text.str.contains(keyword, regex=False).to_numpy(dtype=bool)
+                score += np.where(hit, rule["points"], 0)
+
+        commission = self.config["commission"]
+        estimated_commission = pd.to_numeric(column(commission["field"], 0)).to_numpy(dtype=float) * commission["rate"]
+        score = np.minimum(score, self.config["max_score"])
+
+        statuses = self.config["statuses"]
+        conditions = [score >= s["min_score"] for s in statuses[:-1]]
+        status = np.select(conditions, [s["status"] for s in statuses[:-1]], statuses[-1]["status"]).astype(object)
+        action = np.select(conditions, [s["action"] for s in statuses[:-1]], statuses[-1]["action"]).astype(object)
+
+        probability = self.config["probability"]
+        return pd.DataFrame({
+            "score": score,
+            "status": status,
+            "probability": np.minimum(score * probability["per_point"], probability["max"]),
+            "action": action,
+            "commission": estimated_commission,
+            "rules_version": self.version
+        }, index=leads.index)
+
+    def _integral(self) -> bool:
+        return all(isinstance(p, int) for p in _all_points(self.config))
+
+def load_rules(path: str = SCORING_RULES_PATH) -> RuleSet:
+    with open(path, encoding="utf-8") as f:
+        try:
+            config = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ScoringRulesError(f"{path} is not valid JSON: {e}") from e
+    return RuleSet(config)
+
+class RuleLoader:
+    """
+    Serves the current RuleSet, reloading the rules file when its mtime
+    changes (checked at most every check_interval seconds), so edits take
+    effect without restarting uvicorn or Streamlit. A file that fails to
+    load or validate is reported and the previous rules stay in use.
+    """
+
+    def __init__(self, path: str = SCORING_RULES_PATH, check_interval: float = SCORING_RULES_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._rules = None
+        self._mtime = None
+        self._next_check = 0.0
+
+    def current(self) -> RuleSet:
+        # Until the first load has finished every caller goes through the lock
+        if self._rules is None or _monotonic() >= self._next_check:
+            self._refresh()
+        return self._rules
+
+    def _refresh(self):
+        with self._lock:
+            self._next_check = _monotonic() + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime == self._mtime and self._rules is not None:
+                    return
+                if self._rules is not None:
+                    self._mtime = mtime  # a broken edit is reported once, not on every check
+                rules = load_rules(self.path)
+            except Exception as e:
+                if self._rules is None:
+                    self._next_check = 0.0
+                    raise
+                print(f"Could not reload scoring rules from {self.path} ({e}). Keeping version {self._rules.version}.")
+                return
+            if self._rules is not None and rules.version != self._rules.version:
+                print(f"Scoring rules reloaded: version {self._rules.version} -> {rules.version}")
+            self._rules, self._mtime = rules, mtime
+
+rule_loader = RuleLoader()
@@ -1,11 +1,225 @@
 import asyncio
 import os
+import threading
+import time
+from collections import deque
+from datetime import timedelta
 from telegram import Bot
 from telegram.constants import ParseMode
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+from telegram.request import HTTPXRequest
+
+try:
+    from .tracing import span
+except ImportError:
+    from tracing import span
 
 # These should be set in environment variables
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+# Bot API endpoint; point at a self-hosted Bot API server (or a local stub) to override
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
+
+# Telegram allows ~30 messages/second overall and ~20 messages/minute into one group
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "25"))  # messages per second
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "20"))      # messages per minute per chat
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "5"))
+TELEGRAM_POOL_SIZE = int(os.getenv("TELEGRAM_POOL_SIZE", "8"))
+
+class _LoopQueues:
+    """
+    Send queues, worker task and Bot of one event loop.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.bot = None
+        self.wakeup = asyncio.Event()
+        self.closing = False
+        self.pending = {}
+        self.in_flight = set()
+        self.worker = None
+
+class TelegramSender:
+    """
+    Process-wide Telegram sender. Keeps one Bot (and its pooled HTTP client)
+    alive per event loop and pushes every message through per-chat queues
+    that space sends to stay within the global and per-chat rate limits,
+    honouring 429 retry_after. Rate limits are shared by every loop (the
+    Streamlit drip poller runs its own asyncio.run next to the app's); when a
+    loop shuts down, messages still queued on it fail and its Bot is closed.
+    """
+
+    def __init__(self, token: str, global_rate: float = TELEGRAM_GLOBAL_RATE,
+                 chat_rate: float = TELEGRAM_CHAT_RATE, max_retries: int = TELEGRAM_MAX_RETRIES):
+        self.token = token
+        self.global_interval = 1 / global_rate if global_rate > 0 else 0
+        self.chat_interval = 60 / chat_rate if chat_rate > 0 else 0
+        self.max_retries = max_retries
+        self._states = {}
+        self._states_lock = threading.Lock()
+        self._rate_lock = threading.Lock()
+        # time.monotonic() deadlines, shared across loops
+        self._next_global = 0.0
+        self._next_chat = {}
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Messages waiting for a send slot (not counting ones in flight).
+        """
+        return sum(len(q) for state in list(self._states.values()) for q in list(state.pending.values()))
+
+    def _state(self) -> _LoopQueues:
+        loop = asyncio.get_running_loop()
+        with self._states_lock:
+            state = self._states.get(loop)
+            if state is None or state.worker.done():
+                state = _LoopQueues(loop)
+                state.worker = loop.create_task(self._run(state))
+                self._states[loop] = state
+        return state
+
+    async def send(self, chat_id, text: str, parse_mode=ParseMode.MARKDOWN):
+        """
+        Queues a message and waits until it is delivered. Raises the last
+        Telegram error if delivery ultimately fails.
+        """
+        state = self._state()
+        future = state.loop.create_future()
+        state.pending.setdefault(chat_id, deque()).append([text, parse_mode, future, 0])
+        state.wakeup.set()
+        return await future
+
+    async def close(self):
+        """
+        Delivers whatever is still queued on the running loop, then shuts its
+        HTTP client down.
+        """
+        state = self._states.get(asyncio.get_running_loop())
+        if state is None:
+            return
+        state.closing = True
+        state.wakeup.set()
+        await state.worker
+
+    async def _get_bot(self):
+        state = self._states[asyncio.get_running_loop()]
+        if state.bot is None:
+            bot = Bot(token=self.token, base_url=TELEGRAM_API_URL,
+                      request=HTTPXRequest(connection_pool_size=TELEGRAM_POOL_SIZE))
+            await bot.initialize()
+            state.bot = bot
+        return state.bot
+
+    async def _run(self, state: _LoopQueues):
+        try:
+            await self._serve(state)
+        finally:
+            # Closing, or the loop is shutting down (asyncio.run cancels the
+            # worker): nothing queued here can be delivered any more
+            with self._states_lock:
+                if self._states.get(state.loop) is state:
+                    del self._states[state.loop]
+            for queue in state.pending.values():
+                for item in queue:
+                    self._resolve(item[2], error=RuntimeError("Telegram sender stopped before the message was sent"))
+            state.pending.clear()
+            if state.bot is not None:
+                bot, state.bot = state.bot, None
+                await bot.shutdown()
+
+    async def _serve(self, state: _LoopQueues):
+        while True:
+            if not state.pending:
+                if state.closing and not state.in_flight:
+                    break
+                state.wakeup.clear()
+                await state.wakeup.wait()
+                continue
+
+            with self._rate_lock:
+                # Serve the chat whose rate-limit slot opens first
+                chat_id = min(state.pending, key=lambda c: self._next_chat.get(c, 0.0))
+                now = time.monotonic()
+                delay = max(self._next_global, self._next_chat.get(chat_id, 0.0)) - now
+                if delay <= 0:
+                    self._next_global = now + self.global_interval
+                    self._next_chat[chat_id] = now + self.chat_interval
+            if delay > 0:
+                state.wakeup.clear()
+                try:
+                    await asyncio.wait_for(state.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            queue = state.pending[chat_id]
+            item = queue.popleft()
+            if not queue:
+                del state.pending[chat_id]
+
+            state.in_flight.add(state.loop.create_task(self._deliver(state, chat_id, item)))
+
+    def _requeue(self, state: _LoopQueues, chat_id, item):
+        state.pending.setdefault(chat_id, deque()).appendleft(item)
+        state.wakeup.set()
+
+    async def _deliver(self, state: _LoopQueues, chat_id, item):
+        text, parse_mode, future, attempt = item
+        try:
+            bot = await self._get_bot()
+            result = await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+        except RetryAfter as e:
+            error = e
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            # Pause every chat, not just this one: 429s are flood control
+            with self._rate_lock:
+                self._next_global = max(self._next_global, time.monotonic() + retry_after)
+            print(f"Telegram rate limited. Retrying in {retry_after}s (attempt {attempt + 1}).")
+        except BadRequest as e:
+            self._resolve(future, error=e)
+            return
+        except TimedOut as e:
+            # The request may have reached Telegram before the response was
+            # lost, so a retry could post the message twice
+            print(f"Telegram request to {chat_id} timed out; the message may have been delivered. Not retrying.")
+            self._resolve(future, error=e)
+            return
+        except NetworkError as e:
+            error = e
+            backoff = min(2 ** (attempt + 1), 30)
+            with self._rate_lock:
+                self._next_chat[chat_id] = max(self._next_chat.get(chat_id, 0.0), time.monotonic() + backoff)
+            print(f"Telegram network error: {e}. Retrying in {backoff}s (attempt {attempt + 1}).")
+        except Exception as e:
+            self._resolve(future, error=e)
+            return
+        else:
+            self._resolve(future, result=result)
+            return
+        finally:
+            state.in_flight.discard(asyncio.current_task())
+            state.wakeup.set()
+
+        if attempt + 1 > self.max_retries:
+            self._resolve(future, error=error)
+        else:
+            item[3] = attempt + 1
+            self._requeue(state, chat_id, item)
+
+    @staticmethod
+    def _resolve(future, result=None, error=None):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+telegram_sender = TelegramSender(TELEGRAM_BOT_TOKEN)
 
 async def send_telegram_alert(lead_details: dict):
     """
@@ -16,8 +230,6 @@ async def send_telegram_alert(lead_details: dict):
         print(f"Alert Content: {lead_details}")
         return
 
-    bot = Bot(token=TELEGRAM_BOT_TOKEN)
-
     status_emoji = "🔥" if lead_details['status'] == "HOT" else "⚠️" if lead_details['status'] == "WARM" else "❄️"
 
     message = (
@@ -32,24 +244,20 @@ async def send_telegram_alert(lead_details: dict):
     )
 
     try:
-        await bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID,
-            text=message,
-            parse_mode=ParseMode.MARKDOWN
-        )
+        with span("alert_dispatch"):
+            await telegram_sender.send(TELEGRAM_CHAT_ID, message)
         print("Telegram alert sent successfully.")
     except Exception as e:
         print(f"Failed to send Telegram alert: {e}")
 
 async def send_follow_up_reminder(lead_name: str, status: str, last_contact: str):
     """
-    Sends a follow-up reminder to Telegram.
+    Sends a follow-up reminder to Telegram. Returns False if it could not be
+    sent, so the drip step can retry it.
     """
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         print(f"Telegram Reminder (Not Sent): Follow up with {lead_name}")
-        return
-
-    bot = Bot(token=TELEGRAM_BOT_TOKEN)
+        return True
 
     message = (
         f"⏰ *Follow-Up Reminder*\n\n"
@@ -61,10 +269,11 @@ async def send_follow_up_reminder(lead_name: str, status: str, last_contact: str
     )
 
     try:
-        await bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID,
-            text=message,
-            parse_mode=ParseMode.MARKDOWN
-        )
+        await telegram_sender.send(TELEGRAM_CHAT_ID, message)
+    except TimedOut:
+        # Possibly delivered; counted as sent rather than risking a duplicate
+        return True
     except Exception as e:
         print(f"Failed to send Telegram reminder: {e}")
+        return False
+    return True
@@ -0,0 +1,38 @@
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, AgencyLead
+from agency_identity import agency_identity_key, canonical_domain, normalize_agency_name, KnownAgencies, upsert_agencies
+
+def test_identity_key_normalization():
+    assert canonical_domain("HTTPS://www.SmithRealty.com:443/about/") == "smithrealty.com"
+    assert canonical_domain("https://www.zillow.com/profile/Jane-Doe/") == "zillow.com/profile/jane-doe"
+    assert normalize_agency_name("The Smith & Jones Realty, LLC") == "smith jones realty"
+    assert agency_identity_key("Smith Realty Inc.", "smithrealty.com") == agency_identity_key("smith realty", "http://www.smithrealty.com/")
+    assert agency_identity_key("Smith Realty", "smithrealty.com") != agency_identity_key("Smith Realty", "smith-realty.com")
+    assert agency_identity_key(None, "") is None
+
+def test_known_agencies_filter():
+    known = KnownAgencies(["a.com|a", None])
+    assert "a.com|a" in known and "b.com|b" not in known and None not in known
+    known.add("b.com|b")
+    assert "b.com|b" in known and len(known) == 2
+
+def test_upsert_updates_or_ignores_existing_agencies():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    key = agency_identity_key("Smith Realty", "smithrealty.com")
+    upsert_agencies(db, [{"agency_name": "Smith Realty", "tier": "Tier 3", "identity_key": key}])
+    upsert_agencies(db, [
+        {"agency_name": "Smith Realty LLC", "tier": "Tier 1", "identity_key": key},
+        {"agency_name": "Unkeyed", "tier": None, "identity_key": None},
+        {"agency_name": "Unkeyed", "tier": None, "identity_key": None},
+    ])
+    upsert_agencies(db, [{"agency_name": "Smith", "tier": "Tier 2", "identity_key": key}], update=False)
+    db.commit()
+
+    rows = db.execute(select(AgencyLead.agency_name, AgencyLead.tier).order_by(AgencyLead.id)).all()
+    assert rows == [("Smith Realty LLC", "Tier 1"), ("Unkeyed", None), ("Unkeyed", None)]
+    assert key in KnownAgencies.load(db)
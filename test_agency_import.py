@@ -0,0 +1,80 @@
+import io
+import pytest
+from sqlalchemy import func, select
+
+from models import AgencyLead, ImportJob
+from enrichment_pipeline import EnrichmentPipeline
+from agency_import import import_agency_csv, read_agency_chunks, count_csv_rows
+
+def make_csv(n):
+    lines = ["agency_name,website,num_listings,google_rating,city,notes"]
+    for i in range(n):
+        listings = "lots" if i == 3 else str(i)
+        lines.append(f"Agency {i},site{i}.com,{listings},{4.5 if i % 2 else ''},Austin,ignored")
+    return io.BytesIO(("\n".join(lines) + "\n").encode("utf-8"))
+
+class Interrupted(BaseException):
+    """Stands in for a crash or disconnect: not handled as a per-row failure."""
+
+def make_pipeline(session_factory, fail_on=None, error=ValueError):
+    def fetch(url):
+        if url == fail_on:
+            raise error("boom")
+        return f"homepage of {url}"
+
+    return EnrichmentPipeline(
+        session_factory, fetch=fetch,
+        analyze=lambda text, name: {"weaknesses": ["No chatbot"]},
+        generate=lambda agency, analysis, qual: {"subject": "Hi", "body": "Body"},
+        fetch_concurrency=2
+    )
+
+def test_chunks_are_typed():
+    chunks = list(read_agency_chunks(make_csv(5), chunk_size=2))
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    rows = [row for chunk in chunks for row in chunk]
+    assert set(rows[0]) == {"agency_name", "website", "num_listings", "google_rating", "city"}
+    assert rows[1]["num_listings"] == 1 and type(rows[1]["num_listings"]) is int
+    assert rows[1]["google_rating"] == 4.5 and rows[0]["google_rating"] is None
+    assert rows[3]["num_listings"] is None  # "lots"
+    assert count_csv_rows(make_csv(5)) == 5
+
+def test_import_resumes_after_last_committed_chunk(session_factory):
+    upload = make_csv(10)
+
+    # Row 7 is in the fourth chunk; the first three chunks stay committed
+    with pytest.raises(Interrupted):
+        import_agency_csv(upload, pipeline=make_pipeline(session_factory, fail_on="site7.com", error=Interrupted),
+                          session_factory=session_factory, chunk_size=2)
+
+    db = session_factory()
+    assert db.scalar(select(func.count(AgencyLead.id))) == 6
+    assert db.scalar(select(ImportJob.rows_done)) == 6
+    db.close()
+
+    progress = []
+    summary = import_agency_csv(upload, pipeline=make_pipeline(session_factory, fail_on="site9.com"),
+                                session_factory=session_factory, chunk_size=2,
+                                on_progress=lambda done, total: progress.append((done, total)))
+    assert summary["resumed_from"] == 6
+    assert summary["written"] == 3 and summary["failed"] == 1 and summary["skipped"] == 0
+    assert progress[-1] == (10, 10)
+
+    db = session_factory()
+    names = db.scalars(select(AgencyLead.agency_name)).all()
+    job = db.scalars(select(ImportJob)).one()
+    db.close()
+    assert sorted(names) == sorted(f"Agency {i}" for i in range(9))
+    assert (job.status, job.rows_done, job.rows_written, job.rows_failed) == ("DONE", 10, 9, 1)
+
+def test_known_agencies_are_skipped_before_enrichment(session_factory):
+    import_agency_csv(make_csv(4), pipeline=make_pipeline(session_factory), session_factory=session_factory)
+
+    fetched = []
+    pipeline = make_pipeline(session_factory)
+    pipeline.fetch = lambda url: fetched.append(url) or "homepage"
+    upload = io.BytesIO(make_csv(6).getvalue() + b"Agency 5,https://www.SITE5.com/,1,,Austin,dup\n")
+    summary = import_agency_csv(upload, pipeline=pipeline, session_factory=session_factory)
+
+    assert sorted(fetched) == ["site4.com", "site5.com"]
+    assert (summary["written"], summary["skipped"]) == (2, 5)
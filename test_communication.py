@@ -0,0 +1,104 @@
+import asyncio
+import smtplib
+import pytest
+
+aiosmtpd = pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+import communication
+from benchmarks.helpers import free_port
+from communication import SMTPPool, send_email_lead
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, envelope.rcpt_tos))
+        return "250 OK"
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(
+        handler, hostname="127.0.0.1", port=free_port(),
+        authenticator=lambda *args: AuthResult(success=True), auth_require_tls=False
+    )
+    controller.start()
+    try:
+        yield controller, handler
+    finally:
+        controller.stop()
+
+def make_message(to):
+    from email.mime.text import MIMEText
+    msg = MIMEText("hello")
+    msg["From"] = "agent@example.com"
+    msg["To"] = to
+    msg["Subject"] = "Test"
+    return msg
+
+def test_pool_reuses_connection(smtp_server):
+    controller, handler = smtp_server
+    pool = SMTPPool(controller.hostname, controller.port, "agent", "secret", starttls=False)
+    for i in range(5):
+        pool.send(make_message(f"buyer{i}@example.com"))
+    pool.close()
+
+    assert len(handler.messages) == 5
+    assert len({peer for peer, _ in handler.messages}) == 1
+
+def test_pool_recycles_idle_connections(smtp_server):
+    controller, handler = smtp_server
+    pool = SMTPPool(controller.hostname, controller.port, "agent", "secret", starttls=False, idle_timeout=0)
+    for i in range(3):
+        pool.send(make_message(f"buyer{i}@example.com"))
+    pool.close()
+
+    assert len({peer for peer, _ in handler.messages}) == 3
+
+def test_send_email_lead_uses_smtp(smtp_server, monkeypatch):
+    controller, handler = smtp_server
+    monkeypatch.setenv("SMTP_SERVER", controller.hostname)
+    monkeypatch.setenv("SMTP_PORT", str(controller.port))
+    monkeypatch.setenv("SMTP_USER", "agent@example.com")
+    monkeypatch.setenv("SMTP_PASSWORD", "secret")
+    monkeypatch.setenv("SMTP_STARTTLS", "0")
+
+    async def run():
+        return await asyncio.gather(*(
+            send_email_lead(f"buyer{i}@example.com", "Hi", "Body") for i in range(10)
+        ))
+
+    assert all(asyncio.run(run()))
+    assert len(handler.messages) == 10
+    assert len({peer for peer, _ in handler.messages}) <= communication.SMTP_POOL_SIZE
+
+class ReplyHandler(RecordingHandler):
+    def __init__(self, *replies):
+        super().__init__()
+        self.replies = list(replies)
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((session.peer, envelope.rcpt_tos))
+        return self.replies.pop(0) if self.replies else "250 OK"
+
+def test_pool_retries_only_transient_replies(smtp_server):
+    controller, handler = smtp_server
+    pool = SMTPPool(controller.hostname, controller.port, "agent", "secret", starttls=False)
+
+    controller.handler = handler = ReplyHandler("451 Try again later")
+    controller.server.event_handler = handler
+    pool.send(make_message("buyer@example.com"))
+    assert len(handler.messages) == 2
+
+    handler.replies = ["550 Mailbox unavailable"]
+    with pytest.raises(smtplib.SMTPDataError):
+        pool.send(make_message("gone@example.com"))
+    assert len(handler.messages) == 3
+    # The connection that got the 550 was closed rather than pooled
+    assert len(pool._idle) == 0
+    pool.send(make_message("buyer2@example.com"))
+    assert len(handler.messages) == 4
+    pool.close()
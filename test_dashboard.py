@@ -0,0 +1,107 @@
+import threading
+import time
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from models import Lead, DashboardCounters
+from dashboard import (
+    get_dashboard_metrics, get_lead_page, get_uncontacted_leads,
+    get_unbooked_leads, mark_contacted, book_appointment,
+    count_new_leads, rebuild_counters
+)
+from lead_scoring import rescore_all_leads
+
+def seed(db, n=7):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for i in range(n):
+        db.add(Lead(
+            name=f"Lead {i}", lead_status="HOT" if i % 2 else "COLD", estimated_commission=1000.0 * i,
+            appointment_booked=(i == 3), response_time_minutes=(10.0 if i < 2 else None),
+            # Two leads share a timestamp to exercise the id tie-breaker
+            created_at=start + timedelta(minutes=min(i, 5))
+        ))
+    # Added straight to the table, bypassing the write paths that keep the counters in step
+    db.flush()
+    rebuild_counters(db)
+    db.commit()
+
+def test_metrics(db):
+    seed(db)
+    assert get_dashboard_metrics(db) == {
+        "total_leads": 7, "hot_leads": 3, "appointments": 1,
+        "hot_roi": 1000.0 + 3000.0 + 5000.0, "avg_response_minutes": 10.0
+    }
+
+def test_keyset_pages_cover_all_leads_newest_first(db):
+    seed(db)
+    seen = []
+    cursor = None
+    while True:
+        rows, cursor = get_lead_page(db, after=cursor, page_size=3)
+        seen += [r.name for r in rows]
+        if cursor is None:
+            break
+    assert seen == [f"Lead {i}" for i in (6, 5, 4, 3, 2, 1, 0)]
+
+def test_pickers_and_actions(db):
+    seed(db, n=3)
+    assert [r.name for r in get_uncontacted_leads(db, search="lead 1")] == ["Lead 1"]
+    lead_id = get_uncontacted_leads(db)[0].id
+    assert mark_contacted(db, lead_id).response_time_minutes is not None
+    assert lead_id not in {r.id for r in get_uncontacted_leads(db)}
+
+    book_appointment(db, lead_id)
+    assert lead_id not in {r.id for r in get_unbooked_leads(db)}
+    assert get_dashboard_metrics(db)["appointments"] == 1
+
+def test_counters_stay_in_step_with_leads(db):
+    seed(db)
+
+    lead = Lead(name="New", budget=2_000_000, cash_buyer=True, timeframe="ASAP", lead_status="HOT",
+                estimated_commission=50_000.0)
+    db.add(lead)
+    db.flush()
+    count_new_leads(db, [lead])
+    db.commit()
+    mark_contacted(db, lead.id)
+    book_appointment(db, lead.id)
+    rescore_all_leads(db, chunk_size=3)
+
+    incremental = get_dashboard_metrics(db)
+    assert incremental["total_leads"] == 8
+    assert incremental == pytest.approx(rebuild_counters(db))
+
+def test_repeated_actions_count_once(session_factory, db):
+    # Two sessions act on the same lead, as with concurrent clicks in two tabs
+    seed(db, n=3)
+    get_dashboard_metrics(db)
+    lead_id = get_uncontacted_leads(db)[0].id
+
+    first, second = session_factory(), session_factory()
+    assert mark_contacted(first, lead_id) is not None
+    assert mark_contacted(second, lead_id) is None
+    assert book_appointment(second, lead_id) is not None
+    assert book_appointment(first, lead_id) is None
+
+    metrics = get_dashboard_metrics(db)
+    assert metrics["appointments"] == 1
+    assert metrics == pytest.approx(rebuild_counters(db))
+
+def test_missing_counters_row_is_rebuilt_once_by_concurrent_writers(file_session_factory):
+    db = file_session_factory()
+    seed(db, n=3)
+    db.execute(DashboardCounters.__table__.delete())
+    db.commit()
+    db.close()
+
+    # Both writers find the row missing; the second waits for the first's lock
+    first, second = file_session_factory(), file_session_factory()
+    assert rebuild_counters(first)["total_leads"] == 3
+    results = []
+    thread = threading.Thread(target=lambda: results.append(rebuild_counters(second)) or second.commit())
+    thread.start()
+    time.sleep(0.2)
+    first.commit()
+    thread.join()
+    assert results and results[0]["total_leads"] == 3
+    assert file_session_factory().query(DashboardCounters).count() == 1
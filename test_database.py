@@ -0,0 +1,16 @@
+from sqlalchemy import text
+
+from database import make_engine
+
+def test_sqlite_file_engine_uses_wal_and_busy_timeout(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'test.db'}", busy_timeout=2500)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 2500
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    assert engine.pool.size() == 5
+
+def test_memory_engine_skips_file_settings():
+    engine = make_engine("sqlite://")
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from models import Lead, DripStep
+from drip_engine import (
+    enqueue_lead_drips, claim_due_steps, complete_steps, fail_step,
+    release_stale_claims, record_sent_channels, DRIP_CLAIM_LEASE
+)
+import scheduler
+
+def test_claim_is_exclusive_and_ordered(session_factory):
+    db = session_factory()
+    db.add(Lead(id=1, name="Jane", email="jane@example.com", phone="555", lead_status="HOT", sms_opt_in=True))
+    db.commit()
+    db.close()
+
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    enqueue_lead_drips(1, start=start, session_factory=session_factory)
+    # Re-enrolling replaces the pending sequence instead of duplicating it
+    enqueue_lead_drips(1, start=start, session_factory=session_factory)
+
+    now = start + timedelta(days=4)
+    first = claim_due_steps(10, now=now, session_factory=session_factory)
+    assert [s.step for s in first] == ["1 day follow-up", "3 day follow-up"]
+    assert first[0].name == "Jane" and first[0].sms_opt_in
+    assert claim_due_steps(10, now=now, session_factory=session_factory) == []
+
+    complete_steps([first[0].id], session_factory=session_factory)
+    fail_step(first[1].id, first[1].attempts, now=now, session_factory=session_factory)
+
+    db = session_factory()
+    remaining = {s.step: s for s in db.query(DripStep).all()}
+    db.close()
+    assert set(remaining) == {"3 day follow-up", "7 day follow-up"}
+    assert remaining["3 day follow-up"].status == "PENDING"
+    assert remaining["3 day follow-up"].attempts == 1
+
+def test_stale_claims_are_released(session_factory):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    enqueue_lead_drips(7, start=start, session_factory=session_factory)
+
+    now = start + timedelta(days=1)
+    assert len(claim_due_steps(10, now=now, session_factory=session_factory)) == 1
+    assert release_stale_claims(now=now, session_factory=session_factory) == 0
+
+    later = now + timedelta(seconds=DRIP_CLAIM_LEASE + 1)
+    assert release_stale_claims(now=later, session_factory=session_factory) == 1
+    assert len(claim_due_steps(10, now=later, session_factory=session_factory)) == 1
+
+def test_retry_only_resends_failed_channels(session_factory, monkeypatch):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    enqueue_lead_drips(3, start=start, session_factory=session_factory)
+    step = claim_due_steps(10, now=start + timedelta(days=1), session_factory=session_factory)[0]
+
+    sent = []
+    reminder_ok = iter([False, True])
+    email_ok = iter([False, True])
+
+    async def reminder(*args):
+        sent.append("telegram")
+        return next(reminder_ok)
+
+    async def sms(*args):
+        sent.append("sms")
+
+    async def email(*args):
+        sent.append("email")
+        return next(email_ok)
+
+    monkeypatch.setattr(scheduler, "send_follow_up_reminder", reminder)
+    monkeypatch.setattr(scheduler, "send_sms_lead", sms)
+    monkeypatch.setattr(scheduler, "send_email_lead", email)
+    monkeypatch.setattr(scheduler, "is_quiet_hours", lambda: False)
+
+    def run(step):
+        channels = set(filter(None, (step.sent_channels or "").split(",")))
+
+        async def on_sent(channel):
+            channels.add(channel)
+            record_sent_channels(step.id, channels, session_factory=session_factory)
+
+        asyncio.run(scheduler.run_us_drip(3, "Jane", "jane@example.com", "555", "HOT", True,
+                                          step.step, channels, on_sent))
+
+    try:
+        run(step)
+        raise AssertionError("expected the reminder and email failures to raise")
+    except RuntimeError:
+        fail_step(step.id, step.attempts, now=start + timedelta(days=1), session_factory=session_factory)
+
+    # Only the SMS went out; the failed reminder is not recorded as delivered
+    retry = claim_due_steps(10, now=start + timedelta(days=2), session_factory=session_factory)[0]
+    assert retry.sent_channels == "sms"
+    run(retry)
+    assert sent == ["telegram", "sms", "email", "telegram", "email"]
@@ -0,0 +1,56 @@
+import threading
+import time
+
+from models import AgencyLead
+from enrichment_pipeline import EnrichmentPipeline
+
+def test_pipeline_streams_rows_with_host_limit(session_factory):
+    lock = threading.Lock()
+    active = {}
+    peak = {}
+
+    def fetch(url):
+        host = url.split("/")[0]
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), active[host])
+        time.sleep(0.01)
+        with lock:
+            active[host] -= 1
+        if "broken" in url:
+            raise ValueError("boom")
+        return f"homepage of {url}"
+
+    def analyze(text, agency_name):
+        return {"niche": "Luxury", "weaknesses": ["No chatbot"], "opportunities": []}
+
+    def generate(agency_data, analysis, qualification):
+        return {"subject": f"Hi {agency_data['agency_name']}", "body": "Body"}
+
+    rows = [
+        {"agency_name": f"Agency {i}", "website": f"{'shared.com' if i % 2 else f'site{i}.com'}/{i}",
+         "num_listings": i, "google_rating": float("nan"), "city": "Miami"}
+        for i in range(20)
+    ]
+    rows.append({"agency_name": "Broken", "website": "broken.com", "num_listings": 1})
+    progress = []
+
+    pipeline = EnrichmentPipeline(
+        session_factory, fetch=fetch, analyze=analyze, generate=generate,
+        fetch_concurrency=8, per_host_limit=2, write_batch=5,
+        on_progress=lambda done, total: progress.append(done)
+    )
+    summary = pipeline.run_sync(rows, total=len(rows))
+
+    assert summary["written"] == 20 and summary["failed"] == 1
+    assert peak["shared.com"] <= 2
+    assert progress[-1] == len(rows)
+
+    db = session_factory()
+    try:
+        saved = db.query(AgencyLead).all()
+    finally:
+        db.close()
+    assert len(saved) == 20
+    assert all(a.outreach_email.startswith("Subject: Hi ") for a in saved)
+    assert {a.weaknesses for a in saved} == {"No chatbot"}
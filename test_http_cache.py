@@ -0,0 +1,73 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import agency_intelligence
+from http_cache import HTTPCache, normalize_url
+
+class HomepageHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = b"<html><head><title>Sunset Realty</title></head><body><p>Luxury homes</p></body></html>"
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_normalize_url():
+    assert normalize_url("Example.COM") == "https://example.com/"
+    assert normalize_url("https://example.com:443/about?b=2&a=1#team") == "https://example.com/about?a=1&b=2"
+    assert normalize_url("http://example.com:8080") == "http://example.com:8080/"
+
+def test_lru_eviction(tmp_path):
+    cache = HTTPCache(str(tmp_path / "cache.db"), max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a").text == "A" and cache.get("c").text == "C"
+
+def test_scrape_homepage_revalidates(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), HomepageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/"
+    HomepageHandler.requests_seen = []
+    cache = HTTPCache(str(tmp_path / "cache.db"), ttl=3600)
+    monkeypatch.setattr(agency_intelligence, "homepage_cache", cache)
+    monkeypatch.setattr(agency_intelligence, "PROMPT_COMPACTION", False)
+    try:
+        first = agency_intelligence.scrape_homepage(url)
+        assert "Sunset Realty" in first and "Luxury homes" in first
+
+        # Fresh: served from disk without touching the network
+        assert agency_intelligence.scrape_homepage(url) == first
+        assert HomepageHandler.requests_seen == [None]
+
+        # Expired: conditional GET answered with 304
+        cache.ttl = 0
+        assert agency_intelligence.scrape_homepage(url) == first
+        assert HomepageHandler.requests_seen == [None, '"v1"']
+
+        # Compacted text is cached under its own key, so reads skip compaction
+        compacted = []
+        monkeypatch.setattr(agency_intelligence, "PROMPT_COMPACTION", True)
+        monkeypatch.setattr(agency_intelligence, "compact_homepage",
+                            lambda text, budget: compacted.append(budget) or "compacted")
+        cache.ttl = 3600
+        assert agency_intelligence.scrape_homepage(url) == "compacted"
+        assert agency_intelligence.scrape_homepage(url) == "compacted"
+        assert compacted == [agency_intelligence.PROMPT_TOKEN_BUDGET]
+        assert HomepageHandler.requests_seen == [None, '"v1"', None]
+    finally:
+        server.shutdown()
+        cache.close()
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import select, func
+
+from models import Lead
+from dashboard import get_dashboard_metrics, rebuild_counters
+from lead_identity import normalize_phone, normalize_email, save_leads, needs_alert
+
+def submission(**fields):
+    data = dict(name="Jane Buyer", phone="(555) 123-4567", email="Jane@Example.com", budget=400_000,
+                timeframe="6 months+", mortgage_status="checking", cash_buyer=False, message="",
+                lead_status="COLD", score=0, estimated_commission=10_000.0, sms_opt_in=True)
+    data.update(fields)
+    return Lead(**data)
+
+def test_contact_normalization():
+    assert normalize_phone("(555) 123-4567") == "+15551234567"
+    assert normalize_phone("1-555-123-4567") == "+15551234567"
+    assert normalize_phone("+44 20 7946 0958") == "+442079460958"
+    assert normalize_phone("0044 20 7946 0958") == "+442079460958"
+    assert normalize_phone("123") is None
+    assert normalize_email("  Jane@Example.COM ") == "jane@example.com"
+    assert normalize_email("not an email") is None
+
+def test_repeat_submission_merges_and_rescores(db):
+    first = save_leads(db, [submission(source="Zillow")])[0]
+    db.commit()
+    assert not first.merged and needs_alert(first)
+
+    # Same person from another source: phone formatted differently, cash buyer now, more urgent
+    second = save_leads(db, [submission(phone="+1 555 123 4567", email="other@example.com", source="Website",
+                                        cash_buyer=True, mortgage_status="approved", timeframe="Immediate",
+                                        sms_opt_in=False)])[0]
+    db.commit()
+    assert second.merged and second.id == first.id
+    assert (second.previous_status, second.status) == ("COLD", "HOT") and needs_alert(second)
+
+    lead = db.get(Lead, first.id)
+    assert db.scalar(select(func.count(Lead.id))) == 1
+    assert lead.cash_buyer and lead.timeframe == "Immediate" and lead.source == "Zillow"
+    assert lead.sms_opt_in is False  # latest consent wins
+    assert lead.score == 100
+
+    # A weaker repeat by email keeps the stronger signals and raises no new alert
+    third = save_leads(db, [submission(phone="", email="JANE@example.com ")])[0]
+    db.commit()
+    assert third.merged and third.id == first.id and not needs_alert(third)
+    assert db.get(Lead, first.id).timeframe == "Immediate"
+
+    metrics = get_dashboard_metrics(db)
+    assert metrics == pytest.approx(rebuild_counters(db))
+    assert (metrics["total_leads"], metrics["hot_leads"]) == (1, 1)
+
+def test_duplicates_within_a_batch_are_merged(db):
+    saved = save_leads(db, [submission(), submission(phone="5551234567"), submission(phone="", email="x@y.com")])
+    db.commit()
+    assert [s.merged for s in saved] == [False, True, False]
+    assert saved[0].id == saved[1].id != saved[2].id
+    assert get_dashboard_metrics(db)["total_leads"] == 2
@@ -0,0 +1,92 @@
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import StaticPool
+
+from models import Base, Lead
+from lead_ingest import LeadIngestQueue
+
+async def make_session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+def test_group_commit_assigns_ids():
+    async def run():
+        SessionTest = await make_session_factory()
+        queue = LeadIngestQueue(SessionTest, flush_interval=0.05, max_batch=4)
+        await queue.start()
+        saved = await asyncio.gather(*(queue.submit(Lead(name=f"Lead {i}")) for i in range(10)))
+        await queue.stop()
+
+        async with SessionTest() as db:
+            names = dict((await db.execute(select(Lead.id, Lead.name))).all())
+        return [s.id for s in saved], names
+
+    ids, names = asyncio.run(run())
+    assert len(set(ids)) == 10
+    assert [names[i] for i in ids] == [f"Lead {i}" for i in range(10)]
+
+def test_repeat_submissions_are_merged():
+    async def run():
+        SessionTest = await make_session_factory()
+        queue = LeadIngestQueue(SessionTest, flush_interval=0.05, max_batch=4)
+        first = await queue.submit(Lead(name="Jane", phone="555-123-4567", email="jane@example.com"))
+        repeat = await queue.submit(Lead(name="Jane", phone="(555) 123 4567", email="JANE@example.com"))
+        await queue.stop()
+
+        async with SessionTest() as db:
+            count = len((await db.execute(select(Lead.id))).all())
+        return first, repeat, count
+
+    first, repeat, count = asyncio.run(run())
+    assert repeat.merged and repeat.id == first.id and count == 1
+
+def test_bad_row_only_fails_its_own_request():
+    async def run():
+        SessionTest = await make_session_factory()
+        queue = LeadIngestQueue(SessionTest, flush_interval=0.05, max_batch=10)
+        good = queue.submit(Lead(name="Good"))
+        bad = queue.submit(Lead(id=100, name="Duplicate"))
+        dup = queue.submit(Lead(id=100, name="Duplicate again"))
+        results = await asyncio.gather(good, bad, dup, return_exceptions=True)
+        await queue.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert sum(isinstance(r, Exception) for r in results) == 1
+
+def test_retry_after_failed_commit_does_not_reuse_ids():
+    async def run():
+        engine = (await make_session_factory()).kw["bind"]
+        taken = []
+
+        class FlakySession(AsyncSession):
+            async def commit(self):
+                if not taken:
+                    # Fail the group commit after its flush assigned ids
+                    taken.extend(obj.id for obj in self.sync_session.identity_map.values())
+                    raise OperationalError("COMMIT", {}, Exception("disk I/O error"))
+                await super().commit()
+
+            async def rollback(self):
+                await super().rollback()
+                if taken and not concurrent:
+                    # Another writer inserts rows with those ids before the retry
+                    concurrent.extend(taken)
+                    async with AsyncSession(engine) as other:
+                        other.add_all([Lead(id=i, name="Concurrent") for i in taken])
+                        await other.commit()
+
+        concurrent = []
+        queue = LeadIngestQueue(async_sessionmaker(engine, class_=FlakySession, expire_on_commit=False),
+                                flush_interval=0.05, max_batch=10)
+        saved = await asyncio.gather(queue.submit(Lead(name="A")), queue.submit(Lead(name="B")))
+        await queue.stop()
+        return taken, saved
+
+    taken, saved = asyncio.run(run())
+    assert len(taken) == 2
+    assert not {s.id for s in saved} & set(taken)
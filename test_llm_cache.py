@@ -0,0 +1,64 @@
+import json
+from types import SimpleNamespace
+
+import agency_intelligence
+from llm_cache import LLMCache, make_cache_key
+
+def test_key_is_content_addressed():
+    a = make_cache_key("gpt-4o-mini", "v1", {"agency_name": "A", "text": "x"})
+    assert a == make_cache_key("gpt-4o-mini", "v1", {"text": "x", "agency_name": "A"})
+    assert a != make_cache_key("gpt-4o-mini", "v2", {"agency_name": "A", "text": "x"})
+    assert a != make_cache_key("gpt-4o", "v1", {"agency_name": "A", "text": "x"})
+
+def test_ttl_eviction_and_hit_rate(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.db"), ttl=3600, max_entries=2, memory_entries=1)
+    # The file is only created once the cache is used
+    assert not (tmp_path / "llm.db").exists()
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}
+    cache.put("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("c") == {"v": 3}
+    assert cache.hits == 2 and cache.misses == 1
+
+    cache.ttl = -1
+    cache.put("d", {"v": 4})
+    assert cache.get("d") is None
+    cache.close()
+
+    # Persistent across instances
+    reopened = LLMCache(str(tmp_path / "llm.db"))
+    assert reopened.get("a") == {"v": 1}
+
+def test_memory_hits_keep_entries_from_eviction(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm.db"), max_entries=2)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    # Served from memory; the access still counts for the disk LRU
+    assert cache.get("a") == {"v": 1}
+    cache.put("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    cache.close()
+
+def test_analysis_served_from_cache(tmp_path, monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        content = json.dumps({"niche": "Luxury", "weaknesses": ["No chatbot"], "opportunities": []})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(agency_intelligence, "client", fake_client)
+    monkeypatch.setattr(agency_intelligence, "gpt_cache", LLMCache(str(tmp_path / "llm.db")))
+
+    first = agency_intelligence.analyze_website_with_gpt("Homepage text", "Sunset Realty")
+    second = agency_intelligence.analyze_website_with_gpt("Homepage text", "Sunset Realty")
+    assert first == second == {"niche": "Luxury", "weaknesses": ["No chatbot"], "opportunities": []}
+    assert len(calls) == 1
+
+    agency_intelligence.analyze_website_with_gpt("Changed homepage", "Sunset Realty")
+    assert len(calls) == 2
+    assert agency_intelligence.gpt_cache.hit_rate == 1 / 3
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import threading
+from openai import AsyncOpenAI, RateLimitError
+
+import agency_intelligence
+from benchmarks.openai_stub import OpenAIStub
+from llm_cache import LLMCache
+from llm_dispatch import LLMDispatcher, LLMDeferred, RateBudget
+
+def stub_dispatcher(stub, **kwargs):
+    return LLMDispatcher(client_factory=lambda: AsyncOpenAI(base_url=stub.url, api_key="sk-test", max_retries=0),
+                         **kwargs)
+
+def test_rate_budget_refills_over_a_minute():
+    budget = RateBudget(60, now=0)
+    assert budget.delay(60, now=0) == 0
+    budget.take(60, now=0)
+    assert budget.delay(30, now=0) == 30
+    assert budget.delay(30, now=30) == 0
+    # Larger than the whole budget: waits for a full bucket, not forever
+    assert budget.delay(1000, now=30) == 30
+
+def test_dispatcher_retries_429_and_5xx_with_many_in_flight(monkeypatch):
+    monkeypatch.setattr("llm_dispatch.LLM_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(agency_intelligence, "gpt_cache", None)
+    stub = OpenAIStub(latency=0.05).start()
+    try:
+        stub.fail_with(429, 503)
+        dispatcher = stub_dispatcher(stub, max_concurrency=10)
+
+        async def run():
+            return await asyncio.gather(*(
+                agency_intelligence.analyze_website_with_gpt_async(f"Chat with us 24/7 ({i})", f"Agency {i}", dispatcher)
+                for i in range(10)
+            ))
+
+        analyses = asyncio.run(run())
+    finally:
+        stub.stop()
+
+    assert all("No chatbot" not in analysis["weaknesses"] for analysis in analyses)
+    assert dispatcher.stats["retries"] == 2 and dispatcher.stats["errors"] == 0
+    assert stub.requests == 12
+    assert dispatcher.stats["prompt_tokens"] == stub.prompt_tokens
+
+def test_dispatcher_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr("llm_dispatch.LLM_BACKOFF_BASE", 0.01)
+    stub = OpenAIStub().start()
+    try:
+        stub.fail_with(429, 429)
+        dispatcher = stub_dispatcher(stub, max_retries=1)
+        try:
+            asyncio.run(dispatcher.complete([{"role": "user", "content": "hi"}], model="gpt-4o-mini"))
+            raise AssertionError("expected RateLimitError")
+        except RateLimitError:
+            pass
+    finally:
+        stub.stop()
+    assert stub.requests == 2 and dispatcher.stats["errors"] == 1
+
+def test_batch_mode_writes_requests_and_ingests_results(tmp_path, monkeypatch):
+    monkeypatch.setattr(agency_intelligence, "gpt_cache", LLMCache(str(tmp_path / "llm.db")))
+    batch_path = tmp_path / "requests.jsonl"
+    dispatcher = LLMDispatcher(batch_path=str(batch_path))
+
+    async def analyze():
+        return await agency_intelligence.analyze_website_with_gpt_async("Homepage text", "Sunset Realty", dispatcher)
+
+    for _ in range(2):
+        try:
+            asyncio.run(analyze())
+            raise AssertionError("expected LLMDeferred")
+        except LLMDeferred:
+            pass
+
+    requests = [json.loads(line) for line in batch_path.read_text().splitlines()]
+    assert len(requests) == 1  # the same prompt is written once
+    assert requests[0]["url"] == "/v1/chat/completions"
+    assert requests[0]["body"]["response_format"] == {"type": "json_object"}
+
+    results_path = tmp_path / "results.jsonl"
+    analysis = {"niche": "Luxury", "weaknesses": ["No chatbot"], "opportunities": []}
+    results_path.write_text("\n".join(json.dumps(line) for line in [
+        {"custom_id": requests[0]["custom_id"], "error": None, "response": {"status_code": 200, "body": {
+            "choices": [{"message": {"role": "assistant", "content": json.dumps(analysis)}}]}}},
+        {"custom_id": "analysis-missing", "error": {"code": "server_error"}, "response": None},
+    ]))
+    assert agency_intelligence.ingest_batch_results(str(results_path)) == {"stored": 1, "failed": 1}
+    assert asyncio.run(analyze()) == analysis
+
+def test_client_is_closed_at_the_end_of_each_loop():
+    stub = OpenAIStub().start()
+    clients = []
+
+    def client_factory():
+        clients.append(AsyncOpenAI(base_url=stub.url, api_key="sk-test", max_retries=0))
+        return clients[-1]
+
+    try:
+        dispatcher = LLMDispatcher(client_factory=client_factory)
+
+        async def run():
+            try:
+                return await dispatcher.complete([{"role": "user", "content": "hi"}], model="gpt-4o-mini")
+            finally:
+                await dispatcher.aclose()
+
+        asyncio.run(run())
+        asyncio.run(run())
+    finally:
+        stub.stop()
+
+    # One client per event loop, each closed when its run ended
+    assert len(clients) == 2 and all(client.is_closed() for client in clients)
+
+def test_loops_in_other_threads_keep_their_own_client():
+    stub = OpenAIStub(latency=0.2).start()
+    clients = []
+
+    def client_factory():
+        clients.append(AsyncOpenAI(base_url=stub.url, api_key="sk-test", max_retries=0))
+        return clients[-1]
+
+    dispatcher = LLMDispatcher(client_factory=client_factory)
+    errors = []
+
+    async def run():
+        try:
+            await dispatcher.complete([{"role": "user", "content": "hi"}], model="gpt-4o-mini")
+        finally:
+            await dispatcher.aclose()
+
+    def session():
+        try:
+            asyncio.run(run())
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        # Like two Streamlit sessions, each running its own loop at the same time
+        threads = [threading.Thread(target=session) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        stub.stop()
+
+    assert errors == []
+    assert len(clients) == 2 and all(client.is_closed() for client in clients)
+    assert dispatcher.stats["requests"] == 2
+
+def test_failed_attempts_refund_their_token_reservation(monkeypatch):
+    monkeypatch.setattr("llm_dispatch.LLM_BACKOFF_BASE", 0.01)
+    stub = OpenAIStub().start()
+    try:
+        stub.fail_with(429, 503)
+        dispatcher = stub_dispatcher(stub, tpm=6_000)
+        asyncio.run(dispatcher.complete([{"role": "user", "content": "hi"}], model="gpt-4o-mini"))
+    finally:
+        stub.stop()
+
+    # Only the successful attempt is charged against the token budget
+    used = dispatcher.stats["prompt_tokens"] + dispatcher.stats["completion_tokens"]
+    assert dispatcher.stats["retries"] == 2
+    assert dispatcher.tokens_budget.available >= 6_000 - used
@@ -0,0 +1,75 @@
+import logging
+
+from sqlalchemy import create_engine, event, inspect, text
+
+import migrations
+from migrations import migrate, get_schema_version, SCHEMA_VERSION
+
+def _engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+
+def test_fresh_database_is_created_at_latest_version(tmp_path):
+    engine = _engine(tmp_path)
+    assert migrate(engine) == 0
+    with engine.connect() as conn:
+        assert get_schema_version(conn) == SCHEMA_VERSION
+    tables = inspect(engine).get_table_names()
+    assert {"leads", "agency_leads", "drip_steps", "schema_version"} <= set(tables)
+
+def test_legacy_database_is_upgraded(tmp_path):
+    engine = _engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE leads (id INTEGER PRIMARY KEY, name VARCHAR, created_at DATETIME)"))
+        conn.execute(text("CREATE TABLE agency_leads (id INTEGER PRIMARY KEY, agency_name VARCHAR, website VARCHAR)"))
+        conn.execute(text("INSERT INTO leads (name) VALUES ('Old Lead')"))
+        conn.execute(text(
+            "INSERT INTO agency_leads (agency_name, website) VALUES"
+            " ('Smith Realty', 'smithrealty.com'), ('Smith Realty LLC', 'https://www.smithrealty.com/')"
+        ))
+
+    assert migrate(engine) == 0
+
+    inspector = inspect(engine)
+    lead_columns = {c["name"] for c in inspector.get_columns("leads")}
+    agency_columns = {c["name"] for c in inspector.get_columns("agency_leads")}
+    assert {"lead_status", "response_time_minutes", "sms_opt_in"} <= lead_columns
+    assert {"tier", "outreach_status", "created_at"} <= agency_columns
+    assert "ix_leads_created_at_id" in {i["name"] for i in inspector.get_indexes("leads")}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT lead_status FROM leads")).scalar() == "COLD"
+        assert get_schema_version(conn) == SCHEMA_VERSION
+        # Duplicate agencies: only the newest gets the unique identity key
+        keys = conn.execute(text("SELECT identity_key FROM agency_leads ORDER BY id")).scalars().all()
+        assert keys == [None, "smithrealty.com|smith realty"]
+
+def test_current_schema_needs_one_query(tmp_path):
+    engine = _engine(tmp_path)
+    migrate(engine)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert migrate(engine) == SCHEMA_VERSION
+    assert len(statements) == 1
+
+def test_partial_upgrade_resumes_from_stored_version(tmp_path, caplog):
+    engine = _engine(tmp_path)
+    migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE schema_version SET version = 2"))
+    with caplog.at_level(logging.INFO, logger="migrations"):
+        assert migrate(engine) == 2
+    with engine.connect() as conn:
+        assert get_schema_version(conn) == SCHEMA_VERSION
+    assert [r.getMessage().split(":")[0] for r in caplog.records] == [
+        f"Applied schema migration {n}" for n in range(3, SCHEMA_VERSION + 1)
+    ]
+
+def test_steps_run_by_another_process_are_not_reported(tmp_path, monkeypatch, caplog):
+    engine = _engine(tmp_path)
+    migrate(engine)
+    # This process read version 2 just before another one finished migrating
+    versions = iter([2])
+    monkeypatch.setattr(migrations, "get_schema_version", lambda conn: next(versions, SCHEMA_VERSION))
+    with caplog.at_level(logging.INFO, logger="migrations"):
+        assert migrate(engine) == 2
+    assert caplog.records == []
@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from agency_intelligence import extract_homepage_stream
+from fixtures import brokerage_page, BOILERPLATE, SIGNALS
+from llm_dispatch import approx_tokens
+from prompt_compaction import compact_homepage, compact_text
+
+def test_compaction_keeps_signals_below_the_fold_within_budget():
+    html = brokerage_page(listings=400, guides=80).encode("utf-8")
+    text = extract_homepage_stream([html], "utf-8", text_budget=250000)
+    compacted = compact_homepage(text, 300)
+
+    assert approx_tokens(compacted) <= 300 < approx_tokens(text) / 10
+    assert compacted.startswith("Title: Sunset Realty Group | Homes for Sale in Miami\nDescription: ")
+    assert all(signal in compacted for signal in SIGNALS)
+    assert not any(phrase in compacted for phrase in BOILERPLATE)
+
+def test_compaction_drops_repeats_and_keeps_document_order():
+    text = "\n".join([
+        "Welcome to Bay Homes.",
+        "We use cookies to improve your browsing experience.",
+        "3 Bed Home in Brickell $950,000 · 2 baths · 1,400 sqft",
+        "3 Bed Home in Brickell $990,000 · 2 baths · 1,450 sqft",
+        "Text us anytime for instant answers.",
+    ])
+    assert compact_text(text, 500).splitlines() == [
+        "Welcome to Bay Homes.",
+        "3 Bed Home in Brickell $950,000 · 2 baths · 1,400 sqft",
+        "Text us anytime for instant answers.",
+    ]
+    # Under a tight budget the lead-capture sentence wins
+    assert compact_text(text, 12) == "Text us anytime for instant answers."
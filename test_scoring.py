@@ -45,3 +45,48 @@ def test_cold_lead():
     assert result['status'] == "COLD"
     assert result['score'] <= 30
     assert "nurture" in result['action'].lower()
+
+def test_batch_matches_scalar():
+    import itertools
+    import pandas as pd
+    from lead_scoring import score_leads_batch
+
+    rows = [
+        {"cash_buyer": c, "mortgage_status": m, "timeframe": t, "budget": b, "message": msg}
+        for c, m, t, b, msg in itertools.product(
+            [True, False],
+            ["approved", "not_approved", "checking"],
+            ["Immediate", "3 months", "6 months+", "Just Browsing"],
+            [0, 499_999.99, 500_000, 999_999, 1_000_000, 2_500_000],
+            ["", "URGENT please", "not in a hurry"]
+        )
+    ]
+    batch = score_leads_batch(pd.DataFrame(rows))
+    for row, (_, result) in zip(rows, batch.iterrows()):
+        expected = calculate_lead_score(row)
+        assert result.to_dict() == expected
+
+def test_rescore_all_leads():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from models import Base, Lead
+    from lead_scoring import rescore_all_leads
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        db.add_all([
+            Lead(name="Hot", cash_buyer=True, mortgage_status="approved", timeframe="Immediate", budget=2_000_000, message=""),
+            Lead(name="Cold", cash_buyer=False, mortgage_status="checking", timeframe="Just Browsing", budget=None, message=None)
+        ])
+        db.commit()
+
+        assert rescore_all_leads(db, chunk_size=1) == 2
+        db.expire_all()
+        hot, cold = db.query(Lead).order_by(Lead.id).all()
+        assert (hot.lead_status, hot.score, hot.estimated_commission) == ("HOT", 100, 50000.0)
+        assert (cold.lead_status, cold.score, cold.estimated_commission) == ("COLD", 0, 0.0)
+        assert hot.scoring_version == calculate_lead_score({})["rules_version"]
+    finally:
+        db.close()
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import pytest
+import pandas as pd
+
+import scoring_rules
+from scoring_rules import RuleSet, RuleLoader, ScoringRulesError, load_rules
+
+CUSTOM = {
+    "version": "test-2",
+    "rules": [
+        {"type": "flag", "field": "cash_buyer", "points": 50},
+        {"type": "threshold", "field": "budget", "tiers": [[250000, 5], [750000, 25.5]]},
+        {"type": "keyword", "field": "message", "keywords": ["ASAP", "urgent"], "points": 20},
+    ],
+    "max_score": 90,
+    "statuses": [
+        {"status": "COLD", "min_score": 0, "action": "Nurture"},
+        {"status": "HOT", "min_score": 60, "action": "Call"},
+    ],
+    "probability": {"per_point": 1.0, "max": 80},
+    "commission": {"field": "budget", "rate": 0.03}
+}
+
+def test_custom_rules_scalar_and_batch_agree():
+    rules = RuleSet(CUSTOM)
+    rows = [
+        {"cash_buyer": c, "budget": b, "message": m}
+        for c in (True, False) for b in (0, 250_000, 800_000) for m in ("", "Need it asap", "URGENT")
+    ]
+    batch = rules.score_batch(pd.DataFrame(rows))
+    for row, (_, result) in zip(rows, batch.iterrows()):
+        assert result.to_dict() == rules.score(row)
+
+    top = rules.score({"cash_buyer": True, "budget": 800_000, "message": "asap"})
+    assert (top["score"], top["status"], top["probability"], top["rules_version"]) == (90, "HOT", 80, "test-2")
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ScoringRulesError):
+        RuleSet(dict(CUSTOM, rules=[{"type": "flag", "field": "cash_buyer", "points": "40"}]))
+    with pytest.raises(ScoringRulesError):
+        RuleSet(dict(CUSTOM, rules=[{"type": "script", "field": "x"}]))
+    with pytest.raises(ScoringRulesError):
+        RuleSet({k: v for k, v in CUSTOM.items() if k != "version"})
+
+def test_loader_hot_reloads_and_keeps_rules_on_bad_edit(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(CUSTOM))
+    loader = RuleLoader(str(path), check_interval=0)
+    assert loader.current().version == "test-2"
+
+    path.write_text(json.dumps(dict(CUSTOM, version="test-3")))
+    os.utime(path, ns=(0, 10**18))
+    assert loader.current().version == "test-3"
+
+    path.write_text("{ not json")
+    os.utime(path, ns=(0, 2 * 10**18))
+    assert loader.current().version == "test-3"
+
+    # Valid JSON of the wrong shape is rejected by validation, not by scoring
+    broken = [
+        dict(CUSTOM, rules=[{"type": "threshold", "field": "budget", "tiers": [5]}]),
+        dict(CUSTOM, probability=None),
+        dict(CUSTOM, statuses=["HOT"]),
+        dict(CUSTOM, rules={"type": "flag"}),
+    ]
+    for i, config in enumerate(broken):
+        with pytest.raises(ScoringRulesError):
+            RuleSet(config)
+        path.write_text(json.dumps(config))
+        os.utime(path, ns=(0, (3 + i) * 10**18))
+        assert loader.current().version == "test-3"
+
+def test_loader_checks_the_file_once_per_interval(tmp_path, monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(scoring_rules, "_monotonic", lambda: clock[0])
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(CUSTOM))
+    loader = RuleLoader(str(path), check_interval=10)
+    assert loader.current().version == "test-2"
+
+    path.write_text(json.dumps(dict(CUSTOM, version="test-3")))
+    os.utime(path, ns=(0, 10**18))
+    clock[0] = 9.0
+    assert loader.current().version == "test-2"
+    clock[0] = 10.0
+    assert loader.current().version == "test-3"
+
+def test_first_load_is_shared_by_concurrent_callers(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(CUSTOM))
+    loader = RuleLoader(str(path), check_interval=60)
+    start = threading.Barrier(8)
+    versions = []
+
+    def score():
+        start.wait()
+        versions.append(loader.current().version)
+
+    threads = [threading.Thread(target=score) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert versions == ["test-2"] * 8
+
+def test_shipped_rules_load():
+    assert load_rules().score({"cash_buyer": True, "budget": 0, "message": ""})["score"] == 40
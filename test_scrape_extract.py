@@ -0,0 +1,56 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from agency_intelligence import extract_homepage_text, extract_homepage_stream
+from fixtures import brokerage_page
+
+def chunks(data, size=1024):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+def test_stream_matches_soup_on_small_page():
+    html = brokerage_page(listings=5)
+    expected = extract_homepage_text(html)
+    assert extract_homepage_stream(chunks(html.encode("utf-8")), "utf-8") == expected
+    assert "Sunset Realty Group" in expected and "Chat with us 24/7" in expected
+    assert "Buy" not in expected.split("Content:")[1]
+
+def test_stream_stops_at_text_budget():
+    body = brokerage_page(listings=3000).encode("utf-8")
+    consumed = []
+
+    def counting():
+        for chunk in chunks(body, 4096):
+            consumed.append(len(chunk))
+            yield chunk
+
+    text = extract_homepage_stream(counting(), "utf-8", text_budget=2000)
+    assert len(text) == 2000
+    assert text.startswith("Title: Sunset Realty Group")
+    assert sum(consumed) < len(body) / 10
+
+def test_stream_respects_byte_cap():
+    body = brokerage_page(listings=3000).encode("utf-8")
+    consumed = []
+
+    def counting():
+        for chunk in chunks(body, 4096):
+            consumed.append(len(chunk))
+            yield chunk
+
+    text = extract_homepage_stream(counting(), "utf-8", text_budget=len(body), max_bytes=64 * 1024)
+    assert sum(consumed) <= 64 * 1024
+    assert "Description: Sunset Realty Group helps buyers" in text
+
+def test_inline_scripts_do_not_count_toward_byte_cap():
+    # 4 MB of inline JS ahead of the content, twice the default cap
+    html = brokerage_page(listings=200, inline_js_kb=4096)
+    expected = extract_homepage_text(html)
+    assert len(expected) == 6000
+    assert extract_homepage_stream(chunks(html.encode("utf-8"), 64 * 1024), "utf-8") == expected
+
+    # The whole download stays bounded
+    text = extract_homepage_stream(chunks(html.encode("utf-8"), 64 * 1024), "utf-8", max_total_bytes=1024 * 1024)
+    assert "Welcome to" not in text
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from telegram.error import RetryAfter, TimedOut
+
+from telegram_bot import TelegramSender
+
+class FakeBot:
+    def __init__(self, fail_first=0, error=lambda: RetryAfter(0)):
+        self.fail_first = fail_first
+        self.error = error
+        self.calls = 0
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.calls += 1
+        if self.fail_first:
+            self.fail_first -= 1
+            raise self.error()
+        self.sent.append((chat_id, text, asyncio.get_running_loop().time()))
+        return len(self.sent)
+
+class FakeSender(TelegramSender):
+    def __init__(self, bot, **kwargs):
+        super().__init__("token", **kwargs)
+        self.fake_bot = bot
+
+    async def _get_bot(self):
+        return self.fake_bot
+
+def test_retry_after_is_retried():
+    bot = FakeBot(fail_first=2)
+    sender = FakeSender(bot, chat_rate=6000)
+
+    async def run():
+        result = await sender.send("chat", "hello")
+        await sender.close()
+        return result
+
+    assert asyncio.run(run()) == 1
+    assert [m[1] for m in bot.sent] == ["hello"]
+
+def test_timed_out_is_not_retried():
+    bot = FakeBot(fail_first=1, error=TimedOut)
+    sender = FakeSender(bot, chat_rate=6000)
+
+    async def run():
+        try:
+            await sender.send("chat", "hello")
+        except TimedOut:
+            return "timed out"
+        finally:
+            await sender.close()
+
+    # It may have been delivered, so it is reported rather than sent again
+    assert asyncio.run(run()) == "timed out"
+    assert bot.calls == 1
+
+def test_per_chat_spacing():
+    bot = FakeBot()
+    sender = FakeSender(bot, global_rate=1000, chat_rate=600)  # 0.1s between messages to one chat
+
+    async def run():
+        await asyncio.gather(
+            sender.send("a", "1"), sender.send("a", "2"), sender.send("b", "3")
+        )
+        await sender.close()
+
+    asyncio.run(run())
+    times = {text: t for _, text, t in bot.sent}
+    assert times["2"] - times["1"] >= 0.09
+    assert times["3"] - times["1"] < 0.09
+
+def test_loops_get_their_own_queues():
+    # The Streamlit drip poller and the app each run their own event loop
+    bot = FakeBot()
+    sender = FakeSender(bot, global_rate=1000, chat_rate=6000)
+    results = {}
+
+    def run(name):
+        async def go():
+            return await asyncio.gather(*(sender.send(name, str(i)) for i in range(3)))
+        results[name] = asyncio.run(go())
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("poller", "app")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert set(results) == {"poller", "app"}
+    assert len(bot.sent) == 6
+    # Each loop's worker is torn down with its loop
+    assert sender._states == {}
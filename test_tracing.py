@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+
+import tracing
+from tracing import StageMetrics, StackSampler, TimedIterator
+
+def test_span_feeds_histogram():
+    metrics = StageMetrics(buckets=(0.01, 1.0))
+    with metrics.span("scoring"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.span("scoring"):
+            raise ValueError("boom")
+    metrics.observe("gpt_analysis", 2.0)
+
+    snap = metrics.histogram("scoring").snapshot()
+    assert (snap["count"], snap["errors"], snap["buckets"][0]) == (2, 1, (0.01, 2))
+    text = metrics.render_prometheus()
+    assert 'stage_duration_seconds_bucket{stage="gpt_analysis",le="1.0"} 0' in text
+    assert 'stage_duration_seconds_bucket{stage="gpt_analysis",le="+Inf"} 1' in text
+    assert 'stage_errors_total{stage="scoring"} 1' in text
+
+def test_timed_iterator_counts_waiting_only():
+    def slow():
+        for i in range(3):
+            time.sleep(0.01)
+            yield i
+    chunks = TimedIterator(slow())
+    assert list(chunks) == [0, 1, 2]
+    assert chunks.waited >= 0.03
+
+def test_stack_sampler_captures_busy_thread():
+    def busy_loop(stop):
+        while not stop.is_set():
+            sum(range(1000))
+
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    sampler = StackSampler(worker.ident, interval=0.001).start()
+    time.sleep(0.1)
+    stacks = sampler.stop()
+    stop.set()
+    worker.join()
+    assert stacks and all("busy_loop (test_tracing.py)" in stack for stack in stacks)
+
+def test_metrics_endpoint_and_request_profiler(tmp_path, monkeypatch):
+    import main
+    monkeypatch.setattr(tracing, "PROFILE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(tracing, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "PROFILE_SLOW_MS", 0)
+    render = main.stage_metrics.render_prometheus
+    # Slow enough for the sampler to see the handler
+    monkeypatch.setattr(main.stage_metrics, "render_prometheus", lambda: time.sleep(0.05) or render())
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            with tracing.span("scoring"):
+                pass
+            return await client.get("/metrics")
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert 'stage_duration_seconds_count{stage="scoring"}' in response.text
+    assert list(tmp_path.glob("*-GET-metrics-*.folded"))
@@ -0,0 +1,221 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") != "0"
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Request profiler: PROFILE_SAMPLE_RATE of requests (0 = off) are sampled every
+# PROFILE_INTERVAL_MS; those slower than PROFILE_SLOW_MS are written to PROFILE_DIR.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram in the Prometheus style.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot: above the largest bucket
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, error: bool = False):
+        slot = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += seconds
+            self.count += 1
+            self.errors += error
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative = []
+            total = 0
+            for n in self.counts[:-1]:
+                total += n
+                cumulative.append(total)
+            return {"buckets": list(zip(self.buckets, cumulative)), "sum": self.sum,
+                    "count": self.count, "errors": self.errors}
+
+class StageMetrics:
+    """
+    One latency histogram per pipeline stage ("scoring", "db_commit", ...).
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.listeners = []  # callables(stage, seconds) receiving every raw observation
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage: str) -> Histogram:
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, stage: str, seconds: float, error: bool = False):
+        if TRACING_ENABLED:
+            self._record(stage, self.histogram(stage), seconds, error)
+
+    def _record(self, stage: str, histogram: Histogram, seconds: float, error: bool):
+        histogram.observe(seconds, error)
+        for listener in self.listeners:
+            listener(stage, seconds)
+
+    def span(self, stage: str):
+        """
+        Context manager timing the enclosed block as one observation of
+        `stage`. An exception is recorded as an error for the stage and re-raised.
+        """
+        return _Span(self, stage) if TRACING_ENABLED else _NO_SPAN
+
+    def render_prometheus(self) -> str:
+        """
+        All histograms in the Prometheus text exposition format.
+        """
+        lines = [
+            "# HELP stage_duration_seconds Time spent in each pipeline stage.",
+            "# TYPE stage_duration_seconds histogram",
+        ]
+        errors = []
+        for stage, histogram in sorted(self._histograms.items()):
+            snap = histogram.snapshot()
+            label = f'stage="{stage}"'
+            for bound, count in snap["buckets"]:
+                lines.append(f'stage_duration_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines += [
+                f'stage_duration_seconds_bucket{{{label},le="+Inf"}} {snap["count"]}',
+                f"stage_duration_seconds_sum{{{label}}} {snap['sum']}",
+                f"stage_duration_seconds_count{{{label}}} {snap['count']}",
+            ]
+            errors.append(f"stage_errors_total{{{label}}} {snap['errors']}")
+        lines += ["# HELP stage_errors_total Stage executions that raised.", "# TYPE stage_errors_total counter"]
+        return "\n".join(lines + errors) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+class _Span:
+    # A plain class rather than @contextmanager: spans sit on per-request hot paths
+    __slots__ = ("metrics", "stage", "histogram", "start")
+
+    def __init__(self, metrics: StageMetrics, stage: str):
+        self.metrics = metrics
+        self.stage = stage
+        self.histogram = metrics.histogram(stage)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._record(self.stage, self.histogram, time.perf_counter() - self.start, exc_type is not None)
+        return False
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+stage_metrics = StageMetrics()
+span = stage_metrics.span
+observe = stage_metrics.observe
+
+class TimedIterator:
+    """
+    Wraps an iterator and adds up the time spent waiting for its items, e.g.
+    to separate network reads from the parsing that consumes them.
+    """
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self.waited = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self._iterator)
+        finally:
+            self.waited += time.perf_counter() - start
+
+class StackSampler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a
+    background thread and counts the stacks it sees, in the "folded" format
+    (root;caller;callee) that flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, thread_id: int = None, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+def write_folded(stacks: Counter, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+def should_profile() -> bool:
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+def save_request_profile(stacks: Counter, method: str, path: str, seconds: float):
+    """
+    Writes a slow request's samples to PROFILE_DIR and returns the file path.
+    Async handlers share the event loop thread, so the samples can include
+    other requests running at the same time.
+    """
+    route = re.sub(r"[^A-Za-z0-9_.-]", "_", path.strip("/")) or "root"
+    name = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{method}-{route}-{seconds * 1000:.0f}ms.folded"
+    file_path = os.path.join(PROFILE_DIR, name)
+    write_folded(stacks, file_path)
+    return file_path